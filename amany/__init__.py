@@ -0,0 +1 @@
+# amany — وحدات مشتركة بين صفحات لوحة AMANY
@@ -0,0 +1,98 @@
+# amany/alerts.py — محرك التنبيهات المالية: تغير شهري وسنوي وz-score متحرك لكل مؤشر في كل ورقة بحساب واحد على اللوحة
+import numpy as np
+import pandas as pd
+
+from amany.panel_stats import PanelStats
+
+# نسبة التغير (٪) التي تُعتبر تنبيهاً — شهرياً أو مقارنة بنفس الشهر من السنة السابقة
+ALERT_THRESHOLD = 20.0
+# |z| للشهر مقارنة بالأشهر السابقة التي تُعتبر قيمة غير معتادة
+Z_LIMIT = 2.0
+ROLLING_MONTHS = 12
+# أقل عدد أشهر سابقة لحساب z-score (أقل من ذلك الانحراف غير موثوق)
+MIN_HISTORY = 6
+
+ALERT_COLUMNS = ["الورقة", "المؤشر", "الشهر", "القيمة", "الشهر السابق", "التغير الشهري %",
+                 "نفس الشهر العام السابق", "التغير السنوي %", "z-score", "السبب", "الشدة"]
+
+
+def _shift(values: np.ndarray, months: int) -> np.ndarray:
+    """قيمة نفس (الورقة، المؤشر) قبل months أشهر على محور اللوحة"""
+    out = np.full_like(values, np.nan)
+    if months < values.shape[1]:
+        out[:, months:] = values[:, :-months]
+    return out
+
+
+def _pct_change(now: np.ndarray, before: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(np.abs(before) > 0, (now - before) / np.abs(before) * 100, np.nan)
+
+
+def _last_active(values: np.ndarray, end_pos: int) -> np.ndarray:
+    """لكل ورقة: آخر شهر (حتى end_pos) به قيمة غير صفرية في أي مؤشر، أو -1"""
+    active = (np.nan_to_num(values[:, :end_pos + 1]) != 0).any(axis=2)
+    has = active.any(axis=1)
+    last = active.shape[1] - 1 - np.argmax(active[:, ::-1], axis=1)
+    return np.where(has, last, -1)
+
+
+def alert_table(stats: PanelStats, end=None, threshold: float = ALERT_THRESHOLD, z_limit: float = Z_LIMIT,
+                window: int = ROLLING_MONTHS) -> pd.DataFrame:
+    """تنبيهات آخر شهر به بيانات في كل ورقة (حتى end)، مرتبة من الأشد
+
+    كل المؤشرات وكل الأوراق تُحسب معاً كمصفوفات (ورقة، شهر، مؤشر)؛ الشدة = أكبر نسبة
+    تجاوز بين (التغير الشهري/الحد، التغير السنوي/الحد، |z|/حد z).
+    """
+    panel = stats.panel
+    if panel.empty:
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+    values = panel.values
+    prev, last_year = _shift(values, 1), _shift(values, 12)
+    mom, yoy = _pct_change(values, prev), _pct_change(values, last_year)
+    mean, std = stats.trailing(window)
+    history = np.cumsum(~np.isnan(values), axis=1) - (~np.isnan(values))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(np.minimum(history, window) >= MIN_HISTORY, (values - mean) / std, np.nan)
+
+    end_pos = len(panel.periods) - 1 if end is None else panel.period_slice(end).stop - 1
+    if end_pos < 0:
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+    month = _last_active(values, end_pos)
+    sheets = np.flatnonzero(month >= 0)
+
+    def pick(a):
+        """(ورقة، مؤشر) في الشهر المختار لكل ورقة"""
+        return a[sheets, month[sheets]]
+
+    cur, mom_c, yoy_c, z_c = pick(values), pick(mom), pick(yoy), pick(z)
+
+    with np.errstate(invalid="ignore"):
+        severity = np.fmax(np.fmax(np.abs(mom_c) / threshold, np.abs(yoy_c) / threshold), np.abs(z_c) / z_limit)
+        breach = (severity >= 1) & panel.present[sheets]
+    si, ki = np.nonzero(breach)
+    if not len(si):
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+
+    reasons = np.full(len(si), "", dtype=object)
+    for label, arr, limit in (("تغير شهري", mom_c, threshold), ("تغير سنوي", yoy_c, threshold),
+                              ("قيمة غير معتادة", z_c, z_limit)):
+        hit = np.abs(arr[si, ki]) >= limit
+        reasons[hit] = [f"{r}، {label}" if r else label for r in reasons[hit]]
+
+    rows = sheets[si]
+    months = panel.periods[month[rows]]
+    out = pd.DataFrame({
+        "الورقة": np.asarray(panel.sheets, dtype=object)[rows],
+        "المؤشر": np.asarray(panel.kpis, dtype=object)[ki],
+        "الشهر": months.strftime("%m/%Y"),
+        "القيمة": cur[si, ki],
+        "الشهر السابق": pick(prev)[si, ki],
+        "التغير الشهري %": mom_c[si, ki].round(1),
+        "نفس الشهر العام السابق": pick(last_year)[si, ki],
+        "التغير السنوي %": yoy_c[si, ki].round(1),
+        "z-score": z_c[si, ki].round(2),
+        "السبب": reasons,
+        "الشدة": severity[si, ki].round(2),
+    })
+    return out.sort_values("الشدة", ascending=False, ignore_index=True)
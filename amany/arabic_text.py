@@ -0,0 +1,23 @@
+# amany/arabic_text.py — توحيد النص العربي قبل المطابقة والبحث
+import re
+
+# ============ جداول التوحيد ============
+_DIACRITICS = re.compile(r"[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_SPACES = re.compile(r"\s+")
+
+_FOLD_MAP = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ی": "ي",
+    "ة": "ه",
+    "٠": "0", "١": "1", "٢": "2", "٣": "3", "٤": "4",
+    "٥": "5", "٦": "6", "٧": "7", "٨": "8", "٩": "9",
+})
+
+
+def normalize_arabic(text) -> str:
+    """توحيد النص: حذف التشكيل والتطويل وتوحيد الألف والياء والتاء المربوطة"""
+    if text is None:
+        return ""
+    s = _DIACRITICS.sub("", str(text))
+    s = s.translate(_FOLD_MAP).lower()
+    return _SPACES.sub(" ", s).strip()
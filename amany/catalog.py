@@ -0,0 +1,155 @@
+# amany/catalog.py — فهرس في الذاكرة لملفات Excel في uploads/ و Center/ (ومجلداتهما الفرعية) يُحدَّث عند تغير الملفات فقط
+import os
+import threading
+from dataclasses import dataclass
+
+import streamlit as st
+
+from amany import excel_reader
+from amany.workbooks import forget_workbook
+
+# ============ مراقبة المجلدات (watchdog إن وُجد وإلا فحص أوقات التعديل دورياً) ============
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+WATCHED_FOLDERS = ("uploads", "Center")
+POLL_INTERVAL = 2.0
+# مع watchdog يبقى الفحص الدوري احتياطياً فقط (مثلاً لمجلد أُنشئ بعد بدء المراقبة)
+POLL_INTERVAL_WITH_EVENTS = 30.0
+EXCEL_EXTENSIONS = (".xlsx", ".xls")
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    path: str
+    mtime_ns: int
+    size: int
+    sheets: tuple
+
+
+def _is_workbook(name: str) -> bool:
+    return name.endswith(EXCEL_EXTENSIONS) and not name.startswith("~$")
+
+
+class WorkbookCatalog:
+    """ملفات Excel وأسماء أوراقها في الذاكرة — يعاد قراءة الملف المضاف أو المستبدل فقط ويُحذف المزال"""
+
+    def __init__(self, folders=WATCHED_FOLDERS):
+        self.folders = tuple(folders)
+        self.version = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._observer = None
+        self.refresh()
+
+    # ---------- الفحص ----------
+    def _scan(self) -> dict:
+        # المجلدات الفرعية أيضاً (ملفات كل منشأة في Center/<المنشأة>/)
+        found = {}
+        pending = list(self.folders)
+        while pending:
+            folder = pending.pop()
+            try:
+                with os.scandir(folder) as it:
+                    for e in it:
+                        if e.is_dir():
+                            pending.append(e.path)
+                        elif e.is_file() and _is_workbook(e.name):
+                            st_ = e.stat()
+                            found[os.path.join(folder, e.name)] = (st_.st_mtime_ns, st_.st_size)
+            except OSError:
+                continue
+        return found
+
+    def refresh(self) -> bool:
+        """مقارنة المجلدات بالفهرس وتحديث المدخلات المتغيرة فقط. يعيد True إذا تغير شيء"""
+        found = self._scan()
+        with self._lock:
+            current = dict(self._entries)
+        changed = False
+
+        for path in set(current) - set(found):
+            del current[path]
+            forget_workbook(path)
+            changed = True
+
+        for path, (mtime_ns, size) in found.items():
+            entry = current.get(path)
+            if entry and (entry.mtime_ns, entry.size) == (mtime_ns, size):
+                continue
+            try:
+                sheets = tuple(excel_reader.sheet_names(path))
+            except Exception:
+                # ملف قيد النسخ أو تالف — يعاد المحاولة في الفحص التالي
+                current.pop(path, None)
+                continue
+            current[path] = CatalogEntry(path, mtime_ns, size, sheets)
+            changed = True
+
+        if changed:
+            with self._lock:
+                self._entries = current
+                self.version += 1
+        return changed
+
+    # ---------- المراقبة في الخلفية ----------
+    def start(self):
+        interval = POLL_INTERVAL
+        if WATCHDOG_AVAILABLE:
+            self._observer = Observer()
+            handler = _WakeHandler(self._wake)
+            for folder in self.folders:
+                if os.path.isdir(folder):
+                    self._observer.schedule(handler, folder, recursive=True)
+            self._observer.daemon = True
+            self._observer.start()
+            interval = POLL_INTERVAL_WITH_EVENTS
+        threading.Thread(target=self._run, args=(interval,), name="workbook-catalog", daemon=True).start()
+        return self
+
+    def _run(self, interval: float):
+        while True:
+            self._wake.wait(interval)
+            self._wake.clear()
+            try:
+                self.refresh()
+            except Exception:
+                pass
+
+    # ---------- القراءة ----------
+    def files(self, folder: str = None) -> list:
+        with self._lock:
+            paths = sorted(self._entries)
+        if folder is not None:
+            paths = [p for p in paths if os.path.dirname(p) == folder]
+        return paths
+
+    def sheets(self, path: str) -> list:
+        with self._lock:
+            entry = self._entries.get(path)
+        return list(entry.sheets) if entry else []
+
+    def entry(self, path: str):
+        with self._lock:
+            return self._entries.get(path)
+
+
+if WATCHDOG_AVAILABLE:
+    class _WakeHandler(FileSystemEventHandler):
+        def __init__(self, wake: threading.Event):
+            self._wake = wake
+
+        def on_any_event(self, event):
+            if not event.is_directory:
+                self._wake.set()
+
+
+@st.cache_resource(show_spinner=False)
+def workbook_catalog(folders: tuple = WATCHED_FOLDERS) -> WorkbookCatalog:
+    """فهرس واحد مشترك لكل الجلسات، يبدأ مراقبة المجلدات عند أول استخدام"""
+    return WorkbookCatalog(folders).start()
@@ -0,0 +1,226 @@
+# amany/chart_export.py — تصدير الرسوم (PNG/PDF) في الخلفية مع حفظ الناتج ببصمة مواصفات الرسم
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+CHART_EXPORT_DIR = os.path.join(".cache", "charts")
+EXPORT_SCALE = 2
+FORMATS = {"png": "image/png", "pdf": "application/pdf", "svg": "image/svg+xml"}
+# حدود مجلد الرسوم: الملفات الأقدم استخداماً تُحذف أولاً عند تجاوز الحجم، وأي ملف لم يُستخدم خلال المدة يُحذف
+CHART_CACHE_MAX_BYTES = 200 * 1024 * 1024
+CHART_CACHE_MAX_AGE = 30 * 24 * 3600
+
+
+def _figure_spec(fig) -> dict:
+    """نسخة مستقلة من مواصفات الرسم (الرسم الأصلي قد يتغير في إعادة التشغيل التالية)"""
+    return json.loads(fig.to_json()) if hasattr(fig, "to_json") else fig
+
+
+def spec_key(spec: dict, fmt: str, scale: float) -> str:
+    """بصمة (مواصفات الرسم، الصيغة، الدقة) — نفس الرسم لا يُرسم مرتين"""
+    payload = json.dumps({"spec": spec, "fmt": fmt, "scale": scale}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _batch_key(specs: list, scale: float) -> str:
+    return hashlib.sha1("|".join(spec_key(s, "png", scale) for s in specs).encode()).hexdigest()
+
+
+def _render(spec: dict, fmt: str, scale: float) -> bytes:
+    import plotly.io as pio
+    return pio.to_image(spec, format=fmt, scale=scale)
+
+
+def _pages_to_pdf(pages: list) -> bytes:
+    """صور PNG كصفحات في ملف PDF واحد"""
+    from PIL import Image
+    images = [Image.open(io.BytesIO(p)).convert("RGB") for p in pages]
+    out = io.BytesIO()
+    images[0].save(out, format="PDF", save_all=True, append_images=images[1:])
+    return out.getvalue()
+
+
+class ChartExportService:
+    """رسم الصور في مجموعة عمال بالخلفية؛ الناتج يُحفظ على القرص ببصمة الرسم ويُقدم فور انتهائه"""
+
+    def __init__(self, workers: int = 2, folder: str = CHART_EXPORT_DIR,
+                 max_bytes: int = CHART_CACHE_MAX_BYTES, max_age: float = CHART_CACHE_MAX_AGE):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._pending = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chart-export")
+
+    def _path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.folder, f"{key}.{fmt}")
+
+    def _store(self, key: str, fmt: str, data: bytes) -> bytes:
+        os.makedirs(self.folder, exist_ok=True)
+        tmp = f"{self._path(key, fmt)}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(key, fmt))
+        self._prune(keep=self._path(key, fmt))
+        return data
+
+    def _prune(self, keep: str = None):
+        """حذف الملفات التي لم تُستخدم منذ max_age، ثم الأقدم استخداماً حتى يصبح المجلد أصغر من max_bytes
+
+        وقت التعديل = آخر استخدام (يُحدَّث عند كل قراءة في _read).
+        """
+        now = time.time()
+        files = []
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.is_file() and not entry.name.endswith(".tmp") and entry.path != keep:
+                        info = entry.stat()
+                        files.append((info.st_mtime, info.st_size, entry.path))
+        except OSError:
+            return
+        files.sort()
+        total = sum(size for _, size, _ in files) + (os.path.getsize(keep) if keep and os.path.exists(keep) else 0)
+        for mtime, size, path in files:
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def _read(self, path: str):
+        """محتوى ملف محفوظ (مع تحديث وقت استخدامه)، أو None إذا حُذف"""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def _run(self, key: str, fmt: str, build):
+        try:
+            return self._store(key, fmt, build())
+        except Exception as e:
+            with self._lock:
+                self._errors[key] = str(e)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _schedule(self, key: str, fmt: str, build) -> str:
+        if os.path.exists(self._path(key, fmt)):
+            return key
+        with self._lock:
+            if key not in self._pending:
+                self._errors.pop(key, None)
+                self._pending[key] = self._pool.submit(self._run, key, fmt, build)
+        return key
+
+    def _page(self, spec: dict, scale: float) -> bytes:
+        """صفحة PNG واحدة (من القرص إن سبق رسمها)"""
+        key = spec_key(spec, "png", scale)
+        data = self._read(self._path(key, "png"))
+        if data is not None:
+            return data
+        return self._store(key, "png", _render(spec, "png", scale))
+
+    # ============ الواجهة ============
+    def key_for(self, fig, fmt: str = "png", scale: float = EXPORT_SCALE) -> str:
+        """مفتاح ملف الرسم (بدون رسمه) لمعرفة إن كان جاهزاً من قبل"""
+        return spec_key(_figure_spec(fig), fmt, scale)
+
+    def pdf_key_for(self, figs, scale: float = EXPORT_SCALE) -> str:
+        return _batch_key([_figure_spec(f) for f in figs if f is not None], scale)
+
+    def submit(self, fig, fmt: str = "png", scale: float = EXPORT_SCALE) -> str:
+        """جدولة تصدير رسم واحد؛ يُرجع مفتاح المهمة فوراً"""
+        if fmt not in FORMATS:
+            raise ValueError(f"صيغة غير مدعومة: {fmt}")
+        spec = _figure_spec(fig)
+        key = spec_key(spec, fmt, scale)
+        return self._schedule(key, fmt, lambda: _render(spec, fmt, scale))
+
+    def submit_pdf(self, figs, scale: float = EXPORT_SCALE) -> str:
+        """جدولة ملف PDF متعدد الصفحات (صفحة لكل رسم)؛ الصفحات المرسومة سابقاً لا تُعاد"""
+        specs = [_figure_spec(f) for f in figs if f is not None]
+        if not specs:
+            raise ValueError("لا توجد رسوم للتصدير")
+        key = _batch_key(specs, scale)
+        return self._schedule(key, "pdf", lambda: _pages_to_pdf([self._page(s, scale) for s in specs]))
+
+    def status(self, key: str, fmt: str = "png") -> str:
+        """ready / pending / failed / missing"""
+        if os.path.exists(self._path(key, fmt)):
+            return "ready"
+        with self._lock:
+            if key in self._pending:
+                return "pending"
+            if key in self._errors:
+                return "failed"
+        return "missing"
+
+    def error(self, key: str) -> str:
+        with self._lock:
+            return self._errors.get(key, "")
+
+    def result(self, key: str, fmt: str = "png"):
+        """الملف الجاهز كـ bytes، أو None إن لم ينته بعد"""
+        return self._read(self._path(key, fmt))
+
+
+@st.cache_resource(show_spinner=False)
+def chart_export_service() -> ChartExportService:
+    return ChartExportService()
+
+
+# ============ أزرار التصدير ============
+@st.fragment(run_every=1)
+def _wait_for(key: str, fmt: str):
+    """انتظار المهمة داخل جزء صغير من الصفحة؛ عند انتهائها تُعاد الصفحة لعرض زر التنزيل"""
+    if chart_export_service().status(key, fmt) == "pending":
+        st.caption("⏳ جاري تجهيز الملف في الخلفية...")
+    else:
+        st.rerun()
+
+
+def export_controls(figs, filename: str, key: str, label: str):
+    """زر تصدير رسم (PNG) أو عدة رسوم (PDF متعدد الصفحات) لا يوقف الصفحة أثناء الرسم
+
+    إن كان نفس الرسم قد صُدّر من قبل يظهر زر التنزيل مباشرة.
+    """
+    service = chart_export_service()
+    batch = isinstance(figs, (list, tuple))
+    if batch:
+        figs = [f for f in figs if f is not None]
+        if not figs:
+            return
+    fmt = "pdf" if batch else "png"
+    job = service.pdf_key_for(figs) if batch else service.key_for(figs)
+    status = service.status(job, fmt)
+
+    data = service.result(job, fmt) if status == "ready" else None
+    if data is not None:
+        st.download_button(f"تنزيل ({fmt.upper()})", data, filename, FORMATS[fmt], key=f"dl_{key}")
+        return
+    if status == "pending":
+        _wait_for(job, fmt)
+        return
+    if status == "failed":
+        st.warning(f"تعذر إنشاء الملف عبر kaleido: {service.error(job)}")
+    if st.button(label, key=f"btn_{key}"):
+        if batch:
+            service.submit_pdf(figs)
+        else:
+            service.submit(figs)
+        st.rerun()
@@ -0,0 +1,160 @@
+# amany/column_roles.py — تصنيف أدوار الأعمدة (تاريخ، إيراد، مصروف، ...) مرة واحدة لكل ورقة
+from collections import deque
+from functools import lru_cache
+
+from amany.arabic_text import normalize_arabic
+
+# ============ الكلمات المفتاحية لكل دور ============
+ROLE_KEYWORDS = {
+    "date": ["date", "تاريخ", "month", "شهر", "year", "سنة"],
+    "revenue": ["إيراد", "ربح", "دخل", "revenue", "income", "sales"],
+    "expense": ["مصروف", "تكلفة", "خسارة", "expense", "cost"],
+    "visits": ["تردد", "زيارة", "زيارات", "visits", "attendance"],
+    "pharmacy": ["صيدلية", "روشتة", "روشتات", "دواء", "أدوية", "pharmacy", "prescription"],
+    "lab": ["معمل", "تحاليل", "lab"],
+    "radiology": ["أشعة", "radiology", "x-ray"],
+    "percent": ["%", "نسبة", "معدل", "percent", "ratio", "rate"],
+    # مؤشرات نوع المنشأة (تُطبق على اسم الورقة والأعمدة)
+    "healthcare": ["مستشفى", "عيادة", "مريض", "طبيب", "علاج", "health", "hospital", "clinic", "medical"],
+    "retail": ["مبيعات", "منتج", "عميل", "متجر", "sales", "product", "customer", "revenue"],
+    "service": ["خدمة", "عميل", "مشروع", "service", "client", "project"],
+    "financial": ["ميزانية", "ربح", "خسارة", "مصروف", "إيراد", "budget", "profit", "loss", "expense", "income"],
+}
+
+# أدوار لا تتحقق إلا إذا بدأ اسم العمود بالكلمة
+ROLE_PREFIXES = {
+    "total_revenue": ["total revenues", "إجمالي الإيرادات"],
+    "total_expense": ["total expenses", "إجمالي المصروفات"],
+}
+
+ORGANIZATION_TYPES = [
+    ("healthcare", "منشأة صحية"),
+    ("retail", "منشأة تجارية"),
+    ("service", "منشأة خدمية"),
+    ("financial", "منشأة مالية"),
+]
+
+
+# ============ مطابقة Aho-Corasick ============
+class KeywordMatcher:
+    """مطابق متعدد الكلمات (Aho-Corasick) يمر على النص مرة واحدة"""
+
+    def __init__(self, keywords: dict):
+        # keywords: {الكلمة: مجموعة الوسوم}
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for word, tags in keywords.items():
+            word = normalize_arabic(word)
+            if not word:
+                continue
+            node = 0
+            for ch in word:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].extend((len(word), tag) for tag in tags)
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, normalized_text: str):
+        """إرجاع (موضع البداية، الوسم) لكل تطابق في نص موحد مسبقاً"""
+        node = 0
+        for i, ch in enumerate(normalized_text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for length, tag in self._out[node]:
+                yield i - length + 1, tag
+
+    def find(self, text) -> set:
+        """مجموعة الوسوم الموجودة في النص"""
+        return {tag for _, tag in self.iter_matches(normalize_arabic(text))}
+
+
+def _build_matcher() -> KeywordMatcher:
+    keywords = {}
+    for role, words in ROLE_KEYWORDS.items():
+        for w in words:
+            keywords.setdefault(w, set()).add(role)
+    for role, words in ROLE_PREFIXES.items():
+        for w in words:
+            keywords.setdefault(w, set()).add("^" + role)
+    return KeywordMatcher(keywords)
+
+
+_MATCHER = _build_matcher()
+
+
+def classify_text(text) -> frozenset:
+    """أدوار نص واحد (اسم عمود أو اسم ورقة)"""
+    roles = set()
+    for start, tag in _MATCHER.iter_matches(normalize_arabic(text)):
+        if tag.startswith("^"):
+            if start == 0:
+                roles.add(tag[1:])
+        else:
+            roles.add(tag)
+    return frozenset(roles)
+
+
+# ============ فهرس أدوار الأعمدة ============
+class ColumnRoles:
+    """خريطة عمود ← أدوار، مع فهرس عكسي دور ← أعمدة بترتيب الورقة"""
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self.by_column = {col: classify_text(col) for col in self.columns}
+        self.by_role = {}
+        for col in self.columns:
+            for role in self.by_column[col]:
+                self.by_role.setdefault(role, []).append(col)
+
+    def roles_of(self, column) -> frozenset:
+        return self.by_column.get(column, frozenset())
+
+    def columns_for(self, role, among=None) -> list:
+        cols = self.by_role.get(role, [])
+        if among is None:
+            return list(cols)
+        among = set(among)
+        return [c for c in cols if c in among]
+
+    def has(self, role) -> bool:
+        return role in self.by_role
+
+
+@lru_cache(maxsize=256)
+def _column_roles_cached(columns: tuple) -> ColumnRoles:
+    return ColumnRoles(columns)
+
+
+def column_roles(columns) -> ColumnRoles:
+    """فهرس الأدوار لأعمدة الورقة — يُبنى مرة واحدة ويعاد استخدامه لنفس رؤوس الأعمدة"""
+    return _column_roles_cached(tuple(columns))
+
+
+def detect_organization_type(sheet_name, columns) -> str:
+    """اكتشاف نوع المنشأة من اسم الورقة وأدوار الأعمدة"""
+    roles = set(classify_text(sheet_name))
+    roles.update(column_roles(columns).by_role.keys())
+    for role, label in ORGANIZATION_TYPES:
+        if role in roles:
+            return label
+    return "منشأة عامة"
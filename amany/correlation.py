@@ -0,0 +1,143 @@
+# amany/correlation.py — مصفوفة الارتباط الكاملة (Pearson وSpearman) مع الدلالة الإحصائية وتجميع المؤشرات المتشابهة
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# ============ استيراد آمن لـ scipy ============
+try:
+    from scipy import stats
+    from scipy.cluster import hierarchy
+    from scipy.spatial.distance import squareform
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+METHODS = ("pearson", "spearman")
+# مؤشران في نفس المجموعة إذا كان |الارتباط| بينهما على الأقل هذه القيمة تقريباً
+CLUSTER_MIN_ABS = 0.7
+SIGNIFICANCE = 0.05
+
+
+def _corr(z: np.ndarray) -> np.ndarray:
+    """مصفوفة الارتباط من أعمدة موحدة (z-scores) بضرب مصفوفتين واحد"""
+    n = z.shape[0]
+    r = (z.T @ z) / (n - 1)
+    return np.clip(r, -1.0, 1.0)
+
+
+def _standardize(x: np.ndarray) -> np.ndarray:
+    std = x.std(axis=0, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (x - x.mean(axis=0)) / np.where(std > 0, std, np.nan)
+
+
+def _p_values(r: np.ndarray, n: int) -> np.ndarray:
+    """اختبار t ذو الطرفين لكل معاملات المصفوفة (يحتاج scipy، وإلا NaN)"""
+    if not SCIPY_AVAILABLE or n < 3:
+        return np.full(r.shape, np.nan)
+    dof = n - 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = r * np.sqrt(dof / np.maximum(1.0 - r ** 2, 1e-300))
+    p = 2 * stats.t.sf(np.abs(t), dof)
+    p[np.isnan(r)] = np.nan
+    return p
+
+
+def _cluster(r: np.ndarray):
+    """(ترتيب المؤشرات بحيث تتجاور المتشابهة، رقم مجموعة كل مؤشر) بمسافة 1 - |r|
+
+    مع scipy: تجميع هرمي بمتوسط المسافة. بدونه: مكونات متصلة فوق CLUSTER_MIN_ABS.
+    """
+    k = r.shape[0]
+    dist = 1.0 - np.abs(np.nan_to_num(r, nan=0.0))
+    np.fill_diagonal(dist, 0.0)
+    if k < 2:
+        return np.arange(k), np.ones(k, dtype=int)
+    if SCIPY_AVAILABLE:
+        tree = hierarchy.linkage(squareform(dist, checks=False), method="average")
+        order = hierarchy.leaves_list(tree)
+        labels = hierarchy.fcluster(tree, t=1.0 - CLUSTER_MIN_ABS, criterion="distance")
+        return order, labels
+
+    labels = np.arange(k)
+    close = dist <= 1.0 - CLUSTER_MIN_ABS
+    while True:
+        merged = np.where(close, labels[None, :], k).min(axis=1)
+        if np.array_equal(merged, labels):
+            break
+        labels = merged
+    _, labels = np.unique(labels, return_inverse=True)
+    order = np.lexsort((-np.abs(np.nan_to_num(r)).sum(axis=1), labels))
+    return order, labels + 1
+
+
+@dataclass
+class CorrelationMatrix:
+    kpis: list
+    n: int                # عدد الأشهر المستخدمة
+    pearson: np.ndarray
+    spearman: np.ndarray
+    p_pearson: np.ndarray
+    p_spearman: np.ndarray
+    order: np.ndarray     # ترتيب التجميع
+    clusters: np.ndarray  # رقم مجموعة كل مؤشر
+    means: np.ndarray
+    stds: np.ndarray
+
+    def _values(self, method: str):
+        if method not in METHODS:
+            raise ValueError(f"طريقة ارتباط غير معروفة: {method}")
+        return (self.pearson, self.p_pearson) if method == "pearson" else (self.spearman, self.p_spearman)
+
+    def matrix(self, method: str = "pearson", clustered: bool = True) -> pd.DataFrame:
+        r, _ = self._values(method)
+        idx = self.order if clustered else np.arange(len(self.kpis))
+        names = [self.kpis[i] for i in idx]
+        return pd.DataFrame(r[np.ix_(idx, idx)], index=names, columns=names)
+
+    def pair(self, x: str, y: str) -> dict:
+        """كل قيم زوج واحد من المصفوفات المحسوبة مسبقاً، مع خط الانحدار (y = slope·x + intercept)"""
+        i, j = self.kpis.index(x), self.kpis.index(y)
+        slope = self.pearson[i, j] * self.stds[j] / self.stds[i] if self.stds[i] > 0 else np.nan
+        return {
+            "pearson": float(self.pearson[i, j]), "p_pearson": float(self.p_pearson[i, j]),
+            "spearman": float(self.spearman[i, j]), "p_spearman": float(self.p_spearman[i, j]),
+            "slope": float(slope), "intercept": float(self.means[j] - slope * self.means[i]),
+            "same_cluster": bool(self.clusters[i] == self.clusters[j]), "n": self.n,
+        }
+
+    def strongest(self, method: str = "pearson", limit: int = 20, significant_only: bool = False) -> pd.DataFrame:
+        """أقوى الأزواج مرتبة بالقيمة المطلقة للارتباط (كل زوج مرة واحدة)"""
+        r, p = self._values(method)
+        i, j = np.triu_indices(len(self.kpis), k=1)
+        vals, pv = r[i, j], p[i, j]
+        keep = ~np.isnan(vals)
+        if significant_only:
+            keep &= pv < SIGNIFICANCE
+        i, j, vals, pv = i[keep], j[keep], vals[keep], pv[keep]
+        top = np.argsort(-np.abs(vals), kind="stable")[:limit]
+        kpis = np.asarray(self.kpis, dtype=object)
+        return pd.DataFrame({"المؤشر الأول": kpis[i[top]], "المؤشر الثاني": kpis[j[top]],
+                             "الارتباط": vals[top].round(3), "p-value": pv[top]})
+
+
+def correlation_matrix(df: pd.DataFrame) -> CorrelationMatrix:
+    """كل أزواج الأعمدة الرقمية مرة واحدة (الأشهر التي بها قيمة لكل المؤشرات فقط)"""
+    data = df.select_dtypes("number").dropna()
+    x = data.to_numpy(dtype=float)
+    n = len(x)
+    kpis = list(data.columns)
+    if n < 2:
+        empty = np.full((len(kpis), len(kpis)), np.nan)
+        return CorrelationMatrix(kpis, n, empty, empty, empty, empty, np.arange(len(kpis)),
+                                 np.ones(len(kpis), dtype=int), np.full(len(kpis), np.nan), np.full(len(kpis), np.nan))
+
+    pearson = _corr(_standardize(x))
+    # Spearman = Pearson على الرتب (المتساوية تأخذ متوسط رتبها)
+    spearman = _corr(_standardize(data.rank(method="average").to_numpy(dtype=float)))
+    np.fill_diagonal(pearson, np.where(np.isnan(np.diag(pearson)), np.nan, 1.0))
+    np.fill_diagonal(spearman, np.where(np.isnan(np.diag(spearman)), np.nan, 1.0))
+    order, clusters = _cluster(pearson)
+    return CorrelationMatrix(kpis, n, pearson, spearman, _p_values(pearson, n), _p_values(spearman, n),
+                             order, clusters, x.mean(axis=0), x.std(axis=0, ddof=1))
@@ -0,0 +1,191 @@
+# amany/data_export.py — تصدير Excel/CSV لورقة أو لعدة أوراق: يُجهز عند الطلب فقط، ورقة بعد ورقة، ويُحفظ حسب نسخة البيانات
+import hashlib
+import importlib.util
+import io
+import os
+import re
+import threading
+import time
+import zipfile
+
+import pandas as pd
+import streamlit as st
+
+DATA_EXPORT_DIR = os.path.join(".cache", "exports")
+# الملف المجهز يبقى على القرص ما دام استُخدم خلال هذه المدة (الملفات مشتركة بين الجلسات)
+EXPORT_MAX_AGE = 6 * 3600
+MIME_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "zip": "application/zip",
+    "csv": "text/csv",
+}
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+_SAFE_NAME = re.compile(r"[^\w.]+")
+_EXCEL_SHEET_NAME_MAX = 31
+
+# ============ اختيار الكاتب ============
+XLSX_ENGINE = "xlsxwriter" if importlib.util.find_spec("xlsxwriter") else "openpyxl"
+
+
+def _sheet_title(name, seen: set) -> str:
+    """اسم ورقة Excel صالح وغير مكرر (31 حرفاً بدون []:*?/\\)"""
+    base = _INVALID_SHEET_CHARS.sub("_", str(name)).strip("'") or "Sheet"
+    title, i = base[:_EXCEL_SHEET_NAME_MAX], 1
+    while title.lower() in seen:
+        suffix = f" ({i})"
+        title = base[:_EXCEL_SHEET_NAME_MAX - len(suffix)] + suffix
+        i += 1
+    seen.add(title.lower())
+    return title
+
+
+def _cell(v):
+    if v is None or (isinstance(v, float) and v != v) or v is pd.NaT:
+        return None
+    if isinstance(v, pd.Timestamp):
+        return v.to_pydatetime()
+    return v
+
+
+def _rows(df: pd.DataFrame):
+    for row in df.itertuples(index=False, name=None):
+        yield [_cell(v) for v in row]
+
+
+# ============ نسخة البيانات ============
+def frame_revision(name: str, df: pd.DataFrame) -> str:
+    """بصمة محتوى الورقة (الاسم، الأعمدة، القيم) — تتغير فقط إذا تغيرت البيانات"""
+    h = hashlib.sha1(str(name).encode("utf-8"))
+    h.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def export_revision(sheets_factory, fmt: str) -> str:
+    """بصمة كل الأوراق معاً (تُقرأ ورقة بعد ورقة دون الاحتفاظ بها)"""
+    h = hashlib.sha1(fmt.encode())
+    for name, df in sheets_factory():
+        h.update(frame_revision(name, df).encode())
+    return h.hexdigest()
+
+
+# ============ الكتابة ============
+def _write_xlsx(path: str, sheets) -> None:
+    """كتابة متدفقة بذاكرة ثابتة: كل صف يُكتب ثم يُترك (لا يُبنى الملف كله في الذاكرة)"""
+    if XLSX_ENGINE == "xlsxwriter":
+        import xlsxwriter
+        wb = xlsxwriter.Workbook(path, {"constant_memory": True, "default_date_format": "yyyy-mm-dd"})
+        try:
+            for title, df in sheets:
+                ws = wb.add_worksheet(title)
+                ws.write_row(0, 0, [str(c) for c in df.columns])
+                for r, row in enumerate(_rows(df), start=1):
+                    ws.write_row(r, 0, row)
+        finally:
+            wb.close()
+        return
+
+    import openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    for title, df in sheets:
+        ws = wb.create_sheet(title)
+        ws.append([str(c) for c in df.columns])
+        for row in _rows(df):
+            ws.append(row)
+    wb.save(path)
+
+
+def _write_zip(path: str, sheets) -> None:
+    """ملف CSV لكل ورقة داخل ZIP، يُكتب كل CSV مباشرة في الأرشيف"""
+    with zipfile.ZipFile(path, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for title, df in sheets:
+            with zf.open(f"{title}.csv", mode="w") as raw, \
+                    io.TextIOWrapper(raw, encoding="utf-8-sig", newline="") as f:
+                df.to_csv(f, index=False)
+
+
+def _write_csv(path: str, sheets) -> None:
+    """CSV واحد للورقة الأولى (لعدة أوراق استخدم zip)"""
+    _, df = next(iter(sheets), (None, pd.DataFrame()))
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        df.to_csv(f, index=False)
+
+
+_WRITERS = {"xlsx": _write_xlsx, "zip": _write_zip, "csv": _write_csv}
+
+
+def _purge_stale(folder: str, current: str, max_age: float = EXPORT_MAX_AGE):
+    """حذف ملفات التصدير التي لم تُستخدم منذ max_age (لا تُحذف حسب الاسم: جلسة أخرى قد تعرض زر تنزيلها)"""
+    cutoff = time.time() - max_age
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.name == current or entry.name.endswith(".tmp") or not entry.is_file():
+                    continue
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+    except OSError:
+        pass
+
+
+def _touch(path: str):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def prepare_export(sheets_factory, fmt: str = "xlsx", folder: str = DATA_EXPORT_DIR, name: str = "export") -> str:
+    """مسار ملف التصدير لنسخة البيانات الحالية — يُكتب فقط إذا لم يُجهز من قبل
+
+    sheets_factory() يُرجع (اسم، DataFrame) ورقة بعد ورقة، ويُستدعى مرة لحساب النسخة
+    ومرة للكتابة عند الحاجة، فلا تُحمل كل الأوراق في الذاكرة في نفس الوقت.
+    name: بداية اسم الملف في المجلد. بعد كتابة ملف جديد تُحذف الملفات التي لم تُستخدم منذ EXPORT_MAX_AGE.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"صيغة تصدير غير مدعومة: {fmt}")
+    filename = f"{name}-{export_revision(sheets_factory, fmt)}.{fmt}"
+    path = os.path.join(folder, filename)
+    if os.path.exists(path):
+        _touch(path)
+        return path
+
+    os.makedirs(folder, exist_ok=True)
+
+    def titled():
+        seen = set()
+        for name, df in sheets_factory():
+            yield _sheet_title(name, seen), df
+
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        _WRITERS[fmt](tmp, titled())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    _purge_stale(folder, filename)
+    return path
+
+
+# ============ أزرار التنزيل ============
+def download_controls(sheets_factory, filename: str, key: str, label: str, fmt: str = "xlsx", context=None):
+    """زر "تجهيز" ثم زر تنزيل للملف المحفوظ — لا يُبنى أي ملف في إعادة التشغيل العادية للصفحة
+
+    context: ما يحدد محتوى الملف (الورقة، النطاق...)؛ إذا تغير يختفي زر التنزيل القديم.
+    """
+    state_key = f"data_export_{key}"
+    token = repr(context)
+    name = _SAFE_NAME.sub("_", key)
+    if st.button(label, key=f"btn_{key}"):
+        with st.spinner("جاري تجهيز الملف..."):
+            st.session_state[state_key] = (token, prepare_export(sheets_factory, fmt, name=name))
+    prepared = st.session_state.get(state_key)
+    if prepared and prepared[0] == token:
+        try:
+            with open(prepared[1], "rb") as f:
+                st.download_button(f"📥 تنزيل {filename}", f, filename, MIME_TYPES[fmt], key=f"dl_{key}")
+            _touch(prepared[1])
+        except FileNotFoundError:
+            st.session_state.pop(state_key, None)
+            st.info("انتهت صلاحية الملف المجهز؛ اضغط زر التجهيز مرة أخرى.")
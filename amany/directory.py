@@ -0,0 +1,139 @@
+# amany/directory.py — فهرس دليل المنشآت: اسم موحد ← سجل مختصر، مع بحث بالبادئة وبحث تقريبي بالعربية
+import bisect
+import difflib
+from dataclasses import dataclass
+
+import pandas as pd
+import streamlit as st
+
+from amany.arabic_text import normalize_arabic
+from amany.workbooks import file_signature, read_sheet
+
+
+@dataclass(frozen=True)
+class FacilityRecord:
+    name: str
+    manager: str
+    phone: str
+    facility_type: str = ""
+
+
+def _find_column(columns, *words):
+    return next((col for col in columns if any(w in str(col) for w in words)), None)
+
+
+def _text(value) -> str:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def format_phone(value) -> str:
+    """رقم التليفون كنص بصفر في البداية (الخلية قد تكون رقماً فيُحذف الصفر)"""
+    phone = _text(value)
+    if phone and phone.isdigit() and not phone.startswith("0"):
+        phone = "0" + phone
+    return phone
+
+
+class FacilityDirectory:
+    """سجلات المنشآت مفهرسة بالاسم الموحد"""
+
+    def __init__(self, records: list, has_type: bool = False):
+        self.names = [r.name for r in records]
+        self.has_type = has_type
+        self._records = {}
+        for r in records:
+            self._records.setdefault(normalize_arabic(r.name), r)
+        self._order = {key: i for i, key in enumerate(self._records)}
+        # نفس المفاتيح بدون مسافات ("ابو زنيمه" و"ابوزنيمه")
+        self._compact = {key.replace(" ", ""): key for key in self._records}
+        # (كلمة، مفتاح) مرتبة للبحث بالبادئة عن أي كلمة في الاسم
+        self._words = sorted({(w, key) for key in self._records for w in key.split()})
+        self._word_list = [w for w, _ in self._words]
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, name: str):
+        return self._records.get(normalize_arabic(name))
+
+    def _prefix_keys(self, prefix: str) -> list:
+        i = bisect.bisect_left(self._word_list, prefix)
+        keys = []
+        while i < len(self._words) and self._words[i][0].startswith(prefix):
+            keys.append(self._words[i][1])
+            i += 1
+        return keys
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """أسماء المنشآت مرتبة: تطابق تام، ثم بداية الاسم، ثم بداية كلمة، ثم جزء من الاسم، ثم تقريبي"""
+        q = normalize_arabic(query)
+        if not q:
+            return self.names[:limit]
+        ranked = {}
+
+        def add(key, rank):
+            if key not in ranked or rank < ranked[key]:
+                ranked[key] = rank
+
+        if q in self._records:
+            add(q, 0)
+        elif q.replace(" ", "") in self._compact:
+            add(self._compact[q.replace(" ", "")], 0)
+        words = q.split()
+        # كل كلمة في الاستعلام يجب أن تكون بداية كلمة في الاسم
+        candidates = None
+        for w in words:
+            found = set(self._prefix_keys(w))
+            candidates = found if candidates is None else candidates & found
+        for key in candidates or ():
+            add(key, 1 if key.startswith(q) else 2)
+        if len(ranked) < limit:
+            for key in self._records:
+                if q in key:
+                    add(key, 3)
+        if len(ranked) < limit:
+            for key in difflib.get_close_matches(q, self._records, n=limit, cutoff=0.6):
+                add(key, 4)
+            for compact in difflib.get_close_matches(q.replace(" ", ""), self._compact, n=limit, cutoff=0.6):
+                add(self._compact[compact], 4)
+
+        keys = sorted(ranked, key=lambda k: (ranked[k], self._order[k]))
+        return [self._records[k].name for k in keys[:limit]]
+
+
+def build_directory(df: pd.DataFrame):
+    """بناء الفهرس من جدول المنشآت، أو None إذا لم توجد أعمدة الاسم والمدير والتليفون"""
+    facility_col = _find_column(df.columns, "منشأة")
+    manager_col = _find_column(df.columns, "مدير", "اسم")
+    phone_col = _find_column(df.columns, "تليفون", "هاتف")
+    type_col = _find_column(df.columns, "نوع")
+    if not (facility_col and manager_col and phone_col):
+        return None
+
+    records = []
+    for row in df.itertuples(index=False):
+        row = dict(zip(df.columns, row))
+        name = _text(row[facility_col])
+        if not name:
+            continue
+        records.append(FacilityRecord(
+            name=name,
+            manager=_text(row[manager_col]),
+            phone=format_phone(row[phone_col]),
+            facility_type=_text(row[type_col]) if type_col else "",
+        ))
+    return FacilityDirectory(records, has_type=type_col is not None)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _directory_for(signature: tuple):
+    return build_directory(read_sheet(signature[0]))
+
+
+def facility_directory(path: str):
+    """فهرس دليل المنشآت من ملف Excel — يُبنى مرة واحدة لكل نسخة من الملف"""
+    return _directory_for(file_signature(path))
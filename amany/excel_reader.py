@@ -0,0 +1,158 @@
+# amany/excel_reader.py — قارئ Excel قابل للتبديل: calamine (Rust) إن وُجد وإلا openpyxl
+from datetime import date, datetime, time
+from itertools import islice
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+# ============ اختيار المحرك ============
+try:
+    from python_calamine import CalamineWorkbook
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+ENGINES = ("calamine", "openpyxl")
+DEFAULT_ENGINE = "calamine" if CALAMINE_AVAILABLE else "openpyxl"
+
+
+def _resolve_engine(engine):
+    engine = engine or DEFAULT_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"محرك غير معروف: {engine}")
+    if engine == "calamine" and not CALAMINE_AVAILABLE:
+        engine = "openpyxl"
+    return engine
+
+
+# ============ تحويل الخلايا ============
+_EXCEL_ERRORS = {"#DIV/0!", "#N/A", "#NAME?", "#NULL!", "#NUM!", "#REF!", "#VALUE!", "#GETTING_DATA"}
+
+
+def _convert_cell(v):
+    """توحيد قيم الخلايا بين المحركين كما يفعل pd.read_excel (الفارغ وخلايا الأخطاء = NaN)"""
+    if v is None or v == "" or (isinstance(v, str) and v in _EXCEL_ERRORS):
+        return None
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    # calamine يُرجع التواريخ بدون وقت كـ date؛ pd.read_excel يُرجعها datetime
+    if isinstance(v, date) and not isinstance(v, datetime):
+        return datetime.combine(v, time())
+    return v
+
+
+def _trim(rows: list) -> list:
+    """حذف الخلايا والصفوف الفارغة في النهاية وتوحيد عرض الصفوف"""
+    for r in rows:
+        while r and r[-1] is None:
+            r.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    width = max((len(r) for r in rows), default=0)
+    return [r + [None] * (width - len(r)) for r in rows]
+
+
+def _selector(usecols):
+    """دالة تأخذ الأعمدة المطلوبة فقط من الصف (الأعمدة بعد نهاية الصف = None)"""
+    if usecols is None:
+        return lambda row: row
+    if not usecols:
+        return lambda row: []
+    pick = itemgetter(*usecols)
+    width = max(usecols) + 1
+    if len(usecols) == 1:
+        return lambda row: [pick(row + [None] * (width - len(row)) if len(row) < width else row)]
+    return lambda row: list(pick(row + [None] * (width - len(row)) if len(row) < width else row))
+
+
+# ============ القراءة ============
+def sheet_names(path: str, engine: str = None) -> list:
+    """أسماء الأوراق دون قراءة محتواها"""
+    engine = _resolve_engine(engine)
+    if engine == "calamine":
+        return list(CalamineWorkbook.from_path(path).sheet_names)
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def read_rows(path: str, sheet_name, usecols=None, nrows: int = None, engine: str = None) -> list:
+    """صفوف ورقة واحدة كقوائم قيم — تُقرأ الورقة المطلوبة فقط والأعمدة المطلوبة فقط
+
+    usecols: أرقام الأعمدة (تبدأ من 0) أو None لكل الأعمدة.
+    الصفوف الفارغة في النهاية (ضمن الأعمدة المختارة) تُحذف.
+    """
+    engine = _resolve_engine(engine)
+    usecols = None if usecols is None else list(usecols)
+
+    select = _selector(usecols)
+
+    if engine == "calamine":
+        wb = CalamineWorkbook.from_path(path)
+        try:
+            if isinstance(sheet_name, int):
+                sheet_name = wb.sheet_names[sheet_name]
+            sheet = wb.get_sheet_by_name(sheet_name)
+            # صف بعد صف حتى nrows، ومن كل صف الأعمدة المطلوبة فقط قبل تحويل القيم
+            rows = [[_convert_cell(v) for v in select(r)] for r in islice(sheet.iter_rows(), nrows)]
+        finally:
+            wb.close()
+        return _trim(rows)
+
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name]
+        # أبعاد الورقة المحفوظة في الملف قد تكون قديمة فتقطع الصفوف (pandas يفعل نفس الشيء)
+        ws.reset_dimensions()
+        bounds = {}
+        if usecols:
+            offset = min(usecols)
+            bounds = {"min_col": offset + 1, "max_col": max(usecols) + 1}
+            select = _selector([i - offset for i in usecols])
+        rows = [[_convert_cell(v) for v in select(list(r))]
+                for r in ws.iter_rows(values_only=True, max_row=nrows, **bounds)]
+        return _trim(rows)
+    finally:
+        wb.close()
+
+
+def iter_rows(source, sheet_name=0, engine: str = None):
+    """صفوف الورقة واحداً تلو الآخر (مسار أو ملف مرفوع) دون تحميل الورقة كلها في قائمة"""
+    engine = _resolve_engine(engine)
+    if engine == "calamine":
+        wb = CalamineWorkbook.from_object(source)
+        try:
+            sheet = wb.get_sheet_by_index(sheet_name) if isinstance(sheet_name, int) else wb.get_sheet_by_name(sheet_name)
+            for r in sheet.iter_rows():
+                yield [_convert_cell(v) for v in r]
+        finally:
+            wb.close()
+        return
+
+    import openpyxl
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name]
+        for r in ws.iter_rows(values_only=True):
+            yield [_convert_cell(v) for v in r]
+    finally:
+        wb.close()
+
+
+def read_grid(path: str, sheet_name=0, usecols=None, nrows: int = None, engine: str = None) -> pd.DataFrame:
+    """الورقة كشبكة DataFrame بدون عناوين (مثل pd.read_excel(header=None))"""
+    rows = read_rows(path, sheet_name, usecols=usecols, nrows=nrows, engine=engine)
+    grid = pd.DataFrame(rows)
+    if usecols is not None and grid.shape[1] == len(usecols):
+        grid.columns = list(usecols)
+    grid = grid.infer_objects()
+    # الخلايا الفارغة NaN وليس None، كما في pd.read_excel
+    for i in np.flatnonzero((grid.dtypes == object).to_numpy()):
+        col = grid.iloc[:, i]
+        grid.isetitem(i, col.where(col.notna(), np.nan))
+    return grid
@@ -0,0 +1,204 @@
+# amany/facility_analytics.py — نموذج تحليلات لكل منشأة (تشغيلي ومالي) محسوب مسبقاً في الخلفية
+import dataclasses
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import streamlit as st
+
+from amany.arabic_text import normalize_arabic
+from amany.catalog import workbook_catalog
+from amany.layouts import FACILITY_LAYOUTS, FACILITY_LAYOUTS_FILE, WorkbookLayout, facility_layouts, load_layout
+from amany.workbooks import sheet_names
+
+CENTER_FOLDER = "Center"
+# التخطيط الافتراضي لملفات المنشآت غير المسجلة (نفس قالب ملفات الرويسات)
+TEMPLATE_FACILITY = "الرويسات"
+# كلمات في اسم الملف تحدد نوعه داخل Center/<المنشأة>/
+VIEW_FILE_KEYWORDS = {
+    "operational": ("dashboard", "تشغيل", "اداء"),
+    "financial": ("financial", "مالي"),
+}
+_NAME_PREFIXES = ("مركز طب اسره", "مركز طب الاسره", "وحده طب اسره", "وحده طب الاسره", "مركز", "وحده")
+
+
+# ============ تحديد ملفات المنشأة ============
+def _short_key(name: str) -> str:
+    """اسم المنشأة بدون "مركز طب أسرة" وما شابه، موحد وبدون مسافات"""
+    text = normalize_arabic(name)
+    for prefix in _NAME_PREFIXES:
+        if text.startswith(prefix + " "):
+            text = text[len(prefix) + 1:]
+            break
+    return text.replace(" ", "")
+
+
+def facility_folder(facility_name: str, center: str = CENTER_FOLDER):
+    """المجلد Center/<المنشأة> المطابق لاسم المنشأة، أو None"""
+    key = _short_key(facility_name)
+    if not key:
+        return None
+    try:
+        with os.scandir(center) as it:
+            for e in it:
+                if e.is_dir() and _short_key(e.name) and (_short_key(e.name) in key or key in _short_key(e.name)):
+                    return e.path
+    except OSError:
+        pass
+    return None
+
+
+def locate_layouts(facility_name: str, center: str = CENTER_FOLDER) -> dict:
+    """تخطيطات المنشأة: المسجلة في layouts، وإلا ملفات Center/<المنشأة> بقالب التخطيط الافتراضي"""
+    layouts = facility_layouts(facility_name)
+    if layouts:
+        return layouts
+    folder = facility_folder(facility_name, center)
+    if folder is None:
+        return {}
+    files = sorted(f for f in os.listdir(folder) if f.endswith((".xlsx", ".xls")) and not f.startswith("~$"))
+    found = {}
+    for view, spec in FACILITY_LAYOUTS[TEMPLATE_FACILITY].items():
+        match = next((f for f in files if any(k in normalize_arabic(f) for k in VIEW_FILE_KEYWORDS[view])), None)
+        if match:
+            found[view] = dataclasses.replace(WorkbookLayout.from_dict(spec), file=match, folder=folder)
+    return found
+
+
+def _signature(layouts: dict) -> tuple:
+    sig = []
+    for view, layout in sorted(layouts.items()):
+        path = os.path.join(layout.folder, layout.file)
+        try:
+            st_ = os.stat(path)
+            sig.append((view, path, st_.st_mtime_ns, st_.st_size))
+        except OSError:
+            sig.append((view, path, None, None))
+    return tuple(sig)
+
+
+def _registry_stamp():
+    try:
+        st_ = os.stat(FACILITY_LAYOUTS_FILE)
+        return st_.st_mtime_ns, st_.st_size
+    except OSError:
+        return None
+
+
+# ============ النموذج ============
+@dataclass
+class FacilityModel:
+    facility: str
+    signature: tuple
+    layouts: dict
+    operational: dict = field(default_factory=dict)  # اسم الورقة ← LayoutFrame
+    financial: object = None                          # LayoutFrame أو None
+    errors: dict = field(default_factory=dict)
+    stamp: tuple = None                               # (نسخة الفهرس، facility_layouts.json) وقت البناء
+
+    @property
+    def has_analytics(self) -> bool:
+        return bool(self.operational) or self.financial is not None or bool(self.errors)
+
+
+def build_facility_model(facility_name: str, layouts: dict = None, memory: bool = True) -> FacilityModel:
+    """قراءة كل أوراق الملف التشغيلي والملف المالي للمنشأة مرة واحدة
+
+    memory=False: القراءة عبر كاش القرص فقط بدون أي استدعاء لـ Streamlit (لخيوط الخلفية)
+    """
+    layouts = locate_layouts(facility_name) if layouts is None else layouts
+    model = FacilityModel(facility_name, _signature(layouts), layouts)
+
+    op_layout = layouts.get("operational")
+    if op_layout:
+        path = os.path.join(op_layout.folder, op_layout.file)
+        if not os.path.exists(path):
+            model.errors["operational"] = f"ملف `{op_layout.file}` غير موجود في مجلد `{op_layout.folder}`."
+        else:
+            try:
+                for sheet in sheet_names(path, memory=memory):
+                    model.operational[sheet] = load_layout(op_layout, sheet_name=sheet, memory=memory)
+            except Exception as e:
+                model.errors["operational"] = f"حدث خطأ أثناء قراءة الملف التشغيلي: {e}"
+
+    fin_layout = layouts.get("financial")
+    if fin_layout:
+        path = os.path.join(fin_layout.folder, fin_layout.file)
+        if not os.path.exists(path):
+            model.errors["financial"] = f"ملف `{fin_layout.file}` غير موجود في مجلد `{fin_layout.folder}`."
+        else:
+            try:
+                model.financial = load_layout(fin_layout, memory=memory)
+            except Exception as e:
+                model.errors["financial"] = f"حدث خطأ أثناء تحليل الملف المالي: {e}"
+    return model
+
+
+class FacilityModelCache:
+    """نماذج كل المنشآت في الذاكرة، تُحسب في الخلفية ويعاد بناء نموذج المنشأة فقط عند تغير ملفاتها
+
+    catalog: فهرس WorkbookCatalog — ما دامت نسخته وملف facility_layouts.json بلا تغيير تُعد النماذج
+    حديثة دون فحص المجلدات؛ عند تغيرهما يُعاد تحديد ملفات كل منشأة مرة واحدة.
+    """
+
+    def __init__(self, catalog=None, workers: int = 2):
+        self.catalog = catalog
+        self._models = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="facility-model")
+
+    def _stamp(self):
+        version = self.catalog.version if self.catalog is not None else None
+        return version, _registry_stamp()
+
+    def _build_and_store(self, facility_name: str, stamp=None, memory: bool = True) -> FacilityModel:
+        # البصمة تؤخذ قبل القراءة: تغير أثناء البناء يظهر كنسخة أحدث في الفحص التالي
+        stamp = self._stamp() if stamp is None else stamp
+        model = build_facility_model(facility_name, memory=memory)
+        model.stamp = stamp
+        with self._lock:
+            self._models[facility_name] = model
+            self._pending.pop(facility_name, None)
+        return model
+
+    def _is_fresh(self, facility_name: str, stamp):
+        with self._lock:
+            model = self._models.get(facility_name)
+        if model is None:
+            return None
+        if self.catalog is not None and model.stamp == stamp:
+            return model
+        if _signature(locate_layouts(facility_name)) != model.signature:
+            return None
+        model.stamp = stamp
+        return model
+
+    def precompute(self, facility_names):
+        """جدولة بناء نماذج المنشآت غير المحسوبة أو التي تغيرت ملفاتها"""
+        stamp = self._stamp()
+        for name in facility_names:
+            if self._is_fresh(name, stamp) is not None:
+                continue
+            with self._lock:
+                if name in self._pending:
+                    continue
+                self._pending[name] = self._pool.submit(self._build_and_store, name, stamp, False)
+
+    def get(self, facility_name: str) -> FacilityModel:
+        """نموذج المنشأة — من الذاكرة، أو انتظار البناء الجاري، أو بناؤه الآن"""
+        stamp = self._stamp()
+        model = self._is_fresh(facility_name, stamp)
+        if model is not None:
+            return model
+        with self._lock:
+            pending = self._pending.get(facility_name)
+        if pending is not None:
+            return pending.result()
+        return self._build_and_store(facility_name, stamp)
+
+
+@st.cache_resource(show_spinner=False)
+def facility_model_cache() -> FacilityModelCache:
+    return FacilityModelCache(workbook_catalog())
@@ -0,0 +1,90 @@
+# amany/financial_panel.py — لوحة مالية موحدة: كل الأوراق المختارة على محور أشهر مشترك في مصفوفة واحدة (ورقة × شهر × مؤشر)
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class FinancialPanel:
+    sheets: list
+    periods: pd.PeriodIndex
+    kpis: list
+    values: np.ndarray   # (ورقة، شهر، مؤشر) — NaN حيث لا توجد قيمة
+    present: np.ndarray  # (ورقة، مؤشر) — هل المؤشر موجود في الورقة
+    errors: dict
+
+    @property
+    def empty(self) -> bool:
+        return not self.sheets or not len(self.periods)
+
+    def common_kpis(self) -> list:
+        """المؤشرات الموجودة في كل الأوراق المحملة"""
+        if not self.sheets:
+            return []
+        mask = self.present.all(axis=0)
+        return [k for k, ok in zip(self.kpis, mask) if ok]
+
+    def period_slice(self, end=None, start=None) -> slice:
+        lo = 0 if start is None else int(self.periods.searchsorted(pd.Period(start, "M"), side="left"))
+        hi = len(self.periods) if end is None else int(self.periods.searchsorted(pd.Period(end, "M"), side="right"))
+        return slice(lo, hi)
+
+    def kpi(self, kpi: str, end=None, start=None) -> pd.DataFrame:
+        """مؤشر واحد: صف لكل شهر وعمود لكل ورقة (عرض من المصفوفة بدون نسخ لكل ورقة)"""
+        j = self.kpis.index(kpi)
+        rows = self.period_slice(end, start)
+        return pd.DataFrame(self.values[:, rows, j].T, index=self.periods[rows].to_timestamp(),
+                            columns=self.sheets)
+
+    def sheet(self, name: str, end=None, start=None) -> pd.DataFrame:
+        """ورقة واحدة: صف لكل شهر وعمود لكل مؤشر موجود فيها"""
+        i = self.sheets.index(name)
+        rows = self.period_slice(end, start)
+        cols = np.flatnonzero(self.present[i])
+        return pd.DataFrame(self.values[i, rows][:, cols], index=self.periods[rows].to_timestamp(),
+                            columns=[self.kpis[j] for j in cols])
+
+
+def build_panel(frames: dict, errors: dict = None) -> FinancialPanel:
+    """محاذاة أوراق parse_sheet (فهرس تاريخ أول الشهر) على محور أشهر واحد"""
+    # الأعمدة الرقمية فقط (عمود Month النصي ليس مؤشراً)
+    frames = {name: df.select_dtypes("number") for name, df in frames.items() if df is not None and not df.empty}
+    sheets = list(frames)
+    kpis = list(dict.fromkeys(c for df in frames.values() for c in df.columns))
+    period_sets = [pd.PeriodIndex(df.index, freq="M") for df in frames.values()]
+    periods = (period_sets[0].append(period_sets[1:]).unique().sort_values()
+               if period_sets else pd.PeriodIndex([], freq="M"))
+
+    values = np.full((len(sheets), len(periods), len(kpis)), np.nan)
+    present = np.zeros((len(sheets), len(kpis)), dtype=bool)
+    kpi_pos = {k: j for j, k in enumerate(kpis)}
+    for i, (name, df) in enumerate(frames.items()):
+        # أكثر من صف لنفس الشهر: آخر صف (نفس ما يظهر عند الترتيب بالتاريخ)
+        numeric = df[~period_sets[i].duplicated(keep="last")]
+        rows = periods.get_indexer(pd.PeriodIndex(numeric.index, freq="M"))
+        cols = np.array([kpi_pos[c] for c in numeric.columns], dtype=np.int64)
+        values[i, rows[:, None], cols[None, :]] = numeric.to_numpy(dtype=float, na_value=np.nan)
+        present[i, cols] = True
+    return FinancialPanel(sheets, periods, kpis, values, present, dict(errors or {}))
+
+
+def load_panel(sheet_names, fetch, prefetch=None) -> FinancialPanel:
+    """بناء اللوحة من الأوراق المختارة؛ fetch(اسم الورقة) -> DataFrame
+
+    prefetch(الأسماء) -> {اسم: خطأ}: جلب الخلايا الخام لكل الأوراق بالتوازي أولاً (مثل
+    amany.sheets.workbook_values)، ثم يُستدعى fetch لكل ورقة في نفس الخيط فيقرأ من الكاش.
+    ترتيب الأوراق في اللوحة = ترتيب الاختيار، والأوراق التي فشل جلبها تُسجل في errors.
+    """
+    sheet_names = list(dict.fromkeys(sheet_names))
+    frames, errors = {}, {}
+    if sheet_names and prefetch is not None:
+        errors.update(prefetch(sheet_names))
+    for name in sheet_names:
+        if name in errors:
+            continue
+        try:
+            frames[name] = fetch(name)
+        except Exception as e:
+            errors[name] = str(e)
+    return build_panel(frames, errors)
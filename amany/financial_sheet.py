@@ -0,0 +1,126 @@
+# amany/financial_sheet.py — تحليل أوراق البيانات المالية: تخطيط العناوين (محفوظ ببصمة صفوف العناوين) وتحويل الأعمدة دفعة واحدة
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+HEADER_ROWS = 3
+MONTH_COLUMN = "Month"
+DATE_INDEX = "__MonthDate__"
+_LAYOUT_CACHE_SIZE = 256
+_EMPTY_NUMBERS = ["", "-", "—"]
+
+
+# ============ العناوين ============
+def make_headers_unique(headers: list) -> list:
+    seen = {}
+    out = []
+    for h in headers:
+        h = str(h)
+        if h not in seen:
+            seen[h] = 0
+            out.append(h)
+        else:
+            seen[h] += 1
+            out.append(f"{h}.{seen[h]}")
+    return out
+
+
+def resolve_headers_merged(row1: list, row2: list, row3: list) -> list:
+    """عنوان كل عمود: الصف الثاني، وإلا الأول، وإلا الثالث، وإلا Unnamed"""
+    width = max(len(row1), len(row2), len(row3))
+    grid = np.full((3, width), "", dtype=object)
+    for i, row in enumerate((row2, row1, row3)):
+        grid[i, :len(row)] = [str(v).strip() for v in row]
+    filled = grid != ""
+    first = np.where(filled.any(axis=0), filled.argmax(axis=0), -1)
+    headers = np.where(first >= 0, grid[np.maximum(first, 0), np.arange(width)], "Unnamed")
+    return make_headers_unique(headers.tolist())
+
+
+@dataclass(frozen=True)
+class HeaderLayout:
+    fingerprint: str
+    headers: list        # عناوين كل الأعمدة (بعد التوحيد) — للعرض الخام
+    month_column: str    # العمود الأول: الشهر
+    kpi_columns: list    # باقي الأعمدة: مؤشرات رقمية
+    dtypes: dict         # نوع كل عمود في الجدول المعالج
+
+
+def header_fingerprint(header_rows) -> str:
+    """بصمة صفوف العناوين — أوراق بنفس العناوين (ونفس الورقة بين التحديثات) لها نفس البصمة"""
+    payload = json.dumps([[str(v) for v in row] for row in header_rows], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+_LAYOUTS = OrderedDict()
+
+
+def header_layout(row1: list, row2: list, row3: list) -> HeaderLayout:
+    """تخطيط الورقة من صفوف العناوين الثلاثة؛ يُحسب مرة واحدة لكل بصمة"""
+    key = header_fingerprint((row1, row2, row3))
+    layout = _LAYOUTS.get(key)
+    if layout is not None:
+        _LAYOUTS.move_to_end(key)
+        return layout
+
+    headers = resolve_headers_merged(row1, row2, row3)
+    month_column, kpi_columns = (headers[0], headers[1:]) if headers else ("", [])
+    dtypes = {MONTH_COLUMN: "str", **{c: "float64" for c in kpi_columns}}
+    layout = HeaderLayout(key, headers, month_column, kpi_columns, dtypes)
+    _LAYOUTS[key] = layout
+    if len(_LAYOUTS) > _LAYOUT_CACHE_SIZE:
+        _LAYOUTS.popitem(last=False)
+    return layout
+
+
+# ============ التحليل ============
+def _parse_months(month_series: pd.Series) -> pd.Series:
+    """الصيغة المعتادة (شهر/سنة) دفعة واحدة أولاً، ثم التحليل العام للباقي فقط"""
+    dates = pd.to_datetime(month_series, format="%m/%Y", errors="coerce")
+    mask = dates.isna() & (month_series != "")
+    if mask.any():
+        dates.loc[mask] = pd.to_datetime(month_series[mask], errors="coerce")
+    return dates.dt.to_period("M").dt.to_timestamp()
+
+
+def _clean_numbers(cells: np.ndarray) -> np.ndarray:
+    """كل خلايا المؤشرات مرة واحدة: حذف الفواصل و%، والفارغ و- = 0، وغير الرقمي = 0"""
+    flat = (pd.Series(cells.ravel(), dtype=object).astype(str)
+            .str.replace(",", "", regex=False)
+            .str.replace("%", "", regex=False)
+            .replace(_EMPTY_NUMBERS, "0"))
+    return pd.to_numeric(flat, errors="coerce").fillna(0).to_numpy(dtype=float).reshape(cells.shape)
+
+
+def parse_sheet(all_values):
+    """(جدول معالج بفهرس أول الشهر، تخطيط العناوين، الصفوف الخام)
+
+    الصفوف الخام تبدأ من الصف الثالث وتُعرض بعناوين layout.headers،
+    فلا يحتاج العرض الخام لجلب الورقة أو حل العناوين مرة أخرى.
+    """
+    if not all_values or len(all_values) < HEADER_ROWS:
+        return pd.DataFrame(), None, []
+
+    layout = header_layout(*all_values[:HEADER_ROWS])
+    rows = all_values[HEADER_ROWS - 1:]
+    width = len(layout.headers)
+    if not width:
+        return pd.DataFrame(), layout, rows
+
+    cells = np.full((len(rows), width), "", dtype=object)
+    for i, row in enumerate(rows):
+        cells[i, :min(len(row), width)] = row[:width]
+
+    month_series = pd.Series(cells[:, 0], dtype=object).astype(str).str.strip()
+    dates = _parse_months(month_series)
+    keep = dates.notna().to_numpy()
+
+    proc = pd.DataFrame(_clean_numbers(cells[keep, 1:]), columns=layout.kpi_columns,
+                        index=pd.DatetimeIndex(dates[keep], name=DATE_INDEX))
+    proc.insert(0, MONTH_COLUMN, month_series[keep].to_numpy())
+    proc = proc.astype(layout.dtypes).sort_index(kind="stable")
+    return proc, layout, rows
@@ -0,0 +1,43 @@
+# amany/formatting.py — تجهيز الأعمدة الرقمية للعرض بدون Styler
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+_BLANKS = ("", "nan", "None", "-", "—")
+
+
+def coerce_numeric_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """تحويل الأعمدة النصية التي كل قيمها أرقام (مع الفواصل) إلى أعمدة رقمية، عموداً عموداً
+
+    بديل pd.to_numeric(errors="ignore"): العمود يتحول فقط إذا كانت كل خلاياه غير الفارغة أرقاماً.
+    """
+    if df.empty:
+        return df
+    columns = []
+    for i in range(df.shape[1]):
+        s = df.iloc[:, i]
+        if s.dtype == object or pd.api.types.is_string_dtype(s):
+            txt = s.astype(str).str.replace(",", "", regex=False).str.strip()
+            num = pd.to_numeric(txt, errors="coerce")
+            blank = s.isna().to_numpy() | txt.isin(_BLANKS).to_numpy()
+            parsed = num.notna().to_numpy()
+            if parsed.any() and (parsed | blank).all():
+                s = num
+        columns.append(s)
+    out = pd.concat(columns, axis=1)
+    out.columns = df.columns
+    return out
+
+
+def number_column_config(df: pd.DataFrame, fmt: str = "%,d") -> dict:
+    """إعداد أعمدة st.dataframe الرقمية بفواصل الآلاف — التنسيق يتم في المتصفح والقيم تبقى أرقاماً"""
+    numeric_cols = df.select_dtypes(include=np.number).columns
+    return {col: st.column_config.NumberColumn(format=fmt) for col in numeric_cols}
+
+
+def round_numeric_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """تقريب الأعمدة العشرية لأقرب عدد صحيح دفعة واحدة (مطابق لـ "{:,.0f}")"""
+    float_cols = df.select_dtypes(include="float").columns
+    if len(float_cols):
+        df[float_cols] = np.rint(df[float_cols].to_numpy())
+    return df
@@ -0,0 +1,228 @@
+# amany/inventory.py — محرك المخزون الدوائي: حدود المجموعات، الأيام المتوقعة، الأصناف المنتهية وتقرير النواقص
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# ============ أعمدة ملف المخزون ============
+NAME = "اسم الدواء"
+NAME_ALT = "الصنف"
+DRUG_TYPE = "نوع الدواء"
+STOCK = "المخزون الحالي"
+ACTIVE = "المادة الفعالة"
+CONCENTRATION = "التركيز"
+UNIT = "نوع الوحدة"
+UNIT_PRICE = "سعر الوحدة"
+DAILY_OUT = "المنصرف اليومي"
+DAILY_IN = "الوارد اليومي"
+FIXED_COLUMNS = [NAME, DRUG_TYPE, STOCK, ACTIVE, CONCENTRATION, UNIT, UNIT_PRICE, DAILY_OUT, DAILY_IN]
+
+CONSUMED_COLUMNS = ("الكمية المستهلكة", "المنصرف")
+INCOMING_COLUMNS = ("الكمية الواردة", "الوارد")
+
+# القيم الافتراضية عند حفظ البيانات الأساسية (كما في saveBaseData)
+BASE_DEFAULTS = {ACTIVE: "غير معروف", CONCENTRATION: "غير معروف", UNIT: "وحدة",
+                 UNIT_PRICE: 0, DRUG_TYPE: "غير أساسي", DAILY_OUT: 0, DAILY_IN: 0}
+
+# مضاعفات متوسط الاستهلاك الشهري: (حد الكفاية، حد الأمان، حد الخطر)
+THRESHOLD_MULTIPLIERS = {
+    "حيوي": (3.0, 2.0, 1.0),
+    "أساسي": (2.5, 1.5, 1.0),
+    "غير أساسي": (2.0, 1.5, 1.0),
+}
+DEFAULT_DRUG_TYPE = "أساسي"
+TOP_MONTHS = 3
+DAYS_PER_MONTH = 30
+
+STATUS_NEED = "احتياج"
+STATUS_IDLE = "راكد"
+
+REPORT_COLUMNS = ["اسم الدواء", "المادة الفعالة", "التركيز", "نوع الوحدة", "أعلى 3 شهور",
+                  "متوسط الاستهلاك", "حد الأمان", "حد الخطر", "حد الكفاية", "المخزون الحالي",
+                  "المنصرف اليومي", "الوارد اليومي", "الكمية المتبقية", "الكمية المطلوبة",
+                  "سعر الوحدة", "عدد الأيام المتوقع", "حالة الصنف"]
+
+
+# ============ أدوات ============
+def _numbers(s: pd.Series) -> np.ndarray:
+    """parseFloat(x) || 0"""
+    return pd.to_numeric(s, errors="coerce").fillna(0).to_numpy(dtype=float)
+
+
+def _text(df: pd.DataFrame, col: str, default: str) -> pd.Series:
+    """item[col] || default — الفارغ والصفر يعتبران غير موجودين"""
+    if col not in df.columns:
+        return pd.Series(default, index=df.index, dtype=object)
+    s = df[col]
+    missing = s.isna() | s.astype(str).str.strip().isin(["", "0"])
+    return s.astype(str).str.strip().where(~missing, default)
+
+
+def drug_names(df: pd.DataFrame) -> pd.Series:
+    """اسم الدواء أو الصنف"""
+    name = df[NAME] if NAME in df.columns else pd.Series(None, index=df.index, dtype=object)
+    if NAME_ALT in df.columns:
+        name = name.where(name.notna() & (name.astype(str).str.strip() != ""), df[NAME_ALT])
+    return name.map(lambda v: None if pd.isna(v) else str(v).strip())
+
+
+def month_columns(df: pd.DataFrame) -> list:
+    """أعمدة الاستهلاك الشهري = كل الأعمدة غير الثابتة التي بها أرقام"""
+    cols = []
+    for col in df.columns:
+        if col in FIXED_COLUMNS or col == NAME_ALT:
+            continue
+        if pd.to_numeric(df[col], errors="coerce").notna().any():
+            cols.append(col)
+    return cols
+
+
+def prepare_base(df: pd.DataFrame) -> pd.DataFrame:
+    """البيانات الأساسية بعد إضافة الحقول الناقصة (saveBaseData)"""
+    df = df.copy()
+    for col, default in BASE_DEFAULTS.items():
+        if col not in df.columns:
+            df[col] = default
+        else:
+            blank = df[col].isna() | df[col].astype(str).str.strip().isin(["", "0"])
+            df[col] = df[col].astype(object).where(~blank, default)
+    if NAME not in df.columns:
+        df.insert(0, NAME, drug_names(df))
+    return df
+
+
+# ============ المؤشرات ============
+@dataclass
+class InventoryReport:
+    items: pd.DataFrame      # صف لكل دواء (أعمدة REPORT_COLUMNS + "مستوى" + "منتهي" + "المجموعة")
+    groups: pd.DataFrame     # صف لكل مجموعة (مادة فعالة، تركيز، وحدة)
+    shortages: pd.DataFrame  # تقرير النواقص
+    zero_stock: pd.DataFrame # الأصناف المنتهية
+
+
+def _level(stock, danger, safety) -> np.ndarray:
+    return np.where(stock <= danger, "danger", np.where(stock <= safety, "warning", "safe"))
+
+
+def _days(stock, avg) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(avg > 0, np.round(stock / (avg / DAYS_PER_MONTH), 1), 0.0)
+
+
+def calculate_indicators(data: pd.DataFrame) -> InventoryReport:
+    """حدود المجموعات، الأيام المتوقعة، الكمية المطلوبة، الأصناف المنتهية والنواقص — بعمليات مجمعة"""
+    data = data.reset_index(drop=True)
+    active = _text(data, ACTIVE, "غير معروف")
+    conc = _text(data, CONCENTRATION, "غير معروف")
+    unit = _text(data, UNIT, "وحدة")
+    dtype = _text(data, DRUG_TYPE, DEFAULT_DRUG_TYPE)
+
+    # رقم المجموعة لكل صف بترتيب ظهورها الأول
+    gid, uniques = pd.factorize(pd.MultiIndex.from_arrays([active, conc, unit]), sort=False)
+    n_groups = len(uniques)
+
+    months = month_columns(data)
+    month_values = np.column_stack([_numbers(data[c]) for c in months]) if months else np.zeros((len(data), 0))
+    monthly_totals = np.zeros((n_groups, month_values.shape[1]))
+    np.add.at(monthly_totals, gid, month_values)
+    top = -np.sort(-monthly_totals, axis=1)[:, :TOP_MONTHS]
+    avg = top.mean(axis=1) if top.shape[1] else np.zeros(n_groups)
+
+    group_type = dtype.groupby(gid).first().reindex(range(n_groups)).to_numpy()
+    mult = np.array([THRESHOLD_MULTIPLIERS.get(t, THRESHOLD_MULTIPLIERS[DEFAULT_DRUG_TYPE]) for t in group_type]).reshape(-1, 3)
+    sufficiency, safety, danger = (avg[:, None] * mult).T
+
+    stock = _numbers(data[STOCK]) if STOCK in data.columns else np.zeros(len(data))
+    daily_out = _numbers(data[DAILY_OUT]) if DAILY_OUT in data.columns else np.zeros(len(data))
+    daily_in = _numbers(data[DAILY_IN]) if DAILY_IN in data.columns else np.zeros(len(data))
+    price = _numbers(data[UNIT_PRICE]) if UNIT_PRICE in data.columns else np.zeros(len(data))
+    zero = stock <= 0
+
+    total_stock = np.bincount(gid, weights=stock, minlength=n_groups)
+    quantity_needed = np.maximum(0, sufficiency - total_stock)
+    top_text = np.array([", ".join(f"{v:g}" for v in row) for row in top], dtype=object)
+    names = drug_names(data).fillna("غير معروف").to_numpy()
+    group_label = [f"{a} ({c})" for a, c, _ in uniques]
+
+    items = pd.DataFrame({
+        "اسم الدواء": names,
+        "المادة الفعالة": active.to_numpy(),
+        "التركيز": conc.to_numpy(),
+        "نوع الوحدة": unit.to_numpy(),
+        "أعلى 3 شهور": top_text[gid],
+        "متوسط الاستهلاك": avg[gid].round(2),
+        "حد الأمان": safety[gid].round(2),
+        "حد الخطر": danger[gid].round(2),
+        "حد الكفاية": sufficiency[gid].round(2),
+        "المخزون الحالي": stock,
+        "المنصرف اليومي": daily_out,
+        "الوارد اليومي": daily_in,
+        "الكمية المتبقية": stock.round(2),
+        "الكمية المطلوبة": np.nan,
+        "سعر الوحدة": price.round(2),
+        "عدد الأيام المتوقع": _days(stock, avg[gid]),
+        "حالة الصنف": np.where(stock > sufficiency[gid], STATUS_IDLE, STATUS_NEED),
+        "نوع الدواء": group_type[gid],
+        "مستوى": _level(stock, danger[gid], safety[gid]),
+        "منتهي": zero,
+        "المجموعة": np.asarray(group_label, dtype=object)[gid],
+    })
+
+    groups = pd.DataFrame({
+        "المجموعة": group_label,
+        "المادة الفعالة": [u[0] for u in uniques],
+        "التركيز": [u[1] for u in uniques],
+        "نوع الوحدة": [u[2] for u in uniques],
+        "نوع الدواء": group_type,
+        "أعلى 3 شهور": top_text,
+        "متوسط الاستهلاك": avg.round(2),
+        "حد الأمان": safety.round(2),
+        "حد الخطر": danger.round(2),
+        "حد الكفاية": sufficiency.round(2),
+        "المخزون الحالي": total_stock.round(2),
+        "المنصرف اليومي": np.bincount(gid, weights=daily_out, minlength=n_groups).round(2),
+        "الوارد اليومي": np.bincount(gid, weights=daily_in, minlength=n_groups).round(2),
+        "الكمية المطلوبة": quantity_needed.round(2),
+        "عدد الأيام المتوقع": _days(total_stock, avg),
+        "حالة الصنف": np.where(total_stock > sufficiency, STATUS_IDLE, STATUS_NEED),
+        "مستوى": _level(total_stock, danger, safety),
+        "عدد الأصناف": np.bincount(gid, minlength=n_groups),
+        "الأصناف المنتهية": np.bincount(gid, weights=zero, minlength=n_groups).astype(int),
+    })
+
+    zero_stock = items.loc[zero, ["اسم الدواء", "المادة الفعالة", "التركيز", "نوع الوحدة", "نوع الدواء"]].reset_index(drop=True)
+    return InventoryReport(items, groups, shortage_report(items, groups, gid, stock, danger), zero_stock)
+
+
+def shortage_report(items: pd.DataFrame, groups: pd.DataFrame, gid: np.ndarray,
+                    stock: np.ndarray, danger: np.ndarray) -> pd.DataFrame:
+    """المجموعات التي وصل إجمالي مخزونها لحد الخطر ولا يوجد بها صنف فوق حد الخطر
+
+    البدائل = أصناف المجموعة الناقصة التي ما زال بها رصيد (تحت حد الخطر لكنها غير منتهية).
+    """
+    above_danger = stock > danger[gid]
+    has_alternative = np.bincount(gid, weights=above_danger, minlength=len(groups)) > 0
+    short = (groups["المخزون الحالي"].to_numpy() <= groups["حد الخطر"].to_numpy()) & ~has_alternative
+
+    alternatives = (
+        items.loc[(stock > 0) & short[gid]]
+        .assign(_alt=lambda d: d["اسم الدواء"] + ": " + d["الكمية المتبقية"].map("{:.2f}".format).astype(str))
+        .groupby("المجموعة", sort=False)["_alt"].agg("، ".join)
+    )
+    report = groups.loc[short, ["المادة الفعالة", "التركيز", "نوع الوحدة", "المخزون الحالي", "حد الخطر",
+                                "حد الأمان", "حد الكفاية", "عدد الأيام المتوقع", "الكمية المطلوبة", "المجموعة"]]
+    report = report.rename(columns={"المخزون الحالي": "الكمية المتبقية"})
+    report["البدائل"] = report["المجموعة"].map(alternatives).fillna("لا يوجد بدائل متاحة")
+    return report.drop(columns="المجموعة").reset_index(drop=True)
+
+
+def summary_counts(report: InventoryReport) -> dict:
+    """أعداد بطاقات الملخص"""
+    level = report.items["مستوى"]
+    return {
+        "total": len(report.items),
+        "safe": int((level == "safe").sum()),
+        "warning": int((level == "warning").sum()),
+        "danger": int((level == "danger").sum()),
+        "zero": int(report.items["منتهي"].sum()),
+    }
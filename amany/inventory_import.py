@@ -0,0 +1,192 @@
+# amany/inventory_import.py — استيراد ملفات المنصرف والوارد على دفعات: قراءة متدفقة، تحقق، وتحديث واحد لسجل المخزون
+import io
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from amany import excel_reader
+from amany import inventory_ledger as ledger
+from amany.inventory import (ACTIVE, CONCENTRATION, CONSUMED_COLUMNS, DRUG_TYPE, INCOMING_COLUMNS,
+                             NAME, NAME_ALT, UNIT, UNIT_PRICE)
+
+CHUNK_ROWS = 5000
+KINDS = {"consumption": CONSUMED_COLUMNS, "incoming": INCOMING_COLUMNS}
+REJECTED_COLUMNS = ["رقم الصف", "اسم الدواء", "السبب"]
+
+
+@dataclass
+class ImportBatch:
+    kind: str
+    source: str
+    rows_read: int
+    per_drug: pd.DataFrame  # صف لكل صنف: qty, last_qty, price, type, active, conc, unit
+    changes: pd.DataFrame   # معاينة: المخزون السابق والجديد لكل صنف
+    rejected: pd.DataFrame  # الصفوف المرفوضة وسبب الرفض
+    unmatched: list = field(default_factory=list)
+    new_items: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def accepted(self) -> int:
+        return self.rows_read - len(self.rejected)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.seconds if self.seconds else 0.0
+
+
+# ============ القراءة المتدفقة ============
+def iter_chunks(upload, filename: str = "", chunk_rows: int = CHUNK_ROWS):
+    """أجزاء الملف كـ DataFrame بعناوين الصف الأول، والفهرس = رقم الصف في الملف"""
+    filename = filename or getattr(upload, "name", "")
+    if filename.lower().endswith(".csv"):
+        first_row = 2
+        for chunk in pd.read_csv(upload, chunksize=chunk_rows, dtype=object):
+            chunk.index = chunk.index + first_row
+            yield chunk
+        return
+
+    if hasattr(upload, "read") and not hasattr(upload, "seek"):
+        upload = io.BytesIO(upload.read())
+    rows = excel_reader.iter_rows(upload)
+    header = next(rows, None)
+    if header is None:
+        return
+    header = [str(h).strip() if h is not None else f"عمود {i + 1}" for i, h in enumerate(header)]
+    row_number = 2
+    while True:
+        block = list(islice(rows, chunk_rows))
+        if not block:
+            break
+        width = len(header)
+        chunk = pd.DataFrame([(r + [None] * width)[:width] for r in block], columns=header,
+                             index=range(row_number, row_number + len(block)))
+        row_number += len(block)
+        yield chunk.dropna(how="all")
+
+
+# ============ التحقق ============
+def _column(chunk: pd.DataFrame, names) -> pd.Series:
+    """أول عمود موجود من الأسماء، بقيمه الفارغة كـ NaN"""
+    out = pd.Series(np.nan, index=chunk.index, dtype=object)
+    for name in reversed(names):
+        if name in chunk.columns:
+            values = chunk[name]
+            out = values.where(values.notna() & (values.astype(str).str.strip() != ""), out)
+    return out
+
+
+def _clean_text(s: pd.Series) -> pd.Series:
+    return s.map(lambda v: "" if pd.isna(v) else str(v).strip())
+
+
+def validate_chunk(kind: str, chunk: pd.DataFrame):
+    """(الحركات المقبولة، الصفوف المرفوضة) لجزء واحد من الملف"""
+    name = _clean_text(_column(chunk, (NAME, NAME_ALT)))
+    raw_qty = _column(chunk, KINDS[kind])
+    qty = pd.to_numeric(raw_qty, errors="coerce")
+    raw_price = _column(chunk, (UNIT_PRICE,))
+    price = pd.to_numeric(raw_price, errors="coerce")
+
+    reason = pd.Series("", index=chunk.index, dtype=object)
+    reason = reason.mask(raw_price.notna() & (price.isna() | (price < 0)), "سعر غير صالح")
+    reason = reason.mask(qty < 0, "كمية سالبة")
+    reason = reason.mask(raw_qty.notna() & qty.isna(), "كمية غير رقمية")
+    reason = reason.mask(name == "", "اسم الدواء فارغ")
+    bad = reason != ""
+
+    rejected = pd.DataFrame({"رقم الصف": chunk.index[bad], "اسم الدواء": name[bad].to_numpy(),
+                             "السبب": reason[bad].to_numpy()})
+    moves = pd.DataFrame({
+        "name": name, "qty": qty.fillna(0.0), "price": price.fillna(0.0),
+        "type": _clean_text(_column(chunk, (DRUG_TYPE,))),
+        "active": _clean_text(_column(chunk, (ACTIVE,))),
+        "conc": _clean_text(_column(chunk, (CONCENTRATION,))),
+        "unit": _clean_text(_column(chunk, (UNIT,))),
+    })[~bad]
+    return moves, rejected
+
+
+def _aggregate(moves: pd.DataFrame) -> pd.DataFrame:
+    """تجميع الحركات بالاسم: مجموع الكميات، آخر كمية، آخر سعر موجب، آخر نوع ومادة غير فارغين
+
+    يقبل حركات خام أو تجميعات أجزاء سابقة (بها last_qty) فيُستخدم لكل جزء ثم لدمج الأجزاء.
+    """
+    if "last_qty" not in moves.columns:
+        moves = moves.assign(last_qty=moves["qty"])
+    per_drug = moves.groupby("name", sort=False).agg(qty=("qty", "sum"), last_qty=("last_qty", "last"))
+    for col, keep in (("price", moves["price"] > 0), ("type", moves["type"] != ""),
+                      ("active", moves["active"] != ""), ("conc", moves["conc"] != ""), ("unit", moves["unit"] != "")):
+        last = moves[keep].groupby("name", sort=False)[col].last()
+        per_drug[col] = last.reindex(per_drug.index).fillna(0.0 if col == "price" else "")
+    return per_drug
+
+
+def read_movements(kind: str, upload, filename: str = "", chunk_rows: int = CHUNK_ROWS):
+    """(تجميع الحركات لكل صنف، الصفوف المرفوضة، عدد الصفوف المقروءة) مع قراءة الملف جزءاً جزءاً"""
+    if kind not in KINDS:
+        raise ValueError(f"نوع حركة غير معروف: {kind}")
+    partials, rejected, rows_read = [], [], 0
+    for chunk in iter_chunks(upload, filename, chunk_rows):
+        rows_read += len(chunk)
+        moves, bad = validate_chunk(kind, chunk)
+        rejected.append(bad)
+        if not moves.empty:
+            # تجميع كل جزء أولاً يجعل ذاكرة الملفات الكبيرة بحجم عدد الأصناف وليس عدد الصفوف
+            partials.append(_aggregate(moves).reset_index())
+    per_drug = (_aggregate(pd.concat(partials, ignore_index=True)) if partials
+                else pd.DataFrame(columns=["qty", "last_qty", "price", "type", "active", "conc", "unit"]))
+    rejected = pd.concat(rejected, ignore_index=True) if rejected else pd.DataFrame(columns=REJECTED_COLUMNS)
+    return per_drug, rejected, rows_read
+
+
+# ============ المعاينة والحفظ ============
+def prepare_import(conn, kind: str, upload, filename: str = "", chunk_rows: int = CHUNK_ROWS) -> ImportBatch:
+    """قراءة الملف وتجهيز معاينة التغييرات من أرصدة الأصناف المتأثرة فقط (بدون نسخ المخزون كله)"""
+    start = time.perf_counter()
+    per_drug, rejected, rows_read = read_movements(kind, upload, filename, chunk_rows)
+    balances = ledger.balances_for(conn, per_drug.index)
+    matched = per_drug.index.intersection(balances.index, sort=False)
+    missing = per_drug.index.difference(balances.index, sort=False).tolist()
+
+    if kind == "consumption":
+        upd = per_drug.loc[matched]
+        old = balances.loc[matched, "stock"].to_numpy()
+        changes = pd.DataFrame({"اسم الدواء": matched, "الكمية المستهلكة": upd["qty"].to_numpy(),
+                                "المخزون السابق": old, "المخزون الجديد": old - upd["qty"].to_numpy()})
+        unmatched, new_items = missing, []
+    else:
+        upd = per_drug.loc[list(matched) + missing]
+        old = balances["stock"].reindex(upd.index).fillna(0.0).to_numpy()
+        old_price = balances["price"].reindex(upd.index).fillna(0.0).to_numpy()
+        price = upd["price"].to_numpy()
+        changes = pd.DataFrame({"اسم الدواء": upd.index, "الكمية الواردة": upd["qty"].to_numpy(),
+                                "المخزون السابق": old, "المخزون الجديد": old + upd["qty"].to_numpy(),
+                                "سعر الوحدة": price, "نوع الدواء": upd["type"].to_numpy(),
+                                "سعر متغير": (price > 0) & (price != old_price)})
+        unmatched, new_items = [], missing
+
+    return ImportBatch(kind, filename or getattr(upload, "name", ""), rows_read, per_drug, changes, rejected,
+                       unmatched, new_items, time.perf_counter() - start)
+
+
+def commit_import(conn, batch: ImportBatch) -> int:
+    """حفظ الدفعة في سجل المخزون كمعاملة واحدة (تحديث الأرصدة بالاسم)"""
+    per_drug = batch.per_drug
+    if batch.kind == "consumption":
+        names = batch.changes["اسم الدواء"]
+        rows = [(n, -q, last, None, None, None)
+                for n, q, last in zip(names, per_drug.loc[names, "qty"], per_drug.loc[names, "last_qty"])]
+        return ledger.record_movements(conn, "consumption", rows, source=batch.source)
+
+    rows = [(n, q, None, last, None, t or None)
+            for n, q, last, t in zip(per_drug.index, per_drug["qty"], per_drug["last_qty"], per_drug["type"])]
+    new = per_drug.loc[batch.new_items]
+    new_items = [(n, {ACTIVE: a or "غير معروف", CONCENTRATION: c or "غير معروف", UNIT: u or "وحدة"})
+                 for n, a, c, u in zip(new.index, new["active"], new["conc"], new["unit"])]
+    priced = batch.changes[batch.changes["سعر متغير"]]
+    prices = list(zip(priced["اسم الدواء"], priced["سعر الوحدة"]))
+    return ledger.record_movements(conn, "incoming", rows, new_items, prices, batch.source)
@@ -0,0 +1,260 @@
+# amany/inventory_ledger.py — سجل حركات المخزون (أساسي، منصرف، وارد، سعر) في SQLite مع أرصدة محدثة ولقطات مضغوطة
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from amany.inventory import DAILY_IN, DAILY_OUT, DRUG_TYPE, NAME, STOCK, UNIT_PRICE, drug_names
+
+INVENTORY_DATA_DIR = "inventory_data"
+INVENTORY_LEDGER_FILE = os.path.join(INVENTORY_DATA_DIR, "inventory.sqlite")
+# لقطة جديدة للأرصدة بعد هذا العدد من الحركات (إعادة البناء تبدأ من آخر لقطة)
+SNAPSHOT_EVERY = 5000
+
+# أعمدة الرصيد المتغيرة؛ باقي أعمدة الصنف (المادة الفعالة، الأشهر...) ثابتة في جدول items
+BALANCE_COLUMNS = {STOCK: "stock", DAILY_OUT: "daily_out", DAILY_IN: "daily_in",
+                   UNIT_PRICE: "price", DRUG_TYPE: "drug_type"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    attributes TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS batches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    source TEXT,
+    rows INTEGER NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS movements (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    delta REAL NOT NULL DEFAULT 0,
+    daily_out REAL,
+    daily_in REAL,
+    price REAL,
+    drug_type TEXT
+);
+CREATE TABLE IF NOT EXISTS balances (
+    name TEXT PRIMARY KEY,
+    stock REAL NOT NULL DEFAULT 0,
+    daily_out REAL NOT NULL DEFAULT 0,
+    daily_in REAL NOT NULL DEFAULT 0,
+    price REAL NOT NULL DEFAULT 0,
+    drug_type TEXT NOT NULL DEFAULT '',
+    last_movement INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    last_movement INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    balances TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_movements_name ON movements (name, id);
+CREATE INDEX IF NOT EXISTS ix_movements_kind ON movements (kind, created_at);
+CREATE INDEX IF NOT EXISTS ix_movements_batch ON movements (batch_id);
+"""
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _json_value(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.isoformat()
+    return value
+
+
+# ============ المخزن ============
+def connect(db_path: str = INVENTORY_LEDGER_FILE) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def revision(conn: sqlite3.Connection) -> int:
+    """رقم آخر حركة — يتغير مع كل حفظ (مفتاح للكاش)"""
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM movements").fetchone()[0]
+
+
+def _new_batch(conn, kind: str, source: str, rows: int) -> int:
+    return conn.execute("INSERT INTO batches (kind, source, rows, created_at) VALUES (?, ?, ?, ?)",
+                        (kind, source, rows, _now())).lastrowid
+
+
+_UPSERT_BALANCE = """
+UPDATE balances SET
+    stock = stock + ?,
+    daily_out = COALESCE(?, daily_out),
+    daily_in = COALESCE(?, daily_in),
+    price = COALESCE(NULLIF(?, 0), price),
+    drug_type = COALESCE(NULLIF(?, ''), drug_type),
+    last_movement = ?
+WHERE name = ?
+"""
+
+
+def _apply_to_balances(conn, rows: list, last_movement: int):
+    conn.executemany("INSERT OR IGNORE INTO balances (name, last_movement) VALUES (?, ?)",
+                     [(row[0], last_movement) for row in rows])
+    conn.executemany(_UPSERT_BALANCE, [(*row[1:], last_movement, row[0]) for row in rows])
+
+
+def _append(conn, batch_id: int, kind: str, rows: list):
+    """إضافة حركات (name, delta, daily_out, daily_in, price, drug_type) وتحديث أرصدتها في نفس المعاملة"""
+    now = _now()
+    conn.executemany(
+        "INSERT INTO movements (batch_id, created_at, kind, name, delta, daily_out, daily_in, price, drug_type) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(batch_id, now, kind, *row) for row in rows])
+    _apply_to_balances(conn, rows, revision(conn))
+
+
+def clear(conn: sqlite3.Connection):
+    with conn:
+        for table in ("items", "batches", "movements", "balances", "snapshots"):
+            conn.execute(f"DELETE FROM {table}")
+
+
+def _item_rows(df: pd.DataFrame, names: pd.Series) -> list:
+    """(name, position, attributes) — الأعمدة الثابتة للصنف كـ JSON"""
+    attr_cols = [c for c in df.columns if c not in BALANCE_COLUMNS and c != NAME]
+    return [(name, i, json.dumps({c: _json_value(record[c]) for c in attr_cols}, ensure_ascii=False))
+            for i, (name, record) in enumerate(zip(names, df.to_dict("records")))]
+
+
+def load_base(conn: sqlite3.Connection, base: pd.DataFrame, source: str = None) -> int:
+    """بدء سجل جديد من البيانات الأساسية: الأصناف وخصائصها الثابتة + حركة رصيد افتتاحي لكل صنف"""
+    base = base.reset_index(drop=True)
+    names = drug_names(base)
+    keep = names.notna() & ~names.duplicated()
+    base, names = base[keep], names[keep]
+
+    def column(col):
+        return pd.to_numeric(base[col], errors="coerce").fillna(0).tolist() if col in base.columns else [0.0] * len(base)
+
+    types = base[DRUG_TYPE].fillna("").astype(str).tolist() if DRUG_TYPE in base.columns else [""] * len(base)
+    rows = list(zip(names, column(STOCK), column(DAILY_OUT), column(DAILY_IN), column(UNIT_PRICE), types))
+
+    clear(conn)
+    with conn:
+        conn.executemany("INSERT INTO items VALUES (?, ?, ?)", _item_rows(base, names))
+        _append(conn, _new_batch(conn, "base", source, len(rows)), "base", rows)
+    take_snapshot(conn)
+    return len(rows)
+
+
+def record_movements(conn: sqlite3.Connection, kind: str, rows: list, new_items=(), prices=(),
+                     source: str = None) -> int:
+    """حفظ دفعة حركات في معاملة واحدة
+
+    rows: (name, delta, daily_out, daily_in, price, drug_type) لكل صنف.
+    new_items: (name, attributes) لأصناف جديدة تُضاف للمخزون. prices: (name, price) لسجل الأسعار.
+    """
+    with conn:
+        if new_items:
+            start = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM items").fetchone()[0]
+            conn.executemany("INSERT OR IGNORE INTO items VALUES (?, ?, ?)", [
+                (name, start + i, json.dumps({c: _json_value(v) for c, v in attributes.items()}, ensure_ascii=False))
+                for i, (name, attributes) in enumerate(new_items)])
+        batch_id = _new_batch(conn, kind, source, len(rows))
+        _append(conn, batch_id, kind, rows)
+        if prices:
+            _append(conn, batch_id, "price", [(name, 0.0, None, None, float(price), None) for name, price in prices])
+
+    since = conn.execute("SELECT COALESCE(MAX(last_movement), 0) FROM snapshots").fetchone()[0]
+    if revision(conn) - since >= SNAPSHOT_EVERY:
+        take_snapshot(conn)
+    return len(rows)
+
+
+# ============ اللقطات ============
+def take_snapshot(conn: sqlite3.Connection, keep: int = 3):
+    """حفظ الأرصدة الحالية كلقطة واحدة مضغوطة والإبقاء على آخر keep لقطات فقط"""
+    balances = conn.execute("SELECT name, stock, daily_out, daily_in, price, drug_type FROM balances").fetchall()
+    with conn:
+        conn.execute("INSERT INTO snapshots (last_movement, created_at, balances) VALUES (?, ?, ?)",
+                     (revision(conn), _now(), json.dumps(balances, ensure_ascii=False)))
+        conn.execute("DELETE FROM snapshots WHERE id NOT IN (SELECT id FROM snapshots ORDER BY id DESC LIMIT ?)",
+                     (keep,))
+
+
+def rebuild_balances(conn: sqlite3.Connection) -> int:
+    """إعادة بناء الأرصدة من آخر لقطة + الحركات بعدها. يعيد عدد الحركات المعاد تطبيقها"""
+    snap = conn.execute("SELECT last_movement, balances FROM snapshots ORDER BY id DESC LIMIT 1").fetchone()
+    since, balances = (snap[0], json.loads(snap[1])) if snap else (0, [])
+    movements = conn.execute("SELECT id, name, delta, daily_out, daily_in, price, drug_type FROM movements "
+                             "WHERE id > ? ORDER BY id", (since,)).fetchall()
+    with conn:
+        conn.execute("DELETE FROM balances")
+        conn.executemany("INSERT INTO balances VALUES (?, ?, ?, ?, ?, ?, ?)", [(*b, since) for b in balances])
+        for movement_id, *row in movements:
+            _apply_to_balances(conn, [row], movement_id)
+    return len(movements)
+
+
+# ============ الاستعلامات ============
+def balances_for(conn: sqlite3.Connection, names) -> pd.DataFrame:
+    """أرصدة أصناف معينة (المخزون، المنصرف والوارد اليومي، السعر، النوع) من جدول الأرصدة مباشرة، مفهرسة بالاسم"""
+    names = list(dict.fromkeys(names))
+    rows = []
+    for i in range(0, len(names), 500):
+        chunk = names[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+        rows += conn.execute("SELECT name, stock, daily_out, daily_in, price, drug_type FROM balances "
+                             f"WHERE name IN ({marks})", chunk).fetchall()
+    return pd.DataFrame(rows, columns=["name", "stock", "daily_out", "daily_in", "price", "drug_type"]).set_index("name")
+
+
+def current_inventory(conn: sqlite3.Connection) -> pd.DataFrame:
+    """جدول المخزون الحالي (نفس أعمدة البيانات الأساسية) = خصائص الأصناف + الأرصدة"""
+    rows = conn.execute(
+        "SELECT i.name, i.attributes, b.stock, b.daily_out, b.daily_in, b.price, b.drug_type "
+        "FROM items i LEFT JOIN balances b ON b.name = i.name ORDER BY i.position").fetchall()
+    if not rows:
+        return None
+    records = []
+    for name, attributes, stock, daily_out, daily_in, price, drug_type in rows:
+        record = json.loads(attributes)
+        record[NAME] = name
+        record.update({STOCK: stock or 0.0, DAILY_OUT: daily_out or 0.0, DAILY_IN: daily_in or 0.0,
+                       UNIT_PRICE: price or 0.0, DRUG_TYPE: drug_type or ""})
+        records.append(record)
+    df = pd.DataFrame.from_records(records)
+    return df[[NAME] + [c for c in df.columns if c != NAME]]
+
+
+def price_history(conn: sqlite3.Connection, name: str = None, include_base: bool = False) -> pd.DataFrame:
+    """سجل تغير الأسعار (التاريخ، الصنف، السعر)؛ include_base يضيف أسعار البيانات الأساسية كنقطة بداية"""
+    kinds = "('base', 'price')" if include_base else "('price')"
+    sql = f"SELECT created_at AS date, name, price FROM movements WHERE kind IN {kinds} AND price > 0"
+    params = ()
+    if name:
+        sql += " AND name = ?"
+        params = (name,)
+    return pd.read_sql_query(sql + " ORDER BY id", conn, params=params)
+
+
+def monthly_movements(conn: sqlite3.Connection) -> pd.DataFrame:
+    """مجموع المنصرف والوارد لكل صنف في كل شهر (بديل pharmacyMonthlyData)"""
+    return pd.read_sql_query(
+        "SELECT substr(created_at, 1, 7) AS period, name, "
+        "SUM(CASE WHEN kind = 'consumption' THEN -delta ELSE 0 END) AS consumed, "
+        "SUM(CASE WHEN kind = 'incoming' THEN delta ELSE 0 END) AS received "
+        "FROM movements WHERE kind IN ('consumption', 'incoming') GROUP BY period, name ORDER BY period, name",
+        conn)
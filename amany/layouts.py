@@ -0,0 +1,206 @@
+# amany/layouts.py — وصف تخطيط ملفات المنشآت (كتل السنوات، صفوف العناوين، أعمدة المؤشرات) وقراءة الخلايا المطلوبة فقط
+import json
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from amany.arabic_text import normalize_arabic
+from amany.workbooks import read_sheet
+
+MONTHS_AR = ["يناير", "فبراير", "مارس", "أبريل", "مايو", "يونيو",
+             "يوليو", "أغسطس", "سبتمبر", "أكتوبر", "نوفمبر", "ديسمبر"]
+
+# ملف اختياري لإضافة منشآت أو تعديل تخطيطاتها بدون تعديل الكود (نفس صيغة FACILITY_LAYOUTS)
+FACILITY_LAYOUTS_FILE = "facility_layouts.json"
+
+# ============ التخطيطات ============
+# أرقام الصفوف بعد صفوف العناوين (مثل df.iloc)، وأرقام الأعمدة من 0.
+# "*" في مجموعة أعمدة = كل الأعمدة بعد عمود التسمية.
+FACILITY_LAYOUTS = {
+    "الرويسات": {
+        "operational": {
+            "file": "dashboard ruwaisat.xlsx",
+            "sheet": None,
+            "header_rows": 2,
+            "years": [
+                {"year": 2023, "total_row": 11},
+                {"year": 2024, "total_row": 24},
+                {"year": 2025, "first_row": 25, "months": 12},
+            ],
+            "columns": {"kpis": "*"},
+            "charts": [
+                {"sheet_contains": "الخدمات المدفوعة", "title": "تردد الخدمات", "columns": [1, 2, 10, 11, 12, 13, 14]},
+                {"sheet_contains": "الخدمات المدفوعة", "title": "الصيدلية", "columns": [17, 16, 15], "type": "bar"},
+                {"sheet_contains": "الخدمات المدفوعة", "title": "مقارنة بين التردد والصيدلية", "columns": [14, 17]},
+                {"sheet_contains": "الخدمات المدفوعة", "title": "المعمل", "columns": [20, 19, 18], "type": "bar"},
+                {"sheet_contains": "الخدمات المدفوعة", "title": "الأشعة", "columns": [23, 22, 21]},
+                {"sheet_contains": "الخدمات المدفوعة", "title": "مقارنة بين إجمالي الخدمات والتردد", "columns": [24, 14], "type": "bar"},
+            ],
+        },
+        "financial": {
+            "file": "financial and KPIs.xlsx",
+            "sheet": 0,
+            "header_rows": 2,
+            "percent_scale": 100,
+            "years": [
+                {"year": 2024, "first_row": 0, "months": 12, "total_row": 12},
+                {"year": 2025, "first_row": 13, "months": 6, "total_row": 19},
+            ],
+            "columns": {
+                "revenue_items": [2, 3, 4, 5, 6, 7, 8],
+                "total_revenue": [9],
+                "expense_items": [10, 11],
+                "total_expense": [12],
+                "kpis": list(range(13, 25)),
+                "kpi_main": [13],
+                "kpi_pair": [15, 16],
+            },
+        },
+    },
+}
+
+
+@dataclass(frozen=True)
+class YearBlock:
+    year: int
+    first_row: int = None
+    months: int = 0
+    total_row: int = None
+
+    def rows(self) -> list:
+        return [] if self.first_row is None else list(range(self.first_row, self.first_row + self.months))
+
+    def last_row(self) -> int:
+        candidates = [r for r in self.rows() + [self.total_row] if r is not None]
+        return max(candidates, default=-1)
+
+
+@dataclass(frozen=True)
+class WorkbookLayout:
+    file: str
+    folder: str = "Center"
+    sheet: object = 0
+    header_rows: int = 2
+    label_col: int = 0
+    percent_scale: float = 1
+    percent_marker: str = "%"
+    years: tuple = ()
+    columns: dict = field(default_factory=dict)
+    charts: tuple = ()
+
+    @classmethod
+    def from_dict(cls, spec: dict) -> "WorkbookLayout":
+        spec = dict(spec)
+        spec["years"] = tuple(YearBlock(**y) for y in spec.get("years", ()))
+        spec["charts"] = tuple(spec.get("charts", ()))
+        return cls(**spec)
+
+    def year(self, year: int) -> YearBlock:
+        return next((y for y in self.years if y.year == year), None)
+
+    def nrows(self) -> int:
+        """عدد صفوف الورقة المطلوبة فعلاً (العناوين + حتى آخر صف مستخدم)"""
+        return self.header_rows + max((y.last_row() for y in self.years), default=-1) + 1
+
+    def usecols(self, groups=None):
+        """أرقام الأعمدة المطلوبة لمجموعات معينة، أو None إذا كانت مطلوبة كلها"""
+        wanted = self.columns if groups is None else {g: self.columns[g] for g in groups}
+        cols = {self.label_col}
+        for group in wanted.values():
+            if group == "*":
+                return None
+            cols.update(group)
+        for chart in self.charts:
+            cols.update(chart["columns"])
+        return sorted(cols)
+
+    def charts_for(self, sheet_name: str) -> list:
+        return [c for c in self.charts if c.get("sheet_contains", "") in str(sheet_name)]
+
+
+# ============ القراءة ============
+class LayoutFrame:
+    """الخلايا المقروءة لتخطيط معين، مع الوصول إليها بأرقام الأعمدة الأصلية"""
+
+    def __init__(self, layout: WorkbookLayout, body: pd.DataFrame, cols: list):
+        self.layout = layout
+        self.body = body
+        self.cols = cols
+        self._pos = {c: i for i, c in enumerate(cols)}
+        headers = list(body.columns)
+        self._headers = {c: headers[i] if i < len(headers) else "" for c, i in self._pos.items()}
+
+    def header(self, col: int) -> str:
+        return self._headers.get(col, "")
+
+    def column_group(self, name: str) -> list:
+        group = self.layout.columns[name]
+        if group == "*":
+            return [c for c in self.cols if c > self.layout.label_col]
+        return list(group)
+
+    def _cell_column(self, col: int) -> pd.Series:
+        i = self._pos.get(col)
+        if i is None or i >= self.body.shape[1]:
+            return pd.Series(np.nan, index=self.body.index)
+        return self.body.iloc[:, i]
+
+    def total(self, year: int, col: int):
+        block = self.layout.year(year)
+        if block is None or block.total_row is None or block.total_row >= len(self.body):
+            return np.nan
+        return self._cell_column(col).iloc[block.total_row]
+
+    def monthly(self, year: int, cols: list) -> pd.DataFrame:
+        """صف لكل شهر (بأسماء الأشهر) وعمود لكل مؤشر"""
+        block = self.layout.year(year)
+        rows = [r for r in (block.rows() if block else []) if r < len(self.body)]
+        data = {self.header(c): self._cell_column(c).iloc[rows].to_numpy() for c in cols}
+        return pd.DataFrame(data, index=MONTHS_AR[:len(rows)])
+
+
+def load_layout(layout: WorkbookLayout, folder: str = None, sheet_name=None, groups=None,
+                memory: bool = True) -> LayoutFrame:
+    """قراءة الخلايا التي يحتاجها التخطيط فقط (أعمدة محددة وحتى آخر صف مستخدم)
+
+    memory=False: بدون st.cache_data (انظر workbooks.read_sheet)
+    """
+    path = os.path.join(folder or layout.folder, layout.file)
+    sheet = layout.sheet if sheet_name is None else sheet_name
+    usecols = layout.usecols(groups)
+    body = read_sheet(path, sheet, header_rows=layout.header_rows, usecols=usecols, nrows=layout.nrows(),
+                      memory=memory)
+    if usecols is None:
+        usecols = list(range(body.shape[1]))
+
+    for i, col in enumerate(body.columns):
+        if usecols[i] == layout.label_col:
+            continue
+        values = pd.to_numeric(body.iloc[:, i], errors="coerce")
+        if layout.percent_scale != 1 and layout.percent_marker in str(col):
+            values = values * layout.percent_scale
+        body.isetitem(i, values)
+    return LayoutFrame(layout, body, usecols)
+
+
+# ============ سجل المنشآت ============
+def _all_layouts() -> dict:
+    layouts = dict(FACILITY_LAYOUTS)
+    if os.path.exists(FACILITY_LAYOUTS_FILE):
+        try:
+            with open(FACILITY_LAYOUTS_FILE, "r", encoding="utf-8") as f:
+                layouts.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+    return layouts
+
+
+def facility_layouts(facility_name: str) -> dict:
+    """تخطيطات ملفات المنشأة ({"operational": ..., "financial": ...}) أو {} إذا لم تُسجل"""
+    name = normalize_arabic(facility_name)
+    for key, views in _all_layouts().items():
+        if normalize_arabic(key) in name:
+            return {view: WorkbookLayout.from_dict(spec) for view, spec in views.items()}
+    return {}
@@ -0,0 +1,205 @@
+# amany/medicine_search.py — فهرس بحث أسماء الأدوية: n-grams للأحرف + كلمات مرتبة للبادئة، بعد توحيد النص العربي
+import bisect
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from amany.arabic_text import normalize_arabic
+
+GRAM_SIZE = 3
+# أقل نسبة من n-grams الاستعلام يجب أن توجد في الاسم ليُعتبر تطابقاً تقريبياً
+FUZZY_MIN_SHARE = 0.6
+_RESULT_CACHE_SIZE = 64
+
+RANK_EXACT, RANK_PREFIX, RANK_WORD_PREFIX, RANK_CONTAINS, RANK_FUZZY = range(5)
+
+
+def _grams(text: str, n: int = GRAM_SIZE) -> set:
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def _normalized_with_offsets(text: str):
+    """النص الموحد + موضع كل حرف منه في النص الأصلي (لتمييز الجزء المطابق في الاسم الأصلي)"""
+    chars, offsets = [], []
+    for i, ch in enumerate(str(text)):
+        norm = normalize_arabic(ch) if not ch.isspace() else " "
+        if not norm:
+            continue
+        if norm == " " and (not chars or chars[-1] == " "):
+            continue
+        for c in norm:
+            chars.append(c)
+            offsets.append(i)
+    while chars and chars[-1] == " ":
+        chars.pop()
+        offsets.pop()
+    return "".join(chars), offsets
+
+
+def _spans(norm: str, q: str) -> list:
+    """مواضع التطابق في النص الموحد: الاستعلام كاملاً، وإلا بداية كل كلمة منه"""
+    pos = norm.find(q)
+    if pos >= 0:
+        return [(pos, pos + len(q))]
+    spans = []
+    for w in q.split():
+        pos = norm.find(" " + w)
+        pos = 0 if norm.startswith(w) else (pos + 1 if pos >= 0 else norm.find(w))
+        if pos >= 0:
+            spans.append((pos, pos + len(w)))
+    return sorted(spans)
+
+
+def highlight(name: str, query: str, mark=("**", "**")) -> str:
+    """الاسم الأصلي مع تمييز الأجزاء التي تطابق الاستعلام بعد التوحيد"""
+    q = normalize_arabic(query)
+    name = str(name)
+    if not q:
+        return name
+    norm, offsets = _normalized_with_offsets(name)
+    out, last = [], 0
+    for start, end in _spans(norm, q):
+        start, end = offsets[start], offsets[end - 1] + 1
+        if start < last:
+            continue
+        out += [name[last:start], mark[0], name[start:end], mark[1]]
+        last = end
+    return "".join(out) + name[last:]
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    position: int  # رقم الاسم في القائمة الأصلية
+    name: str
+    rank: int
+
+
+@dataclass(frozen=True)
+class SearchPage:
+    hits: list
+    total: int
+    page: int
+    page_size: int
+
+
+class MedicineIndex:
+    """فهرس أسماء مبني مرة واحدة؛ البحث يمر على المرشحين من الفهرس فقط وليس على كل الأسماء"""
+
+    def __init__(self, names):
+        self.names = [str(n) for n in names]
+        keys = [normalize_arabic(n) for n in self.names]
+        self._keys = np.array(keys, dtype=str)
+        lengths = np.fromiter((len(k) for k in keys), dtype=np.int32, count=len(keys))
+        # كل الأسماء مرتبة: الأقصر أولاً ثم بترتيب القائمة الأصلية
+        self._length_order = np.lexsort((np.arange(len(keys)), lengths)).astype(np.int32)
+        postings = {}
+        for i, key in enumerate(keys):
+            for g in _grams(key):
+                postings.setdefault(g, []).append(i)
+        self._postings = {g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()}
+        # الأسماء الموحدة مرتبة للتطابق التام وبداية الاسم
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self._sorted_keys = [keys[i] for i in order]
+        self._sorted_ids = np.asarray(order, dtype=np.int32)
+        # (كلمة، رقم الاسم) مرتبة للبحث بالبادئة عن أي كلمة في الاسم
+        words = sorted({(w, i) for i, key in enumerate(keys) for w in key.split()})
+        self._word_list = [w for w, _ in words]
+        self._word_ids = np.asarray([i for _, i in words], dtype=np.int32)
+        self._cache = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _word_prefix_mask(self, words) -> np.ndarray:
+        """الأسماء التي يبدأ فيها كل كلمة من الاستعلام بداية كلمة فيها"""
+        mask = None
+        for w in words:
+            lo = bisect.bisect_left(self._word_list, w)
+            hi = bisect.bisect_left(self._word_list, w + "\uffff", lo)
+            found = np.zeros(len(self.names), dtype=bool)
+            found[self._word_ids[lo:hi]] = True
+            mask = found if mask is None else mask & found
+        return mask
+
+    def _containing(self, q: str) -> np.ndarray:
+        """الأسماء التي تحتوي كل n-grams الاستعلام، ثم التحقق من احتوائها النص فعلاً"""
+        inner = {q[i:i + GRAM_SIZE] for i in range(len(q) - GRAM_SIZE + 1)}
+        postings = [self._postings.get(g) for g in inner]
+        if any(p is None for p in postings):
+            return np.empty(0, dtype=np.int32)
+        counts = np.bincount(np.concatenate(postings), minlength=len(self.names))
+        ids = np.flatnonzero(counts == len(inner))
+        if len(inner) > 1:
+            ids = ids[np.char.find(self._keys[ids], q) >= 0]
+        return ids
+
+    def _shared_grams(self, q: str) -> np.ndarray:
+        """عدد n-grams الاستعلام الموجودة في كل اسم"""
+        grams = [self._postings[g] for g in _grams(q) if g in self._postings]
+        if not grams:
+            return np.zeros(len(self.names), dtype=np.int64)
+        return np.bincount(np.concatenate(grams), minlength=len(self.names))
+
+    def _ranked(self, q: str):
+        """(أرقام الأسماء، درجات التطابق) مرتبة — محفوظة لآخر الاستعلامات حتى يكون تقليب الصفحات فورياً
+
+        الدرجة لكل اسم تُكتب في مصفوفة واحدة من الأضعف للأقوى، ثم ترتيب واحد ثابت على
+        (الدرجة، ثم عدد n-grams المشتركة للتقريبي) فوق ترتيب مسبق بالطول — بدون حلقات على المرشحين.
+        """
+        if q in self._cache:
+            self._cache.move_to_end(q)
+            return self._cache[q]
+
+        none = RANK_FUZZY + 1
+        rank = np.full(len(self.names), none, dtype=np.int16)
+        tiebreak = np.zeros(len(self.names), dtype=np.int16)
+        if len(q) >= GRAM_SIZE:
+            shared = self._shared_grams(q)
+            need = max(1, int(np.ceil(FUZZY_MIN_SHARE * len(_grams(q)))))
+            fuzzy = shared >= need
+            rank[fuzzy] = RANK_FUZZY
+            tiebreak[fuzzy] = -shared[fuzzy]
+            rank[self._containing(q)] = RANK_CONTAINS
+        rank[self._word_prefix_mask(q.split())] = RANK_WORD_PREFIX
+        lo = bisect.bisect_left(self._sorted_keys, q)
+        mid = bisect.bisect_right(self._sorted_keys, q, lo)
+        hi = bisect.bisect_left(self._sorted_keys, q + "\uffff", mid)
+        rank[self._sorted_ids[mid:hi]] = RANK_PREFIX
+        rank[self._sorted_ids[lo:mid]] = RANK_EXACT
+        tiebreak[rank < RANK_FUZZY] = 0
+
+        ordered = self._length_order
+        ordered = ordered[rank[ordered] < none]
+        key = rank[ordered].astype(np.int32) * 65536 + tiebreak[ordered]
+        ids = ordered[np.argsort(key, kind="stable")]
+        result = (ids, rank[ids].astype(np.int8))
+
+        self._cache[q] = result
+        if len(self._cache) > _RESULT_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return result
+
+    def _matches(self, query: str, fuzzy: bool):
+        q = normalize_arabic(query)
+        if not q:
+            return np.arange(len(self.names)), np.full(len(self.names), RANK_CONTAINS, dtype=np.int8)
+        ids, ranks = self._ranked(q)
+        if not fuzzy:
+            keep = ranks < RANK_FUZZY
+            ids, ranks = ids[keep], ranks[keep]
+        return ids, ranks
+
+    def positions(self, query: str, fuzzy: bool = True) -> np.ndarray:
+        """أرقام كل الأسماء المطابقة مرتبة حسب الصلة (بدون استعلام: كل الأسماء بترتيبها)"""
+        return self._matches(query, fuzzy)[0]
+
+    def search(self, query: str, page: int = 1, page_size: int = 20, fuzzy: bool = True) -> SearchPage:
+        """صفحة واحدة من النتائج: تطابق تام، بداية الاسم، بداية كلمة، جزء من الاسم، ثم تقريبي"""
+        ids, ranks = self._matches(query, fuzzy)
+        page = max(page, 1)
+        start = (page - 1) * page_size
+        window = [SearchHit(int(i), self.names[i], int(r))
+                  for i, r in zip(ids[start:start + page_size], ranks[start:start + page_size])]
+        return SearchPage(window, len(ids), page, page_size)
@@ -0,0 +1,302 @@
+# amany/monthly_store.py — تجميع ملفات الأشهر في uploads/ في جدول طولي (شهر، منشأة، مؤشر، قيمة) داخل SQLite
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+from amany.arabic_text import normalize_arabic
+from amany.column_roles import classify_text
+from amany.workbooks import file_signature, read_sheet, sheet_names
+
+MONTHLY_STORE_FILE = os.path.join(".cache", "monthly_kpis.sqlite")
+
+MONTHS_AR = ["يناير", "فبراير", "مارس", "أبريل", "مايو", "يونيو",
+             "يوليو", "أغسطس", "سبتمبر", "أكتوبر", "نوفمبر", "ديسمبر"]
+_MONTH_LOOKUP = {normalize_arabic(m): i + 1 for i, m in enumerate(MONTHS_AR)}
+
+# عناوين عمود المنشأة كما تظهر في الملفات الشهرية (بعد التوحيد)
+_FACILITY_HEADER = re.compile(r"(الوحده|المركز|المنشاه)")
+_TOTAL_ROW = re.compile(r"^(ال)?اجمالي")
+# أعمدة بيانات اتصال وليست مؤشرات
+_NON_KPI = re.compile(r"(تليفون|هاتف|موبايل)")
+_HEADER_SCAN_ROWS = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS kpi_values (
+    period TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    facility_key TEXT NOT NULL,
+    facility TEXT NOT NULL,
+    sheet TEXT NOT NULL,
+    kpi TEXT NOT NULL,
+    value REAL NOT NULL,
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_kpi_period ON kpi_values (sheet, kpi, period);
+CREATE INDEX IF NOT EXISTS ix_facility_period ON kpi_values (facility_key, period);
+CREATE INDEX IF NOT EXISTS ix_period ON kpi_values (period);
+CREATE INDEX IF NOT EXISTS ix_source ON kpi_values (source);
+"""
+
+
+# ============ اكتشاف ملفات الأشهر ============
+_YEAR = re.compile(r"(?<!\d)(20\d{2})(?!\d)")
+
+
+def detect_month_name(path: str):
+    """رقم الشهر من اسم الملف (يناير.xlsx ← 1)، أو None إذا لم يكن ملف شهر"""
+    stem = normalize_arabic(os.path.splitext(os.path.basename(path))[0])
+    return next((m for name, m in _MONTH_LOOKUP.items() if name in stem), None)
+
+
+def _year_in_workbook(path: str):
+    """أول سنة (20xx) مكتوبة في صفوف العناوين لأي ورقة (مثل "تقرير شهر مارس 2025")"""
+    for sheet in sheet_names(path):
+        grid = read_sheet(path, sheet, header_rows=0, nrows=_HEADER_SCAN_ROWS)
+        for v in grid.to_numpy(dtype=object).ravel():
+            if isinstance(v, str):
+                found = _YEAR.search(v)
+                if found:
+                    return int(found.group(1))
+    return None
+
+
+def detect_month(path: str, year: int = None):
+    """(السنة، الشهر) لملف شهر، أو None إذا لم يكن ملف شهر
+
+    السنة من اسم الملف، ثم من محتوى صفوف العناوين، ثم من year (الإعدادات).
+    لا تُستنتج من تاريخ تعديل الملف (يتغير مع كل نسخ أو رفع)، وإذا لم تُعرف يُرفض الملف بـ ValueError.
+    """
+    month = detect_month_name(path)
+    if month is None:
+        return None
+    year_match = _YEAR.search(normalize_arabic(os.path.splitext(os.path.basename(path))[0]))
+    if year_match:
+        return int(year_match.group(1)), month
+    found = _year_in_workbook(path)
+    if found:
+        return found, month
+    if year:
+        return int(year), month
+    raise ValueError(f"لا يمكن تحديد سنة الملف {os.path.basename(path)}: أضف السنة لاسم الملف "
+                     f"(مثل مارس 2025.xlsx) أو حدد [monthly] year في الإعدادات")
+
+
+def facility_key(name) -> str:
+    """مفتاح موحد لاسم المنشأة عبر الأشهر (توحيد الحروف وحذف المسافات)"""
+    return normalize_arabic(name).replace(" ", "")
+
+
+# ============ تحويل ورقة إلى صفوف طولية ============
+def _find_header(grid: pd.DataFrame):
+    for i in range(min(_HEADER_SCAN_ROWS, len(grid))):
+        for j, v in enumerate(grid.iloc[i].tolist()):
+            if isinstance(v, str) and _FACILITY_HEADER.search(normalize_arabic(v)):
+                return i, j
+    return None
+
+
+def _is_data_row(row, facility_col) -> bool:
+    name = row[facility_col]
+    if not isinstance(name, str) or not name.strip():
+        return False
+    return not _TOTAL_ROW.match(normalize_arabic(name))
+
+
+def _kpi_labels(band: pd.DataFrame) -> list:
+    """عنوان واحد لكل عمود من صفوف العناوين (مع مد عناوين المجموعات المدمجة أفقياً)"""
+    band = band.astype(object)
+    if len(band) > 1:
+        band.iloc[:-1] = band.iloc[:-1].ffill(axis=1)
+    labels = []
+    for j in range(band.shape[1]):
+        parts = []
+        for v in band.iloc[:, j].tolist():
+            if pd.isna(v):
+                continue
+            text = " ".join(str(v).split())
+            if text and text not in parts:
+                parts.append(text)
+        labels.append(" / ".join(parts))
+    return labels
+
+
+def melt_sheet(grid: pd.DataFrame) -> pd.DataFrame:
+    """ورقة شهرية ← (facility, kpi, value) لكل خلية رقمية"""
+    found = _find_header(grid)
+    if not found:
+        return pd.DataFrame(columns=["facility", "kpi", "value"])
+    header_row, facility_col = found
+
+    values = grid.to_numpy(dtype=object)
+    data_rows = [i for i in range(header_row + 1, len(grid)) if _is_data_row(values[i], facility_col)]
+    if not data_rows:
+        return pd.DataFrame(columns=["facility", "kpi", "value"])
+
+    labels = _kpi_labels(grid.iloc[header_row:data_rows[0]])
+    kpi_cols = [j for j in range(facility_col + 1, grid.shape[1])
+                if labels[j] and not _NON_KPI.search(normalize_arabic(labels[j]))]
+
+    body = grid.iloc[data_rows, kpi_cols].apply(pd.to_numeric, errors="coerce")
+    body.columns = [labels[j] for j in kpi_cols]
+    body = body.loc[:, ~body.columns.duplicated()]
+    body.insert(0, "facility", [" ".join(str(values[i][facility_col]).split()) for i in data_rows])
+    long = body.melt(id_vars="facility", var_name="kpi", value_name="value").dropna(subset=["value"])
+    return long.reset_index(drop=True)
+
+
+# ============ المخزن ============
+def connect(db_path: str = MONTHLY_STORE_FILE) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def ingest_workbook(conn: sqlite3.Connection, path: str, force: bool = False, year: int = None) -> int:
+    """إدخال ملف شهر واحد (أو استبداله إذا تغير). يعيد عدد القيم المدخلة، أو 0 إذا لم يتغير"""
+    detected = detect_month(path, year)
+    if detected is None:
+        return 0
+    year, month = detected
+    _, mtime_ns, size = file_signature(path)
+    source = os.path.abspath(path)
+
+    prev = conn.execute("SELECT mtime_ns, size, year, month FROM sources WHERE path = ?", (source,)).fetchone()
+    if prev == (mtime_ns, size, year, month) and not force:
+        return 0
+
+    frames = []
+    for sheet in sheet_names(path):
+        long = melt_sheet(read_sheet(path, sheet, header_rows=0))
+        if not long.empty:
+            long["sheet"] = sheet.strip()
+            frames.append(long)
+    period = f"{year:04d}-{month:02d}"
+    records = []
+    if frames:
+        data = pd.concat(frames, ignore_index=True)
+        records = [(period, year, month, facility_key(f), f, s, k, float(v), source)
+                   for f, k, v, s in data[["facility", "kpi", "value", "sheet"]].itertuples(index=False)]
+
+    with conn:
+        conn.execute("DELETE FROM kpi_values WHERE source = ?", (source,))
+        conn.executemany("INSERT INTO kpi_values VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", records)
+        conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?)",
+                     (source, mtime_ns, size, year, month, datetime.now().isoformat(timespec="seconds")))
+    return len(records)
+
+
+def _remove_source(conn: sqlite3.Connection, path: str):
+    with conn:
+        conn.execute("DELETE FROM kpi_values WHERE source = ?", (path,))
+        conn.execute("DELETE FROM sources WHERE path = ?", (path,))
+
+
+def remove_missing_sources(conn: sqlite3.Connection, folder: str):
+    """حذف قيم الملفات التي لم تعد موجودة في المجلد"""
+    folder = os.path.abspath(folder)
+    for (path,) in conn.execute("SELECT path FROM sources").fetchall():
+        if os.path.dirname(path) == folder and not os.path.exists(path):
+            _remove_source(conn, path)
+
+
+def ingest_folder(folder: str = "uploads", db_path: str = MONTHLY_STORE_FILE, year: int = None):
+    """إدخال كل ملفات الأشهر في المجلد تدريجياً (الملفات غير المتغيرة لا يعاد فتحها)
+
+    year: سنة الملفات التي لا تذكر سنتها في الاسم أو المحتوى.
+    يعيد ({الملف: عدد القيم المدخلة}, {الملف: سبب الرفض}).
+    """
+    report, errors = {}, {}
+    conn = connect(db_path)
+    try:
+        if os.path.isdir(folder):
+            for name in sorted(os.listdir(folder)):
+                path = os.path.join(folder, name)
+                if name.endswith((".xlsx", ".xls")) and not name.startswith("~$") and detect_month_name(path):
+                    try:
+                        report[name] = ingest_workbook(conn, path, year=year)
+                    except ValueError as e:
+                        errors[name] = str(e)
+                        _remove_source(conn, os.path.abspath(path))
+        remove_missing_sources(conn, folder)
+    finally:
+        conn.close()
+    return report, errors
+
+
+# ============ الاستعلامات ============
+def _query(sql: str, params=(), db_path: str = MONTHLY_STORE_FILE) -> pd.DataFrame:
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+
+def list_periods(db_path: str = MONTHLY_STORE_FILE) -> list:
+    """الأشهر المخزنة بصيغة YYYY-MM مرتبة"""
+    return _query("SELECT DISTINCT period FROM kpi_values ORDER BY period", db_path=db_path)["period"].tolist()
+
+
+def list_kpis(db_path: str = MONTHLY_STORE_FILE) -> pd.DataFrame:
+    """كل (الورقة، المؤشر) المتاحة مع عدد الأشهر"""
+    return _query("SELECT sheet, kpi, COUNT(DISTINCT period) AS months FROM kpi_values "
+                  "GROUP BY sheet, kpi ORDER BY sheet, MIN(rowid)", db_path=db_path)
+
+
+def kpi_series(sheet: str, kpi: str, facilities=None, start: str = None, end: str = None,
+               db_path: str = MONTHLY_STORE_FILE) -> pd.DataFrame:
+    """قيم مؤشر عبر الأشهر: صف لكل شهر وعمود لكل منشأة"""
+    sql = "SELECT period, facility_key, facility, value FROM kpi_values WHERE sheet = ? AND kpi = ?"
+    params = [sheet, kpi]
+    if start:
+        sql += " AND period >= ?"
+        params.append(start)
+    if end:
+        sql += " AND period <= ?"
+        params.append(end)
+    df = _query(sql, params, db_path=db_path)
+    if df.empty:
+        return pd.DataFrame()
+    # اسم العرض لكل منشأة = آخر اسم ظهر به
+    names = df.sort_values("period").groupby("facility_key")["facility"].last()
+    df["facility"] = df["facility_key"].map(names)
+    if facilities:
+        df = df[df["facility"].isin(facilities)]
+    wide = df.pivot_table(index="period", columns="facility", values="value", aggfunc="sum")
+    return wide.sort_index()
+
+
+def ytd_rollup(year: int, through_month: int = 12, sheet: str = None,
+               db_path: str = MONTHLY_STORE_FILE) -> pd.DataFrame:
+    """تجميع من بداية السنة: مجموع للمؤشرات العددية ومتوسط للنسب"""
+    sql = ("SELECT facility_key, facility, sheet, kpi, period, value FROM kpi_values "
+           "WHERE year = ? AND month <= ?")
+    params = [year, through_month]
+    if sheet:
+        sql += " AND sheet = ?"
+        params.append(sheet)
+    df = _query(sql, params, db_path=db_path)
+    if df.empty:
+        return pd.DataFrame()
+    names = df.sort_values("period").groupby("facility_key")["facility"].last()
+    df["facility"] = df["facility_key"].map(names)
+
+    is_percent = {k: "percent" in classify_text(k) for k in df["kpi"].unique()}
+    pct = df["kpi"].map(is_percent)
+    sums = df[~pct].groupby(["facility", "sheet", "kpi"])["value"].sum()
+    means = df[pct].groupby(["facility", "sheet", "kpi"])["value"].mean()
+    out = pd.concat([sums, means]).rename("value").reset_index()
+    return out.pivot_table(index="facility", columns=["sheet", "kpi"], values="value", sort=False)
@@ -0,0 +1,84 @@
+# amany/panel_stats.py — مجاميع تراكمية لكل (ورقة، مؤشر) على محور الأشهر: متوسط وانحراف أي نافذة زمنية بدون إعادة المرور على البيانات
+import numpy as np
+import pandas as pd
+
+from amany.financial_panel import FinancialPanel
+
+
+def _prefix(x: np.ndarray, axis: int = 1) -> np.ndarray:
+    """مجموع تراكمي مع صف أصفار في البداية: مجموع النافذة [lo, hi) = p[hi] - p[lo]"""
+    shape = list(x.shape)
+    shape[axis] = 1
+    return np.concatenate([np.zeros(shape), np.cumsum(x, axis=axis)], axis=axis)
+
+
+class PanelStats:
+    """عدد ومجموع ومجموع مربعات القيم حتى كل شهر، لكل ورقة ومؤشر في اللوحة
+
+    القيم تُزاح بأول قيمة معروفة لكل (ورقة، مؤشر) قبل الجمع حتى لا يضيع الانحراف
+    في فرق مجموعين كبيرين (الأرقام المالية كبيرة والتغير الشهري صغير نسبياً).
+    """
+
+    def __init__(self, panel: FinancialPanel):
+        self.panel = panel
+        values = panel.values
+        finite = ~np.isnan(values)
+        first = np.where(finite.any(axis=1), finite.argmax(axis=1), 0)
+        self._ref = np.nan_to_num(np.take_along_axis(values, first[:, None, :], axis=1)[:, 0, :])
+        shifted = np.where(finite, values - self._ref[:, None, :], 0.0)
+        self._count, self._sum, self._sumsq = _prefix(finite.astype(float)), _prefix(shifted), _prefix(shifted ** 2)
+
+    # ============ الإحصاءات والـ z-scores ============
+    def _positions(self, names, all_names) -> np.ndarray:
+        if names is None:
+            return np.arange(len(all_names))
+        return np.array([all_names.index(n) for n in names], dtype=np.int64)
+
+    def _window(self, lo, hi):
+        """(المتوسط بعد الإزاحة، الانحراف ddof=1) للنوافذ [lo, hi) — أرقام أو مصفوفات أرقام أشهر"""
+        n = self._count[:, hi] - self._count[:, lo]
+        s = self._sum[:, hi] - self._sum[:, lo]
+        ss = self._sumsq[:, hi] - self._sumsq[:, lo]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = s / n
+            var = np.maximum(ss - s * mean, 0.0) / (n - 1)
+        return mean, np.where((n > 1) & (var > 0), np.sqrt(var), np.nan)
+
+    def mean_std(self, start=None, end=None):
+        """(المتوسط، الانحراف المعياري بعينة ddof=1) لكل (ورقة، مؤشر) داخل النافذة"""
+        rows = self.panel.period_slice(end, start)
+        mean, std = self._window(rows.start, rows.stop)
+        return mean + self._ref, std
+
+    def trailing(self, window: int):
+        """(المتوسط، الانحراف) للأشهر الـ window السابقة لكل شهر بدون الشهر نفسه — (ورقة، شهر، مؤشر)"""
+        hi = np.arange(len(self.panel.periods))
+        mean, std = self._window(np.maximum(hi - window, 0), hi)
+        return mean + self._ref[:, None, :], std
+
+    def zscores(self, sheets=None, kpis=None, start=None, end=None) -> np.ndarray:
+        """z-scores (ورقة، شهر، مؤشر) لأي مجموعة أوراق ومؤشرات ونافذة زمنية، بمتوسط وانحراف النافذة نفسها"""
+        si = self._positions(sheets, self.panel.sheets)
+        ki = self._positions(kpis, self.panel.kpis)
+        rows = self.panel.period_slice(end, start)
+        mean, std = self.mean_std(start, end)
+        block = self.panel.values[np.ix_(si, np.arange(rows.start, rows.stop), ki)]
+        return (block - mean[np.ix_(si, ki)][:, None, :]) / std[np.ix_(si, ki)][:, None, :]
+
+    def sheet_heatmap(self, sheet: str, kpis=None, start=None, end=None) -> pd.DataFrame:
+        """ورقة واحدة: صف لكل مؤشر وعمود لكل شهر"""
+        kpis = list(kpis) if kpis is not None else self.panel.kpis
+        rows = self.panel.period_slice(end, start)
+        z = self.zscores([sheet], kpis, start, end)[0]
+        return pd.DataFrame(z.T, index=kpis, columns=self.panel.periods[rows].to_timestamp())
+
+    def month_heatmap(self, month, sheets=None, kpis=None, start=None, end=None) -> pd.DataFrame:
+        """شهر واحد عبر الأوراق: صف لكل ورقة وعمود لكل مؤشر، كل قيمة مقارنة بتاريخ نفس الورقة في النافذة"""
+        sheets = list(sheets) if sheets is not None else self.panel.sheets
+        kpis = list(kpis) if kpis is not None else self.panel.kpis
+        si = self._positions(sheets, self.panel.sheets)
+        ki = self._positions(kpis, self.panel.kpis)
+        pos = int(self.panel.periods.get_loc(pd.Period(month, "M")))
+        mean, std = self.mean_std(start, end)
+        z = (self.panel.values[si, pos][:, ki] - mean[np.ix_(si, ki)]) / std[np.ix_(si, ki)]
+        return pd.DataFrame(z, index=sheets, columns=kpis)
@@ -0,0 +1,123 @@
+# amany/price_history.py — سجل الأسعار كأعمدة مرتبة (صنف، تاريخ، سعر) لاستعلامات سريعة لكل صنف ولكل مادة فعالة
+import numpy as np
+import pandas as pd
+
+# أفق توقع التكلفة الافتراضي (أشهر) لتقدير سعر شراء الكمية المطلوبة
+PROJECTION_MONTHS = 3
+_DAYS_PER_YEAR = 365.25
+# لا يُحسب تغير سنوي من فترة أقصر من هذا (تغير بسيط في أيام قليلة يتضخم عند تحويله لسنة)
+MIN_ANNUALIZE_DAYS = 30
+
+
+class PriceHistory:
+    """نقاط السعر مرتبة حسب (الصنف، التاريخ) في مصفوفات متجاورة؛ نقاط كل صنف شريحة [start, end)
+
+    الوصول لشريحة الصنف بالقاموس، والبحث داخلها بالتاريخ بـ searchsorted (لوغاريتمي).
+    """
+
+    def __init__(self, names, dates, prices, ingredients: dict = None):
+        names = pd.Series(names, dtype=object).reset_index(drop=True)
+        dates = pd.to_datetime(pd.Series(dates).reset_index(drop=True)).to_numpy(dtype="datetime64[s]")
+        prices = np.asarray(prices, dtype=float)
+        codes, self.drugs = pd.factorize(names, sort=True)
+        order = np.lexsort((dates, codes))
+        self.codes = codes[order].astype(np.int32)
+        self.dates = dates[order]
+        self.prices = prices[order]
+        bounds = np.searchsorted(self.codes, np.arange(len(self.drugs) + 1))
+        self._slices = {name: (int(bounds[i]), int(bounds[i + 1])) for i, name in enumerate(self.drugs)}
+        self.ingredients = ingredients or {}
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, ingredients: dict = None) -> "PriceHistory":
+        """من جدول بأعمدة date, name, price (مثل ledger.price_history)"""
+        return cls(df["name"], df["date"], df["price"], ingredients)
+
+    # ============ استعلامات الصنف ============
+    def series(self, name: str, start=None, end=None) -> pd.Series:
+        """تطور سعر الصنف بين تاريخين (شاملة)"""
+        base, stop = self._slices.get(name, (0, 0))
+        dates = self.dates[base:stop]
+        lo, hi = base, stop
+        if start is not None:
+            lo = base + int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start), "s"), side="left"))
+        if end is not None:
+            hi = base + int(np.searchsorted(dates, np.datetime64(pd.Timestamp(end), "s"), side="right"))
+        return pd.Series(self.prices[lo:hi], index=pd.DatetimeIndex(self.dates[lo:hi]), name=name)
+
+    def price_at(self, name: str, when=None) -> float:
+        """آخر سعر معروف للصنف في تاريخ معين (أو الآن)، أو NaN"""
+        lo, hi = self._slices.get(name, (0, 0))
+        if lo == hi:
+            return np.nan
+        if when is not None:
+            hi = lo + int(np.searchsorted(self.dates[lo:hi], np.datetime64(pd.Timestamp(when), "s"), side="right"))
+        return float(self.prices[hi - 1]) if hi > lo else np.nan
+
+    def last_price(self, name: str) -> float:
+        return self.price_at(name)
+
+    def last_prices(self) -> pd.Series:
+        """آخر سعر لكل صنف"""
+        ends = np.array([hi for _, hi in self._slices.values()], dtype=np.int64)
+        return pd.Series(self.prices[ends - 1] if len(ends) else [], index=list(self._slices), dtype=float)
+
+    # ============ التضخم ============
+    def drug_inflation(self, start=None, end=None) -> pd.DataFrame:
+        """لكل صنف: أول وآخر سعر في الفترة، نسبة التغير، والتغير السنوي"""
+        codes, dates, prices = self.codes, self.dates, self.prices
+        if start is not None or end is not None:
+            keep = np.ones(len(prices), dtype=bool)
+            if start is not None:
+                keep &= dates >= np.datetime64(pd.Timestamp(start), "s")
+            if end is not None:
+                keep &= dates <= np.datetime64(pd.Timestamp(end), "s")
+            codes, dates, prices = codes[keep], dates[keep], prices[keep]
+        if not len(prices):
+            return pd.DataFrame(columns=["name", "first_price", "last_price", "change", "annual_change", "days"])
+        # البيانات مرتبة بالصنف ثم التاريخ: أول وآخر نقطة لكل صنف بحدود الشرائح
+        first = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        last = np.r_[first[1:], len(codes)] - 1
+        days = (dates[last] - dates[first]).astype("timedelta64[D]").astype(float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = prices[last] / prices[first] - 1
+            annual = np.where(days >= MIN_ANNUALIZE_DAYS, (1 + change) ** (_DAYS_PER_YEAR / days) - 1, np.nan)
+        return pd.DataFrame({
+            "name": self.drugs[codes[first]], "first_price": prices[first], "last_price": prices[last],
+            "change": change, "annual_change": annual, "days": days,
+        })
+
+    def ingredient_inflation(self, start=None, end=None) -> pd.DataFrame:
+        """متوسط التغير ونسبة التغير السنوية لكل مادة فعالة (من الأصناف التي تغير سعرها في الفترة)"""
+        drugs = self.drug_inflation(start, end)
+        drugs = drugs[drugs["days"] >= MIN_ANNUALIZE_DAYS]
+        drugs = drugs.assign(ingredient=drugs["name"].map(self.ingredients).fillna("غير معروف"))
+        return (drugs.groupby("ingredient")
+                .agg(drugs=("name", "size"), change=("change", "median"), annual_change=("annual_change", "median"))
+                .reset_index().sort_values("annual_change", ascending=False, ignore_index=True))
+
+
+# ============ توقع التكلفة ============
+def project_costs(groups: pd.DataFrame, items: pd.DataFrame, history: PriceHistory,
+                  months: int = PROJECTION_MONTHS) -> pd.DataFrame:
+    """تكلفة شراء "الكمية المطلوبة" لكل مجموعة بالسعر الحالي وبالسعر المتوقع بعد months أشهر
+
+    سعر المجموعة = متوسط آخر سعر لأصنافها (من سجل الأسعار، وإلا سعر الوحدة في المخزون)،
+    والسعر المتوقع يضيف التغير السنوي للمادة الفعالة بنسبة months/12.
+    """
+    last = history.last_prices()
+    price = items["اسم الدواء"].map(last).fillna(items["سعر الوحدة"]).replace(0, np.nan)
+    group_price = price.groupby(items["المجموعة"], sort=False).mean()
+    inflation = history.ingredient_inflation().set_index("ingredient")["annual_change"]
+
+    out = groups[["المجموعة", "المادة الفعالة", "الكمية المطلوبة"]].copy()
+    out["سعر الوحدة الحالي"] = out["المجموعة"].map(group_price).fillna(0.0).round(2)
+    rate = out["المادة الفعالة"].map(inflation).fillna(0.0)
+    out["نسبة التغير السنوية"] = (rate * 100).round(1)
+    out["سعر الوحدة المتوقع"] = (out["سعر الوحدة الحالي"] * (1 + rate) ** (months / 12)).round(2)
+    out["التكلفة الحالية"] = (out["الكمية المطلوبة"] * out["سعر الوحدة الحالي"]).round(2)
+    out["التكلفة المتوقعة"] = (out["الكمية المطلوبة"] * out["سعر الوحدة المتوقع"]).round(2)
+    return out
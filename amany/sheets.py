@@ -0,0 +1,277 @@
+# amany/sheets.py — اتصال Google Sheets المشترك: بيانات الاعتماد، الجلسة المُدارة، مجمع الملفات، وحل الأسماء إلى معرفات
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import gspread
+import pandas as pd
+import streamlit as st
+from google.oauth2.service_account import Credentials
+
+from amany.financial_sheet import make_headers_unique
+from amany.transport import POOL_SIZE, ManagedTransport, gspread_client
+
+READONLY_SCOPES = ("https://www.googleapis.com/auth/spreadsheets.readonly",)
+# البحث بالاسم يمر عبر Drive، لذلك يحتاج صلاحية قراءة Drive فقط عند أول حل للاسم
+LOOKUP_SCOPES = READONLY_SCOPES + ("https://www.googleapis.com/auth/drive.readonly",)
+
+SHEET_IDS_CACHE_FILE = os.path.join(".cache", "sheet_ids.json")
+# مدة صلاحية بيانات الأوراق المشتركة بين كل الصفحات (ثوان)
+SHEET_CACHE_TTL = 900
+FETCH_WORKERS = 4
+MAX_CACHED_SHEETS = 512
+
+
+# ============ بيانات الاعتماد ============
+def get_google_credentials():
+    """الحصول على بيانات الاعتماد من Secrets بشكل آمن"""
+    try:
+        if 'gcp_service_account' in st.secrets:
+            if isinstance(st.secrets['gcp_service_account'], str):
+                return json.loads(st.secrets['gcp_service_account'])
+            else:
+                return dict(st.secrets['gcp_service_account'])
+        else:
+            st.error("❌ لم يتم العثور على إعدادات Google Service Account في Secrets")
+            return None
+    except Exception as e:
+        st.error(f"❌ خطأ في تحميل إعدادات Google: {e}")
+        return None
+
+
+def with_backoff(func, *args, **kwargs):
+    """إعادة المحاولة مع فترات انتظار"""
+    for delay in [0.5, 1, 2, 4, 8]:
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if "429" in str(e) or "Quota" in str(e):
+                time.sleep(delay)
+                continue
+            raise
+    raise RuntimeError("فشلت جميع محاولات إعادة الاتصال")
+
+
+# ============ العملاء ومجمع الملفات ============
+@st.cache_resource(show_spinner=False)
+def get_transport(scopes: tuple = READONLY_SCOPES) -> ManagedTransport:
+    """جلسة HTTP واحدة لكل مجموعة صلاحيات طوال عمر التطبيق: اتصالات TLS مفتوحة وتوكن يُجدد قبل انتهائه"""
+    credentials_dict = get_google_credentials()
+    if not credentials_dict:
+        raise RuntimeError("بيانات اعتماد Google غير متوفرة")
+    creds = Credentials.from_service_account_info(credentials_dict, scopes=list(scopes))
+    return ManagedTransport(creds, pool_size=max(POOL_SIZE, FETCH_WORKERS * 2))
+
+
+@st.cache_resource(show_spinner=False)
+def get_client(scopes: tuple = READONLY_SCOPES):
+    """عميل gspread مفوض لمجموعة الصلاحيات المطلوبة، فوق الجلسة المُدارة"""
+    return gspread_client(get_transport(scopes))
+
+
+def transport_metrics(scopes: tuple = READONLY_SCOPES) -> dict:
+    """زمن طلبات Google Sheets الأخيرة وعدد الاتصالات وتجديدات التوكن"""
+    return get_transport(scopes).metrics()
+
+
+@st.cache_resource(ttl=7200)
+def open_spreadsheet(spreadsheet_id: str):
+    """مقبض الملف من المجمع المشترك — فتح بالمعرف فقط بدون بحث في Drive"""
+    return with_backoff(get_client().open_by_key, spreadsheet_id)
+
+
+# ============ حل الاسم إلى معرف ============
+def _load_id_cache() -> dict:
+    try:
+        with open(SHEET_IDS_CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_id_cache(ids: dict):
+    try:
+        os.makedirs(os.path.dirname(SHEET_IDS_CACHE_FILE), exist_ok=True)
+        tmp = SHEET_IDS_CACHE_FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(ids, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, SHEET_IDS_CACHE_FILE)
+    except OSError:
+        pass
+
+
+def _configured_ids() -> dict:
+    try:
+        return dict(st.secrets.get("sheets", {}).get("ids", {}))
+    except Exception:
+        return {}
+
+
+def resolve_spreadsheet_id(title: str, refresh: bool = False) -> str:
+    """معرف الملف من اسمه: Secrets ثم الكاش الدائم ثم بحث Drive مرة واحدة"""
+    title = title.strip()
+    configured = _configured_ids()
+    if title in configured and not refresh:
+        return configured[title]
+
+    ids = _load_id_cache()
+    if title in ids and not refresh:
+        return ids[title]
+
+    sh = with_backoff(get_client(LOOKUP_SCOPES).open, title)
+    ids[title] = sh.id
+    _save_id_cache(ids)
+    return sh.id
+
+
+def forget_spreadsheet_id(title: str):
+    """حذف معرف محفوظ (مثلاً عند حذف الملف أو تغيير اسمه)"""
+    ids = _load_id_cache()
+    if ids.pop(title.strip(), None) is not None:
+        _save_id_cache(ids)
+
+
+def open_spreadsheet_by_title(title: str):
+    """فتح ملف بالاسم عبر المعرف المحفوظ؛ يعيد الحل مرة واحدة إذا أصبح المعرف قديماً"""
+    try:
+        return open_spreadsheet(resolve_spreadsheet_id(title))
+    except (gspread.SpreadsheetNotFound, gspread.exceptions.APIError) as e:
+        if isinstance(e, gspread.exceptions.APIError) and "404" not in str(e):
+            raise
+        forget_spreadsheet_id(title)
+        return open_spreadsheet(resolve_spreadsheet_id(title, refresh=True))
+
+
+# ============ بيانات الأوراق المشتركة بين الصفحات ============
+# كل ورقة تُجلب مرة واحدة لكل نسخة بيانات في التطبيق كله؛ النسخة جزء من مفتاح الكاش،
+# فزيادتها (invalidate) تجعل كل الصفحات تعيد الجلب في الاستدعاء التالي.
+@st.cache_resource(show_spinner=False)
+def _revisions() -> dict:
+    return {"lock": threading.Lock(), "all": 0, "ids": {}}
+
+
+def data_revision(spreadsheet_id: str) -> int:
+    """رقم نسخة بيانات الملف — يُمرر لأي كاش مبني على بياناته حتى يتجدد معها"""
+    revs = _revisions()
+    return revs["all"] + revs["ids"].get(spreadsheet_id, 0)
+
+
+def invalidate(spreadsheet_id: str = None):
+    """إعادة جلب ملف واحد (أو كل الملفات) في الاستدعاء التالي من أي صفحة"""
+    revs = _revisions()
+    with revs["lock"]:
+        if spreadsheet_id is None:
+            revs["all"] += 1
+        else:
+            revs["ids"][spreadsheet_id] = revs["ids"].get(spreadsheet_id, 0) + 1
+    store = _values_store()
+    with store["lock"]:
+        for key in [k for k in store["entries"] if spreadsheet_id is None or k[0] == spreadsheet_id]:
+            del store["entries"][key]
+
+
+@st.cache_data(ttl=SHEET_CACHE_TTL, show_spinner=False)
+def _worksheet_titles(spreadsheet_id: str, revision: int) -> list:
+    return [ws.title for ws in with_backoff(open_spreadsheet(spreadsheet_id).worksheets)]
+
+
+# خلايا الأوراق في مخزن ذاكرة مشترك (وليس st.cache_data) حتى يمكن ملؤه من خيوط الجلب المتوازي،
+# فلا تُستدعى أي دالة Streamlit خارج خيط السكربت.
+@st.cache_resource(show_spinner=False)
+def _values_store() -> dict:
+    return {"lock": threading.Lock(), "entries": OrderedDict()}
+
+
+def _stored_values(store: dict, key: tuple):
+    with store["lock"]:
+        entry = store["entries"].get(key)
+        if entry is None or time.monotonic() - entry[0] > SHEET_CACHE_TTL:
+            return None
+        store["entries"].move_to_end(key)
+        return entry[1]
+
+
+def _store_values(store: dict, key: tuple, values: list):
+    with store["lock"]:
+        store["entries"][key] = (time.monotonic(), values)
+        store["entries"].move_to_end(key)
+        while len(store["entries"]) > MAX_CACHED_SHEETS:
+            store["entries"].popitem(last=False)
+
+
+def _fetch_values(spreadsheet, worksheet_name: str) -> list:
+    """get_all_values لورقة من مقبض ملف مفتوح — بدون Streamlit، آمنة في أي خيط"""
+    ws = with_backoff(spreadsheet.worksheet, worksheet_name.strip())
+    return with_backoff(ws.get_all_values)
+
+
+def _worksheet_values(spreadsheet_id: str, worksheet_name: str, revision: int) -> list:
+    store = _values_store()
+    key = (spreadsheet_id, worksheet_name, revision)
+    values = _stored_values(store, key)
+    if values is None:
+        values = _fetch_values(open_spreadsheet(spreadsheet_id), worksheet_name)
+        _store_values(store, key, values)
+    return values
+
+
+@st.cache_data(ttl=SHEET_CACHE_TTL, show_spinner=False, max_entries=512)
+def _worksheet_frame(spreadsheet_id: str, worksheet_name: str, revision: int) -> pd.DataFrame:
+    vals = _worksheet_values(spreadsheet_id, worksheet_name, revision)
+    if not vals:
+        return pd.DataFrame()
+    header = make_headers_unique([str(h).strip() for h in vals[0]])
+    return pd.DataFrame(vals[1:], columns=header)
+
+
+def list_worksheets(spreadsheet_id: str) -> list:
+    """أسماء أوراق الملف"""
+    return _worksheet_titles(spreadsheet_id, data_revision(spreadsheet_id))
+
+
+def worksheet_values(spreadsheet_id: str, worksheet_name: str) -> list:
+    """كل خلايا الورقة كقوائم نصوص (مثل get_all_values) — مشتركة بين الجلسات، لا تُعدل"""
+    return _worksheet_values(spreadsheet_id, worksheet_name, data_revision(spreadsheet_id))
+
+
+def worksheet_frame(spreadsheet_id: str, worksheet_name: str) -> pd.DataFrame:
+    """الورقة كجدول بعناوين الصف الأول (المكرر يصبح name.1، name.2...)"""
+    return _worksheet_frame(spreadsheet_id, worksheet_name, data_revision(spreadsheet_id))
+
+
+def workbook_values(spreadsheet_id: str, worksheet_names=None, workers: int = FETCH_WORKERS):
+    """({اسم الورقة: الخلايا}, {اسم الورقة: الخطأ}) لكل أوراق الملف أو المحددة
+
+    تُجلب بالتوازي ومن نفس كاش الورقة الواحدة، فالورقة التي فتحتها صفحة أخرى لا تُنزل مرة ثانية.
+    """
+    names = list(worksheet_names) if worksheet_names is not None else list_worksheets(spreadsheet_id)
+    values, errors = {}, {}
+    if not names:
+        return values, errors
+    revision = data_revision(spreadsheet_id)
+    store = _values_store()
+    missing = []
+    for name in names:
+        cached = _stored_values(store, (spreadsheet_id, name, revision))
+        if cached is None:
+            missing.append(name)
+        else:
+            values[name] = cached
+    if not missing:
+        return values, errors
+
+    # مقبض الملف من خيط السكربت؛ الخيوط تنفذ طلبات gspread فقط
+    spreadsheet = open_spreadsheet(spreadsheet_id)
+    with ThreadPoolExecutor(max_workers=min(workers, len(missing)), thread_name_prefix="sheets-fetch") as pool:
+        futures = {name: pool.submit(_fetch_values, spreadsheet, name) for name in missing}
+        for name, future in futures.items():
+            try:
+                values[name] = future.result()
+            except Exception as e:
+                errors[name] = str(e)
+            else:
+                _store_values(store, (spreadsheet_id, name, revision), values[name])
+    return {name: values[name] for name in names if name in values}, errors
@@ -0,0 +1,49 @@
+# amany/tables.py — عرض الجداول الكبيرة على صفحات مع تنسيق الصفحة المعروضة فقط
+import math
+
+import pandas as pd
+import streamlit as st
+
+PAGE_SIZES = (50, 100, 250, 500, 1000)
+DEFAULT_PAGE_SIZE = 100
+
+
+def paged_dataframe(df: pd.DataFrame, key: str, style=None, column_config=None,
+                    page_size: int = DEFAULT_PAGE_SIZE, height: int = None):
+    """عرض جدول صفحةً صفحة: تُقطع الصفوف على الخادم ولا يُنسق إلا النطاق الظاهر
+
+    style: دالة اختيارية تستقبل نافذة الصفوف وتعيد DataFrame أو Styler.
+    column_config: قاموس إعدادات الأعمدة، أو دالة تستقبل النافذة بعد style وتعيده.
+    """
+    total = len(df)
+    if total <= page_size:
+        _render(df.copy(), style, column_config, height)
+        return
+
+    size_key, page_key = f"{key}_page_size", f"{key}_page"
+    sizes = sorted(set(PAGE_SIZES) | {page_size})
+
+    c1, c2, c3 = st.columns([1, 1, 2])
+    with c1:
+        size = st.selectbox("عدد الصفوف في الصفحة:", sizes, index=sizes.index(page_size), key=size_key)
+    pages = max(1, math.ceil(total / size))
+    # تصحيح رقم الصفحة إذا تغير حجم الصفحة أو تقلصت البيانات
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    with c2:
+        page = int(st.number_input("الصفحة:", min_value=1, max_value=pages, step=1, key=page_key))
+
+    start = (page - 1) * size
+    end = min(start + size, total)
+    with c3:
+        st.caption(f"صفحة {page:,} من {pages:,} — الصفوف {start + 1:,} – {end:,} من {total:,}")
+
+    _render(df.iloc[start:end].copy(), style, column_config, height)
+
+
+def _render(window: pd.DataFrame, style, column_config, height):
+    view = style(window) if style else window
+    extra = {"height": height} if height else {}
+    if column_config is not None:
+        extra["column_config"] = column_config(view) if callable(column_config) else column_config
+    st.dataframe(view, use_container_width=True, **extra)
@@ -0,0 +1,190 @@
+# amany/transport.py — جلسة HTTP مُدارة لعملاء gspread: اتصالات دائمة (keep-alive)، تجديد التوكن قبل انتهائه، وقياس زمن كل طلب
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+# عدد المضيفين المحتفظ باتصالاتهم (sheets / drive / oauth2) وعدد الاتصالات المفتوحة لكل مضيف
+POOL_HOSTS = 4
+POOL_SIZE = 8
+# (مهلة الاتصال، مهلة القراءة) بالثواني لأي طلب لم يحدد مهلته
+DEFAULT_TIMEOUT = (10, 120)
+# يُجدد التوكن في الخلفية إذا بقي على انتهائه أقل من هذه المدة
+REFRESH_MARGIN = timedelta(minutes=5)
+# عدد الطلبات الأخيرة المحفوظة لحساب مقاييس الزمن
+METRICS_HISTORY = 1000
+
+SOCKET_OPTIONS = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """مجمع اتصالات أكبر من الافتراضي مع TCP keep-alive حتى لا تُغلق الاتصالات الخاملة بين الدفعات"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault("socket_options", SOCKET_OPTIONS)
+        super().init_poolmanager(*args, **kwargs)
+
+
+def _mount(session: requests.Session, pool_hosts: int, pool_size: int) -> requests.Session:
+    # إعادة المحاولة هنا لأخطاء الاتصال فقط؛ أخطاء الحصة (429) تعالجها with_backoff
+    retry = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.3)
+    for prefix in ("https://", "http://"):
+        session.mount(prefix, _KeepAliveAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size, max_retries=retry))
+    return session
+
+
+def _utcnow() -> datetime:
+    # google-auth يحفظ expiry كوقت UTC بدون منطقة زمنية
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ManagedTransport(requests.Session):
+    """جلسة requests واحدة طويلة العمر تُمرر لعميل gspread بدلاً من AuthorizedSession الافتراضية
+
+    credentials: بيانات اعتماد google-auth (أو None لطلبات بدون توكن، مثل خادم محلي للاختبار).
+    التوكن يُجدد في خيط خلفي قبل انتهائه بـ REFRESH_MARGIN فلا تنتظره الطلبات؛ إذا انتهى فعلاً
+    يُجدد قبل الطلب، وعند رد 401 يُجدد ويُعاد الطلب مرة واحدة.
+    """
+
+    def __init__(self, credentials=None, pool_hosts: int = POOL_HOSTS, pool_size: int = POOL_SIZE,
+                 timeout=DEFAULT_TIMEOUT, refresh_margin: timedelta = REFRESH_MARGIN,
+                 history: int = METRICS_HISTORY):
+        super().__init__()
+        _mount(self, pool_hosts, pool_size)
+        self.credentials = credentials
+        self.timeout = timeout
+        self.refresh_margin = refresh_margin
+        self._auth_session = _mount(requests.Session(), 1, 2)
+        self._refresh_lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="token-refresh")
+        self._refreshing = None
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=history)
+        self._totals = {"requests": 0, "errors": 0, "refreshes": 0}
+
+    # ============ التوكن ============
+    def _token_request(self):
+        from google.auth.transport.requests import Request
+        return Request(session=self._auth_session)
+
+    def _expires_in(self):
+        expiry = getattr(self.credentials, "expiry", None)
+        return None if expiry is None else expiry - _utcnow()
+
+    def _needs_refresh(self, margin: timedelta) -> bool:
+        left = self._expires_in()
+        return not getattr(self.credentials, "token", None) or (left is not None and left <= margin)
+
+    def refresh_token(self, margin: timedelta = None) -> None:
+        """تجديد التوكن (طلب تجديد واحد في نفس الوقت)
+
+        margin: يُجدد فقط إذا بقي على الانتهاء أقل منها — الخيوط التي انتظرت تجديداً جارياً لا تكرره.
+        """
+        with self._refresh_lock:
+            if margin is not None and not self._needs_refresh(margin):
+                return
+            self.credentials.refresh(self._token_request())
+        with self._lock:
+            self._totals["refreshes"] += 1
+
+    def _ensure_token(self) -> None:
+        if self.credentials is None:
+            return
+        if self._needs_refresh(timedelta(0)):
+            self.refresh_token(timedelta(0))
+        elif self._needs_refresh(self.refresh_margin):
+            with self._lock:
+                if self._refreshing is None or self._refreshing.done():
+                    self._refreshing = self._refresher.submit(self.refresh_token, self.refresh_margin)
+
+    def _authorize(self, headers):
+        headers = dict(headers or {})
+        if self.credentials is not None:
+            self.credentials.apply(headers)
+        return headers
+
+    # ============ الطلبات ============
+    def request(self, method, url, *args, headers=None, timeout=None, **kwargs):
+        self._ensure_token()
+        timeout = self.timeout if timeout is None else timeout
+        response = self._timed(method, url, *args, headers=self._authorize(headers), timeout=timeout, **kwargs)
+        if response.status_code == 401 and self.credentials is not None:
+            self.refresh_token()
+            response = self._timed(method, url, *args, headers=self._authorize(headers), timeout=timeout, **kwargs)
+        return response
+
+    def _timed(self, method, url, *args, **kwargs):
+        start = time.perf_counter()
+        status = None
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            self._record(method, url, status, time.perf_counter() - start)
+
+    def _record(self, method, url, status, seconds):
+        parts = urlsplit(url)
+        with self._lock:
+            self._totals["requests"] += 1
+            if status is None or status >= 400:
+                self._totals["errors"] += 1
+            self._samples.append((time.time(), method.upper(), parts.netloc, parts.path, status, seconds))
+
+    # ============ المقاييس ============
+    def connections_opened(self) -> int:
+        """عدد اتصالات TCP/TLS التي فُتحت منذ إنشاء الجلسة (مع keep-alive يبقى قريباً من عدد الخيوط)"""
+        total = 0
+        for adapter in self.adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                total += getattr(pool, "num_connections", 0) if pool is not None else 0
+        return total
+
+    def recent_requests(self) -> list:
+        """آخر الطلبات: (وقت، طريقة، مضيف، مسار، حالة، ثوان)"""
+        with self._lock:
+            return list(self._samples)
+
+    def metrics(self) -> dict:
+        """ملخص زمن الطلبات الأخيرة بالمللي ثانية وعدد الطلبات والأخطاء والاتصالات وتجديدات التوكن"""
+        with self._lock:
+            times = sorted(s[-1] * 1000 for s in self._samples)
+            totals = dict(self._totals)
+
+        def percentile(q):
+            return round(times[min(len(times) - 1, int(q * len(times)))], 1) if times else None
+
+        return {
+            **totals,
+            "connections": self.connections_opened(),
+            "mean_ms": round(sum(times) / len(times), 1) if times else None,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "max_ms": round(times[-1], 1) if times else None,
+        }
+
+    def close(self):
+        self._refresher.shutdown(wait=False)
+        self._auth_session.close()
+        super().close()
+
+
+def gspread_client(transport: ManagedTransport):
+    """عميل gspread يستخدم الجلسة المُدارة (gspread 5 و6 يقبلان session=)"""
+    import gspread
+    client = gspread.Client(transport.credentials, session=transport)
+    # gspread 6 لا يحفظ auth إذا مُررت جلسة، وlogin/expiry تحتاجها
+    http_client = getattr(client, "http_client", None)
+    if http_client is not None:
+        http_client.auth = transport.credentials
+    return client
@@ -0,0 +1,179 @@
+# amany/workbooks.py — كاش دائم لملفات Excel المحلية مفتاحه (المسار، وقت التعديل، الحجم)
+import hashlib
+import json
+import os
+
+import pandas as pd
+import streamlit as st
+
+from amany import excel_reader
+
+WORKBOOK_CACHE_DIR = os.path.join(".cache", "workbooks")
+
+
+# ============ توقيع الملف ومسارات الكاش ============
+def file_signature(path: str) -> tuple:
+    """(المسار، وقت التعديل بالنانوثانية، الحجم) — يتغير عند استبدال الملف أو تعديله"""
+    st_ = os.stat(path)
+    return (os.path.abspath(path), st_.st_mtime_ns, st_.st_size)
+
+
+def _path_key(path: str) -> str:
+    return hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+
+
+def _signature_key(signature: tuple) -> str:
+    path, mtime_ns, size = signature
+    return f"{_path_key(path)}-{mtime_ns}-{size}"
+
+
+def _cache_file(signature: tuple, suffix: str) -> str:
+    return os.path.join(WORKBOOK_CACHE_DIR, f"{_signature_key(signature)}{suffix}")
+
+
+def _sheet_suffix(sheet_name, usecols=None, nrows=None) -> str:
+    ident = str(sheet_name) if usecols is None else f"{sheet_name}|{','.join(map(str, usecols))}"
+    if nrows is not None:
+        ident += f"|{nrows}"
+    return "--" + hashlib.sha1(ident.encode("utf-8")).hexdigest()[:12] + ".pkl"
+
+
+def forget_workbook(path: str):
+    """حذف كل نسخ الكاش على القرص لملف أُزيل"""
+    prefix = _path_key(path) + "-"
+    try:
+        for name in os.listdir(WORKBOOK_CACHE_DIR):
+            if name.startswith(prefix):
+                os.remove(os.path.join(WORKBOOK_CACHE_DIR, name))
+    except OSError:
+        pass
+
+
+def _purge_stale(signature: tuple):
+    """حذف نسخ الكاش القديمة لنفس الملف بعد تغير توقيعه"""
+    prefix = _path_key(signature[0]) + "-"
+    current = _signature_key(signature)
+    try:
+        for name in os.listdir(WORKBOOK_CACHE_DIR):
+            if name.startswith(prefix) and not name.startswith(current):
+                os.remove(os.path.join(WORKBOOK_CACHE_DIR, name))
+    except OSError:
+        pass
+
+
+# ============ أسماء الأوراق والشبكة الخام ============
+# _load_* تقرأ عبر الكاش على القرص فقط (بدون Streamlit) فتصلح لخيوط الخلفية؛
+# _sheet_names / _raw_grid تضيف فوقها كاش st.cache_data في الذاكرة لخيط السكربت.
+def _load_sheet_names(signature: tuple) -> list:
+    cache_path = _cache_file(signature, ".sheets.json")
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    names = excel_reader.sheet_names(signature[0])
+    try:
+        os.makedirs(WORKBOOK_CACHE_DIR, exist_ok=True)
+        _purge_stale(signature)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(names, f, ensure_ascii=False)
+    except OSError:
+        pass
+    return names
+
+
+def _compact(grid: pd.DataFrame) -> pd.DataFrame:
+    """تصغير الشبكة: الأعمدة الرقمية بالكامل تصبح أعمدة أرقام بدلاً من object"""
+    return grid.infer_objects()
+
+
+def _load_grid(signature: tuple, sheet_name, usecols: tuple = None, nrows: int = None) -> pd.DataFrame:
+    cache_path = _cache_file(signature, _sheet_suffix(sheet_name, usecols, nrows))
+    if os.path.exists(cache_path):
+        try:
+            return pd.read_pickle(cache_path)
+        except Exception:
+            pass
+
+    grid = _compact(excel_reader.read_grid(signature[0], sheet_name, usecols=usecols, nrows=nrows))
+    try:
+        os.makedirs(WORKBOOK_CACHE_DIR, exist_ok=True)
+        _purge_stale(signature)
+        grid.to_pickle(cache_path)
+    except OSError:
+        pass
+    return grid
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _sheet_names(signature: tuple) -> list:
+    return _load_sheet_names(signature)
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _raw_grid(signature: tuple, sheet_name, usecols: tuple = None, nrows: int = None) -> pd.DataFrame:
+    """الشبكة الخام للورقة (بدون عناوين) — تُقرأ من الملف مرة واحدة لكل توقيع"""
+    return _load_grid(signature, sheet_name, usecols, nrows)
+
+
+# ============ العناوين ============
+def merge_header_rows(row1, row2) -> list:
+    """دمج صفي عناوين (الخلايا المدمجة في Excel) في عنوان واحد لكل عمود"""
+    return [f"{h1} {h2}".strip().replace('nan', '') for h1, h2 in zip(row1.fillna(''), row2.fillna(''))]
+
+
+def _unique_headers(row) -> list:
+    """عناوين الصف الأول كما يفعل pd.read_excel (Unnamed: i وإلحاق .1 للمكرر)"""
+    seen = {}
+    out = []
+    for i, h in enumerate(row):
+        name = f"Unnamed: {i}" if pd.isna(h) else (str(h) if not isinstance(h, (int, float)) else h)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        out.append(name)
+    return out
+
+
+# ============ الواجهة العامة ============
+def sheet_names(path: str, memory: bool = True) -> list:
+    """أسماء أوراق الملف (بدون فتحه إذا لم يتغير)
+
+    memory=False: كاش القرص فقط بدون st.cache_data (للاستدعاء من خيوط الخلفية)
+    """
+    return (_sheet_names if memory else _load_sheet_names)(file_signature(path))
+
+
+def read_sheet(path: str, sheet_name=0, header_rows: int = 1, usecols=None, nrows: int = None,
+               memory: bool = True) -> pd.DataFrame:
+    """قراءة ورقة من الكاش
+
+    header_rows=0: بدون عناوين (شبكة خام)
+    header_rows=1: الصف الأول عناوين (مثل pd.read_excel الافتراضي)
+    header_rows=2: دمج الصفين الأولين في عنوان واحد
+    usecols: أرقام الأعمدة المطلوبة فقط (تبدأ من 0)
+    nrows: أقصى عدد صفوف يُقرأ من الورقة (شاملاً صفوف العناوين)
+    memory=False: كاش القرص فقط بدون st.cache_data (للاستدعاء من خيوط الخلفية)
+    """
+    signature = file_signature(path)
+    names, grid_of = (_sheet_names, _raw_grid) if memory else (_load_sheet_names, _load_grid)
+    if isinstance(sheet_name, int):
+        sheet_name = names(signature)[sheet_name]
+    grid = grid_of(signature, sheet_name, None if usecols is None else tuple(usecols), nrows)
+
+    if header_rows == 0 or grid.empty:
+        return grid.copy()
+    if header_rows == 1:
+        headers = _unique_headers(grid.iloc[0])
+    elif header_rows == 2:
+        second = grid.iloc[1] if len(grid) > 1 else pd.Series([None] * grid.shape[1])
+        headers = merge_header_rows(grid.iloc[0], second)
+    else:
+        raise ValueError("header_rows يجب أن يكون 0 أو 1 أو 2")
+
+    body = grid.iloc[header_rows:].reset_index(drop=True).infer_objects()
+    body.columns = headers
+    return body
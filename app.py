@@ -1,16 +1,17 @@
 # app.py — لوحة تحليل البيانات الصحية مع التنسيق الفوسفوري
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import numpy as np
 from collections.abc import Mapping
-import time
 import pytz
-import json
+
+from amany.data_export import download_controls
+from amany.formatting import coerce_numeric_columns, number_column_config, round_numeric_columns
+from amany.sheets import data_revision, invalidate, list_worksheets, transport_metrics, worksheet_frame
+from amany.tables import paged_dataframe
 
 # ============ استيراد آمن لـ scipy ============
 try:
@@ -278,62 +279,14 @@ h1, h2, h3, h4, h5, h6 {
 </style>
 """, unsafe_allow_html=True)
 
-# ============ إصلاح مشكلة Secrets ============
-def get_google_credentials():
-    """الحصول على بيانات الاعتماد من Secrets بشكل آمن"""
-    try:
-        if 'gcp_service_account' in st.secrets:
-            if isinstance(st.secrets['gcp_service_account'], str):
-                return json.loads(st.secrets['gcp_service_account'])
-            else:
-                return dict(st.secrets['gcp_service_account'])
-        else:
-            st.error("❌ لم يتم العثور على إعدادات Google Service Account في Secrets")
-            return None
-    except Exception as e:
-        st.error(f"❌ خطأ في تحميل إعدادات Google: {e}")
-        return None
-
 # ============ معرف ملف البيانات ============
 PHC_SPREADSHEET_ID = "1ptbPIJ9Z0k92SFcXNqAeC61SXNpamCm-dXPb97cPT_4"
 
 # ============ الدوال المساعدة للاتصال ============
-def with_backoff(func, *args, **kwargs):
-    """إعادة المحاولة مع فترات انتظار"""
-    for delay in [0.5, 1, 2, 4, 8]:
-        try:
-            return func(*args, **kwargs)
-        except Exception as e:
-            if "429" in str(e) or "Quota" in str(e):
-                time.sleep(delay)
-                continue
-            raise
-    raise RuntimeError("فشلت جميع محاولات إعادة الاتصال")
-
-@st.cache_resource(ttl=7200)
-def get_spreadsheet(spreadsheet_id: str):
-    """الاتصال بملف Google Sheets"""
-    try:
-        credentials_dict = get_google_credentials()
-        if not credentials_dict:
-            return None
-            
-        scopes = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
-        creds = Credentials.from_service_account_info(credentials_dict, scopes=scopes)
-        client = gspread.authorize(creds)
-        return with_backoff(client.open_by_key, spreadsheet_id)
-    except Exception as e:
-        st.error(f"❌ خطأ في الاتصال بجوجل شيتس: {e}")
-        return None
-
-@st.cache_data(ttl=900)
 def list_facility_sheets(spreadsheet_id: str):
     """الحصول على قائمة المنشآت"""
     try:
-        sh = get_spreadsheet(spreadsheet_id)
-        if not sh:
-            return []
-        titles = [ws.title for ws in sh.worksheets()]
+        titles = list_worksheets(spreadsheet_id)
         blacklist = {"config", "config!", "readme", "financial", "kpi", "test"}
         facilities = [t for t in titles if t.strip().lower() not in blacklist]
         return facilities
@@ -341,28 +294,10 @@ def list_facility_sheets(spreadsheet_id: str):
         st.error(f"❌ خطأ في قراءة قائمة المنشآت: {e}")
         return []
 
-@st.cache_data(ttl=900)
 def get_df_from_sheet(spreadsheet_id: str, worksheet_name: str) -> pd.DataFrame:
-    """قراءة البيانات من الورقة"""
+    """قراءة البيانات من الورقة (من الكاش المشترك بين الصفحات)"""
     try:
-        sh = get_spreadsheet(spreadsheet_id)
-        if not sh:
-            return pd.DataFrame()
-        ws = sh.worksheet(worksheet_name.strip())
-        vals = ws.get_all_values()
-        
-        if not vals:
-            return pd.DataFrame()
-            
-        header = [str(h).strip() for h in vals[0]]
-        cols = pd.Series(header, dtype=str)
-        
-        for dup in cols[cols.duplicated()].unique():
-            idxs = list(cols[cols == dup].index)
-            for i, idx in enumerate(idxs):
-                cols.iloc[idx] = dup if i == 0 else f"{dup}.{i}"
-                
-        return pd.DataFrame(vals[1:], columns=cols)
+        return worksheet_frame(spreadsheet_id, worksheet_name)
     except Exception as e:
         st.error(f"❌ خطأ في قراءة الورقة '{worksheet_name}': {e}")
         return pd.DataFrame()
@@ -430,18 +365,10 @@ def apply_neon_chart_layout(fig, title: str = "", height: int = 600):
 
 # ============ أدوات الرسم البياني ============
 def style_dataframe(df: pd.DataFrame):
+    """تجهيز الجدول للعرض: أعمدة رقمية مقربة، والتنسيق (فواصل الآلاف) عبر number_column_config"""
     if df.empty:
         return df
-    for col in df.columns:
-        df[col] = pd.to_numeric(df[col].astype(str).str.replace(",", ""), errors="ignore")
-    numeric_cols = df.select_dtypes(include=np.number).columns
-    fmt = {col: "{:,.0f}" for col in numeric_cols}
-    return df.style.format(fmt).set_properties(**{
-        "font-size": "16px", 
-        "border": "1px solid #5a7ff0",
-        "background-color": "#152240",
-        "color": "#ffffff"
-    })
+    return round_numeric_columns(coerce_numeric_columns(df))
 
 def robust_parse_date(series: pd.Series) -> pd.Series:
     s = series.astype(object)
@@ -676,7 +603,8 @@ def display_facility_dashboard(df: pd.DataFrame, facility_name: str, range_prefi
     
     if df.empty or df[date_col].nunique() < 2:
         st.markdown(f'<div class="subtitle">📊 عرض البيانات: {facility_name}</div>', unsafe_allow_html=True)
-        st.dataframe(style_dataframe(df.copy()), use_container_width=True, height=520)
+        paged_dataframe(df, key=f"table_{range_prefix}", style=style_dataframe,
+                        column_config=number_column_config, height=520)
         return
         
     for col in df.columns:
@@ -845,7 +773,8 @@ def display_facility_dashboard(df: pd.DataFrame, facility_name: str, range_prefi
 
     # ============ البيانات التفصيلية ============
     st.markdown('<div class="subtitle">📋 البيانات التفصيلية</div>', unsafe_allow_html=True)
-    st.dataframe(style_dataframe(df_filtered.copy()), use_container_width=True, height=500)
+    paged_dataframe(df_filtered, key=f"details_{range_prefix}", style=style_dataframe,
+                    column_config=number_column_config, height=500)
 
 # ============ مقارنة منشآت محسنة ============
 def compare_facilities():
@@ -1059,7 +988,13 @@ def main():
         # زر تحديث البيانات
         st.markdown('<div class="sidebar-section">', unsafe_allow_html=True)
         if st.button("🔄 تحديث البيانات", use_container_width=True):
+            invalidate()
             st.rerun()
+        with st.expander("📶 أداء الاتصال بجوجل شيتس"):
+            try:
+                st.json(transport_metrics())
+            except Exception as e:
+                st.caption(f"غير متاح: {e}")
         st.markdown('</div>', unsafe_allow_html=True)
 
     # المحتوى الرئيسي
@@ -1084,6 +1019,16 @@ def main():
             return
             
         selected_ws = st.selectbox("🔍 اختر المنشأة:", ws_list, index=0, key="fac_sel")
+
+        def all_facilities_export():
+            # منشأة بعد منشأة من الكاش المشترك: لا تُجمع كل الأوراق في الذاكرة قبل الكتابة
+            for ws in ws_list:
+                df_ws = get_df_from_sheet(PHC_SPREADSHEET_ID, ws)
+                if not df_ws.empty:
+                    yield ws, df_ws
+
+        download_controls(all_facilities_export, "all_facilities.xlsx", "all_facilities", "📚 تصدير كل المنشآت في ملف واحد",
+                          "xlsx", (PHC_SPREADSHEET_ID, data_revision(PHC_SPREADSHEET_ID)))
         df_sel = get_df_from_sheet(PHC_SPREADSHEET_ID, selected_ws)
         
         if df_sel.empty:
@@ -0,0 +1,70 @@
+# benchmarks/bench_excel_reader.py — زمن قراءة ملفات uploads/ بمحرك openpyxl مقابل calamine
+#
+# التشغيل من جذر المشروع:
+#   python benchmarks/bench_excel_reader.py [--folder uploads] [--repeat 3]
+import argparse
+import glob
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from amany import excel_reader  # noqa: E402
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--folder", default="uploads")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.folder, "*.xlsx")))
+    if not files:
+        print(f"لا توجد ملفات xlsx في {args.folder}")
+        return
+    engines = [e for e in excel_reader.ENGINES if e != "calamine" or excel_reader.CALAMINE_AVAILABLE]
+    if not excel_reader.CALAMINE_AVAILABLE:
+        print("python-calamine غير مثبت — سيتم قياس openpyxl فقط")
+
+    header = f"{'الملف':<28}{'pd.read_excel (كل الأوراق)':>28}"
+    for e in engines:
+        header += f"{e + ' (كل الأوراق)':>24}{e + ' (ورقة + 3 أعمدة)':>28}"
+    print(header)
+
+    totals = {}
+    for path in files:
+        names = excel_reader.sheet_names(path)
+        row = f"{os.path.basename(path):<28}"
+        t = timed(lambda: pd.read_excel(path, sheet_name=None, header=None), args.repeat)
+        totals["pandas"] = totals.get("pandas", 0) + t
+        row += f"{t:>28.3f}"
+        for e in engines:
+            t_all = timed(lambda: [excel_reader.read_grid(path, s, engine=e) for s in names], args.repeat)
+            t_one = timed(lambda: excel_reader.read_grid(path, names[0], usecols=[0, 1, 2], engine=e), args.repeat)
+            totals[e] = totals.get(e, 0) + t_all
+            totals[e + "_one"] = totals.get(e + "_one", 0) + t_one
+            row += f"{t_all:>24.3f}{t_one:>28.3f}"
+        print(row)
+
+    print()
+    print(f"المجموع: pd.read_excel {totals['pandas']:.3f} ث")
+    for e in engines:
+        print(f"المجموع: {e} كل الأوراق {totals[e]:.3f} ث — ورقة واحدة/3 أعمدة {totals[e + '_one']:.3f} ث")
+    if "calamine" in totals:
+        print(f"تسريع calamine مقابل openpyxl: {totals['openpyxl'] / totals['calamine']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/bench_style_dataframe.py — زمن تجهيز جدول 50k×40 للعرض: Styler القديم مقابل الأعمدة الرقمية
+#
+# التشغيل من جذر المشروع:
+#   python benchmarks/bench_style_dataframe.py [--rows 50000] [--cols 40]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from amany.formatting import coerce_numeric_columns, number_column_config, round_numeric_columns  # noqa: E402
+
+
+def make_frame(rows: int, cols: int) -> pd.DataFrame:
+    """جدول بقيم نصية بفواصل الآلاف كما تصل من get_all_values"""
+    rng = np.random.default_rng(0)
+    data = {}
+    data["التاريخ"] = pd.date_range("2020-01-01", periods=rows, freq="h").strftime("%d/%m/%Y")
+    for i in range(cols - 1):
+        values = rng.integers(0, 5_000_000, rows)
+        data[f"مؤشر {i}"] = pd.Series(values).map("{:,}".format)
+    return pd.DataFrame(data)
+
+
+def legacy_style_dataframe(df: pd.DataFrame):
+    """التنفيذ السابق (to_numeric errors="ignore" + Styler.format لكل خلية)"""
+    for col in df.columns:
+        txt = df[col].astype(str).str.replace(",", "")
+        try:
+            df[col] = pd.to_numeric(txt)
+        except (ValueError, TypeError):
+            pass
+    numeric_cols = df.select_dtypes(include=np.number).columns
+    fmt = {col: "{:,.0f}" for col in numeric_cols}
+    return df.style.format(fmt).set_properties(**{
+        "font-size": "16px",
+        "border": "1px solid #5a7ff0",
+        "background-color": "#152240",
+        "color": "#ffffff"
+    })
+
+
+def marshall(view, column_config=None):
+    """تحويل الجدول كما يفعل st.dataframe (Arrow + أنماط Styler إن وجدت)"""
+    from streamlit import dataframe_util
+    try:
+        from streamlit.proto.ArrowData_pb2 import ArrowData as ArrowProto
+    except ImportError:  # إصدارات Streamlit الأقدم
+        from streamlit.proto.Arrow_pb2 import Arrow as ArrowProto
+
+    proto = ArrowProto()
+    if isinstance(view, pd.io.formats.style.Styler):
+        from streamlit.elements.lib.pandas_styler_utils import marshall_styler
+        marshall_styler(proto, view, "bench")
+        proto.data = dataframe_util.convert_pandas_df_to_arrow_bytes(view.data)
+    else:
+        proto.data = dataframe_util.convert_pandas_df_to_arrow_bytes(view)
+    return proto
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--cols", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.cols)
+    # بدون رفع هذا الحد يرفض st.dataframe أي Styler أكبر من 262,144 خلية
+    pd.set_option("styler.render.max_elements", args.rows * args.cols)
+    print(f"الجدول: {args.rows:,} صف × {args.cols} عمود")
+
+    def before():
+        marshall(legacy_style_dataframe(df.copy()))
+
+    def after():
+        view = round_numeric_columns(coerce_numeric_columns(df.copy()))
+        marshall(view, number_column_config(view))
+
+    t_before = timed(before, args.repeat)
+    t_after = timed(after, args.repeat)
+    print(f"قبل  (Styler):           {t_before:8.3f} ث")
+    print(f"بعد  (أعمدة رقمية):      {t_after:8.3f} ث")
+    print(f"التسريع:                 {t_before / t_after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
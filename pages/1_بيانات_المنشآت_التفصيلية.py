@@ -4,6 +4,12 @@ import os
 import plotly.graph_objects as go
 import plotly.express as px
 
+from amany.catalog import workbook_catalog
+from amany.facility_analytics import facility_model_cache
+from amany.monthly_store import ingest_folder, kpi_series, list_kpis, list_periods, ytd_rollup
+from amany.directory import facility_directory
+from amany.workbooks import read_sheet
+
 # --- إعدادات الصفحة ---
 st.set_page_config(page_title="AMANY - دليل المنشآت", layout="wide", page_icon="🏥")
 
@@ -59,37 +65,36 @@ if not os.path.exists(FACILITIES_DATA_FILE):
     st.warning("لم يتم العثور على ملف 'facilities_data.xlsx' في مجلد 'uploads'. يرجى إضافته لعرض دليل المنشآت.")
 else:
     try:
-        df_facilities = pd.read_excel(FACILITIES_DATA_FILE)
-        
-        facility_col = next((col for col in df_facilities.columns if "منشأة" in str(col)), None)
-        manager_col = next((col for col in df_facilities.columns if "مدير" in str(col) or "اسم" in str(col)), None)
-        phone_col = next((col for col in df_facilities.columns if "تليفون" in str(col) or "هاتف" in str(col)), None)
-        type_col = next((col for col in df_facilities.columns if "نوع" in str(col)), None)
+        directory = facility_directory(FACILITIES_DATA_FILE)
         
-        if facility_col and manager_col and phone_col:
-            facility_names = df_facilities[facility_col].dropna().tolist()
-            selected_facility_name = st.selectbox("اختر منشأة لعرض بياناتها:", facility_names)
+        if directory is not None:
+            facility_names = directory.names
+            # حساب نماذج تحليلات كل المنشآت في الخلفية ليكون التنقل بينها فورياً
+            facility_models = facility_model_cache()
+            facility_models.precompute(facility_names)
+            search_query = st.text_input("🔍 ابحث عن منشأة:", key="facility_search")
+            shown_names = directory.search(search_query, limit=len(directory)) if search_query else facility_names
+            if search_query and not shown_names:
+                st.info("لا توجد منشأة مطابقة لكلمة البحث.")
+            selected_facility_name = st.selectbox("اختر منشأة لعرض بياناتها:", shown_names)
 
             if selected_facility_name:
-                facility_info = df_facilities[df_facilities[facility_col] == selected_facility_name].iloc[0]
-                manager_name = facility_info[manager_col]
-                phone_number = str(facility_info[phone_col])
-                if not phone_number.startswith("0"):
-                    phone_number = "0" + phone_number
+                facility_info = directory.get(selected_facility_name)
 
-                cols = st.columns(3) if type_col else st.columns(2)
+                cols = st.columns(3) if directory.has_type else st.columns(2)
                 with cols[0]:
-                    st.markdown(f"""<div class="info-card"><h3>اسم مدير المنشأة</h3><p>👨‍⚕️ {manager_name}</p></div>""", unsafe_allow_html=True)
+                    st.markdown(f"""<div class="info-card"><h3>اسم مدير المنشأة</h3><p>👨‍⚕️ {facility_info.manager}</p></div>""", unsafe_allow_html=True)
                 with cols[1]:
-                    st.markdown(f"""<div class="info-card"><h3>رقم التليفون</h3><p>📞 {phone_number}</p></div>""", unsafe_allow_html=True)
-                if type_col:
+                    st.markdown(f"""<div class="info-card"><h3>رقم التليفون</h3><p>📞 {facility_info.phone}</p></div>""", unsafe_allow_html=True)
+                if directory.has_type:
                     with cols[2]:
-                        st.markdown(f"""<div class="info-card"><h3>نوع المنشأة</h3><p>🏢 {facility_info[type_col]}</p></div>""", unsafe_allow_html=True)
+                        st.markdown(f"""<div class="info-card"><h3>نوع المنشأة</h3><p>🏢 {facility_info.facility_type}</p></div>""", unsafe_allow_html=True)
 
-                # --- بداية قسم تحليل بيانات الرويسات ---
-                if "الرويسات" in selected_facility_name:
+                # --- تحليلات المنشأة (ملفات مسجلة في amany/layouts.py أو في Center/<المنشأة>) ---
+                model = facility_models.get(selected_facility_name)
+                if model.has_analytics:
                     st.markdown("---")
-                    st.subheader("تحليلات مركز طب أسرة الرويسات")
+                    st.subheader(f"تحليلات {selected_facility_name}")
 
                     if 'view' not in st.session_state:
                         st.session_state.view = 'operational'
@@ -101,49 +106,35 @@ else:
                         st.session_state.view = 'financial'
                     
                     # --- عرض المؤشرات التشغيلية ---
-                    if st.session_state.view == 'operational':
-                        OPERATIONAL_FILE = os.path.join("Center", "dashboard ruwaisat.xlsx")
-                        if os.path.exists(OPERATIONAL_FILE):
-                            st.info("يتم الآن عرض مؤشرات الأداء التشغيلية من ملف `dashboard ruwaisat.xlsx`.")
+                    if st.session_state.view == 'operational' and "operational" in model.layouts:
+                        op_layout = model.layouts["operational"]
+                        if model.operational:
+                            st.info(f"يتم الآن عرض مؤشرات الأداء التشغيلية من ملف `{op_layout.file}`.")
                             
-                            excel_file_op = pd.ExcelFile(OPERATIONAL_FILE)
-                            sheet_options = excel_file_op.sheet_names
-                            selected_sheet = st.selectbox("اختر ورقة العمل للتحليل:", sheet_options, key="op_sheet")
-
-                            df_op_headers = pd.read_excel(excel_file_op, sheet_name=selected_sheet, header=None, nrows=2)
-                            headers_op = [f"{h1} {h2}".strip().replace('nan', '') for h1, h2 in zip(df_op_headers.iloc[0].fillna(''), df_op_headers.iloc[1].fillna(''))]
-                            df_op = pd.read_excel(excel_file_op, sheet_name=selected_sheet, header=None, skiprows=2)
-                            df_op.columns = headers_op
-
-                            numeric_indices_op = []
-                            for i, col in enumerate(df_op.columns):
-                                if i > 0:
-                                    try:
-                                        df_op[col] = pd.to_numeric(df_op[col], errors='coerce')
-                                        numeric_indices_op.append(i)
-                                    except (ValueError, TypeError):
-                                        continue
+                            selected_sheet = st.selectbox("اختر ورقة العمل للتحليل:", list(model.operational), key="op_sheet")
+
+                            op = model.operational[selected_sheet]
+                            numeric_indices_op = op.column_group("kpis")
+                            total_years = [y.year for y in op_layout.years if y.total_row is not None]
+                            monthly_year = next((y.year for y in reversed(op_layout.years) if y.months), None)
                             
                             st.markdown("### 📈 مؤشرات الأداء الرئيسية السنوية")
                             for i in range(0, len(numeric_indices_op), 4):
                                 kpi_cols_row = st.columns(4)
                                 for j, idx in enumerate(numeric_indices_op[i:i+4]):
                                     with kpi_cols_row[j]:
-                                        val_2023 = df_op.iloc[11, idx] # الصف 14
-                                        val_2024 = df_op.iloc[24, idx] # الصف 27
+                                        values_html = "".join(
+                                            f'<div class="kpi-value">{op.total(year, idx):,.0f}<span class="year-badge">{year}</span></div>'
+                                            for year in total_years
+                                        )
                                         st.markdown(f"""
                                             <div class="kpi-card">
-                                                <div class="kpi-title">{headers_op[idx]}</div>
-                                                <div class="kpi-value">{val_2023:,.0f}<span class="year-badge">2023</span></div>
-                                                <div class="kpi-value">{val_2024:,.0f}<span class="year-badge">2024</span></div>
+                                                <div class="kpi-title">{op.header(idx)}</div>
+                                                {values_html}
                                             </div>
                                         """, unsafe_allow_html=True)
 
-                            st.markdown("### 📊 الرسوم البيانية وتحليلات 2025")
-                            
-                            df_2025 = df_op.iloc[25:37].copy() 
-                            df_2025.reset_index(drop=True, inplace=True)
-                            months_2025 = ["يناير", "فبراير", "مارس", "أبريل", "مايو", "يونيو", "يوليو", "أغسطس", "سبتمبر", "أكتوبر", "نوفمبر", "ديسمبر"]
+                            st.markdown(f"### 📊 الرسوم البيانية وتحليلات {monthly_year}")
 
                             def get_op_chart_layout(title_text):
                                 return {
@@ -159,10 +150,10 @@ else:
                             def create_op_chart(col_indices, title, chart_type='line'):
                                 fig = go.Figure()
                                 colors = ['#39FF14', '#FFD700', '#FF00FF', '#00FFFF', '#FFA500', '#DA70D6', '#7FFF00'] 
-                                for i, idx in enumerate(col_indices):
-                                    col_name = headers_op[idx]
-                                    y_data = df_2025.iloc[:, idx].dropna()
-                                    x_data = months_2025[:len(y_data)]
+                                df_months = op.monthly(monthly_year, col_indices)
+                                for i, col_name in enumerate(df_months.columns):
+                                    y_data = df_months.iloc[:, i].dropna()
+                                    x_data = y_data.index
                                     
                                     if chart_type == 'line':
                                         fig.add_trace(go.Scatter(x=x_data, y=y_data, name=col_name, mode='lines+markers', line=dict(color=colors[i % len(colors)], width=3), marker=dict(size=8)))
@@ -171,115 +162,103 @@ else:
                                 fig.update_layout(**get_op_chart_layout(title))
                                 st.plotly_chart(fig, use_container_width=True)
 
-                            if "الخدمات المدفوعة" in selected_sheet:
-                                create_op_chart([1, 2, 10, 11, 12, 13, 14], "تردد الخدمات") 
-                                create_op_chart([17, 16, 15], "الصيدلية", chart_type='bar') 
-                                create_op_chart([14, 17], "مقارنة بين التردد والصيدلية") 
-                                create_op_chart([20, 19, 18], "المعمل", chart_type='bar') 
-                                create_op_chart([23, 22, 21], "الأشعة") 
-                                create_op_chart([24, 14], "مقارنة بين إجمالي الخدمات والتردد", chart_type='bar') 
+                            sheet_charts = op_layout.charts_for(selected_sheet)
+                            if sheet_charts:
+                                for chart in sheet_charts:
+                                    create_op_chart(chart["columns"], chart["title"], chart_type=chart.get("type", "line"))
                             else: 
                                 st.info(f"عرض جميع المؤشرات الرقمية لورقة '{selected_sheet}'")
                                 for idx in numeric_indices_op:
-                                    create_op_chart([idx], f"تحليل مؤشر: {headers_op[idx]}")
+                                    create_op_chart([idx], f"تحليل مؤشر: {op.header(idx)}")
 
                         else:
-                            st.error("ملف `dashboard ruwaisat.xlsx` غير موجود في مجلد `Center`.")
+                            st.error(model.errors.get("operational", f"ملف `{op_layout.file}` لا يحتوي على أوراق."))
 
                     # --- عرض التحليل المالي ---
-                    if st.session_state.view == 'financial':
-                        FINANCIAL_FILE = os.path.join("Center", "financial and KPIs.xlsx")
-                        if not os.path.exists(FINANCIAL_FILE):
-                            st.error("ملف `financial and KPIs.xlsx` غير موجود في مجلد `Center`.")
+                    if st.session_state.view == 'financial' and "financial" in model.layouts:
+                        fin_layout = model.layouts["financial"]
+                        if model.financial is None:
+                            st.error(model.errors.get("financial", f"تعذر قراءة ملف `{fin_layout.file}`."))
                         else:
                             try:
                                 st.markdown('<div class="financial-section">', unsafe_allow_html=True)
                                 st.markdown('<p class="financial-title">التحليل المالي وأداء المؤشرات</p>', unsafe_allow_html=True)
 
-                                df_headers = pd.read_excel(FINANCIAL_FILE, header=None, nrows=2)
-                                headers = [f"{h1} {h2}".strip().replace('nan', '') for h1, h2 in zip(df_headers.iloc[0].fillna(''), df_headers.iloc[1].fillna(''))]
-                                df_full = pd.read_excel(FINANCIAL_FILE, header=None, skiprows=2)
-                                df_full.columns = headers
-                                
-                                percent_cols = [h for h in headers if '%' in h]
-                                for col in df_full.columns:
-                                    if col != headers[0]:
-                                        df_full[col] = pd.to_numeric(df_full[col], errors='coerce')
-                                        if col in percent_cols:
-                                            df_full[col] = df_full[col] * 100
-                                
-                                MONTHS_AR = ["يناير", "فبراير", "مارس", "أبريل", "مايو", "يونيو", "يوليو", "أغسطس", "سبتمبر", "أكتوبر", "نوفمبر", "ديسمبر"]
+                                fin = model.financial
+                                prev_year, cur_year = [y.year for y in fin_layout.years][-2:]
+                                total_revenue_col = fin.column_group("total_revenue")[0]
+                                total_expense_col = fin.column_group("total_expense")[0]
 
                                 def get_stock_chart_layout(title_text, y_title):
                                     return go.Layout(title={'text': title_text, 'y':0.9, 'x':0.5, 'xanchor': 'center', 'yanchor': 'top', 'font': {'color': '#c9d1d9', 'size': 18}}, plot_bgcolor='#161b22', paper_bgcolor='#161b22', xaxis=dict(gridcolor='#30363d', tickfont=dict(color='#8b949e')), yaxis=dict(title=y_title, gridcolor='#30363d', tickfont=dict(color='#8b949e'), tickformat=',.1f'), legend=dict(font=dict(color='#c9d1d9')), hovermode='x unified')
 
-                                st.markdown('<p class="financial-sub-title">مقارنة أداء المؤشرات الرئيسية (2024 مقابل 2025)</p>', unsafe_allow_html=True)
+                                def monthly_series(year, col):
+                                    return fin.monthly(year, [col]).iloc[:, 0]
+
+                                st.markdown(f'<p class="financial-sub-title">مقارنة أداء المؤشرات الرئيسية ({prev_year} مقابل {cur_year})</p>', unsafe_allow_html=True)
                                 kpi_cols = st.columns(4)
-                                financial_kpi_indices = range(13, 25) 
                                 
-                                for i, col_idx in enumerate(financial_kpi_indices):
+                                for i, col_idx in enumerate(fin.column_group("kpis")):
                                     with kpi_cols[i % 4]:
-                                        kpi_title = headers[col_idx]
-                                        val_2024 = df_full.iloc[12, col_idx] 
-                                        val_2025 = df_full.iloc[19, col_idx] 
+                                        kpi_title = fin.header(col_idx)
+                                        val_prev = fin.total(prev_year, col_idx)
+                                        val_cur = fin.total(cur_year, col_idx)
                                         is_percent = '%' in kpi_title
-                                        format_2024 = f"{val_2024:,.1f}%" if is_percent and pd.notna(val_2024) else f"{val_2024:,.1f}"
-                                        format_2025 = f"{val_2025:,.1f}%" if is_percent and pd.notna(val_2025) else f"{val_2025:,.1f}"
-                                        trend_arrow, trend_class = ("▲", "trend-up") if val_2025 > val_2024 else (("▼", "trend-down") if val_2025 < val_2024 else ("-", ""))
+                                        format_prev = f"{val_prev:,.1f}%" if is_percent and pd.notna(val_prev) else f"{val_prev:,.1f}"
+                                        format_cur = f"{val_cur:,.1f}%" if is_percent and pd.notna(val_cur) else f"{val_cur:,.1f}"
+                                        trend_arrow, trend_class = ("▲", "trend-up") if val_cur > val_prev else (("▼", "trend-down") if val_cur < val_prev else ("-", ""))
                                         st.markdown(f"""
                                             <div class="kpi-card-financial">
                                                 <div class="kpi-title-financial">{kpi_title}</div>
                                                 <div class="kpi-values-container">
-                                                    <div><div class="kpi-value-financial">{format_2024}</div><span class="year-badge-financial">2024</span></div>
+                                                    <div><div class="kpi-value-financial">{format_prev}</div><span class="year-badge-financial">{prev_year}</span></div>
                                                     <div class="kpi-trend {trend_class}">{trend_arrow}</div>
-                                                    <div><div class="kpi-value-financial">{format_2025}</div><span class="year-badge-financial">2025</span></div>
+                                                    <div><div class="kpi-value-financial">{format_cur}</div><span class="year-badge-financial">{cur_year}</span></div>
                                                 </div>
                                             </div>""", unsafe_allow_html=True)
 
                                 st.markdown('<p class="financial-sub-title">تحليل الإيرادات والمصروفات</p>', unsafe_allow_html=True)
                                 fig_rev_exp = go.Figure()
-                                fig_rev_exp.add_trace(go.Scatter(x=MONTHS_AR, y=df_full.iloc[0:12, 9], name='إجمالي الإيرادات 2024', line=dict(color='#238636', width=2))) 
-                                fig_rev_exp.add_trace(go.Scatter(x=MONTHS_AR, y=df_full.iloc[0:12, 12], name='إجمالي المصروفات 2024', line=dict(color='#da3633', width=2))) 
-                                fig_rev_exp.add_trace(go.Scatter(x=MONTHS_AR[:6], y=df_full.iloc[13:19, 9], name='إجمالي الإيرادات 2025', line=dict(color='#3fb950', width=3)))
-                                fig_rev_exp.add_trace(go.Scatter(x=MONTHS_AR[:6], y=df_full.iloc[13:19, 12], name='إجمالي المصروفات 2025', line=dict(color='#f85149', width=3)))
-                                fig_rev_exp.update_layout(get_stock_chart_layout("مقارنة الإيرادات والمصروفات (2024-2025)", "القيمة (ج.م)"))
+                                for year, width, rev_color, exp_color in ((prev_year, 2, '#238636', '#da3633'), (cur_year, 3, '#3fb950', '#f85149')):
+                                    rev = monthly_series(year, total_revenue_col)
+                                    exp = monthly_series(year, total_expense_col)
+                                    fig_rev_exp.add_trace(go.Scatter(x=rev.index, y=rev, name=f'إجمالي الإيرادات {year}', line=dict(color=rev_color, width=width)))
+                                    fig_rev_exp.add_trace(go.Scatter(x=exp.index, y=exp, name=f'إجمالي المصروفات {year}', line=dict(color=exp_color, width=width)))
+                                fig_rev_exp.update_layout(get_stock_chart_layout(f"مقارنة الإيرادات والمصروفات ({prev_year}-{cur_year})", "القيمة (ج.م)"))
                                 st.plotly_chart(fig_rev_exp, use_container_width=True)
 
                                 st.markdown('<p class="financial-sub-title">تحليل المؤشرات المالية الشهرية</p>', unsafe_allow_html=True)
                                 chart_col1, chart_col2 = st.columns(2)
                                 with chart_col1:
+                                    main_col = fin.column_group("kpi_main")[0]
                                     fig_n = go.Figure()
-                                    fig_n.add_trace(go.Scatter(x=MONTHS_AR, y=df_full.iloc[0:12, 13], name='2024', line=dict(color='#58a6ff', width=2))) 
-                                    fig_n.add_trace(go.Scatter(x=MONTHS_AR[:6], y=df_full.iloc[13:19, 13], name='2025', line=dict(color='#80b9ff', width=3)))
-                                    fig_n.update_layout(get_stock_chart_layout(headers[13], "القيمة"))
+                                    for year, width, color in ((prev_year, 2, '#58a6ff'), (cur_year, 3, '#80b9ff')):
+                                        series = monthly_series(year, main_col)
+                                        fig_n.add_trace(go.Scatter(x=series.index, y=series, name=str(year), line=dict(color=color, width=width)))
+                                    fig_n.update_layout(get_stock_chart_layout(fin.header(main_col), "القيمة"))
                                     st.plotly_chart(fig_n, use_container_width=True)
                                 with chart_col2:
+                                    pair = fin.column_group("kpi_pair")
+                                    pair_colors = {prev_year: ('#db61ff', '#e796ff'), cur_year: ('#c084fc', '#d8b4fe')}
                                     fig_pq = go.Figure()
-                                    fig_pq.add_trace(go.Scatter(x=MONTHS_AR, y=df_full.iloc[0:12, 15], name=f'{headers[15]} 2024', line=dict(color='#db61ff', width=2))) 
-                                    fig_pq.add_trace(go.Scatter(x=MONTHS_AR, y=df_full.iloc[0:12, 16], name=f'{headers[16]} 2024', line=dict(color='#e796ff', width=2))) 
-                                    fig_pq.add_trace(go.Scatter(x=MONTHS_AR[:6], y=df_full.iloc[13:19, 15], name=f'{headers[15]} 2025', line=dict(color='#c084fc', width=3)))
-                                    fig_pq.add_trace(go.Scatter(x=MONTHS_AR[:6], y=df_full.iloc[13:19, 16], name=f'{headers[16]} 2025', line=dict(color='#d8b4fe', width=3)))
-                                    fig_pq.update_layout(get_stock_chart_layout(f"مقارنة: {headers[15]} و {headers[16]}", "القيمة"))
+                                    for year, width in ((prev_year, 2), (cur_year, 3)):
+                                        for col_idx, color in zip(pair, pair_colors[year]):
+                                            series = monthly_series(year, col_idx)
+                                            fig_pq.add_trace(go.Scatter(x=series.index, y=series, name=f'{fin.header(col_idx)} {year}', line=dict(color=color, width=width)))
+                                    fig_pq.update_layout(get_stock_chart_layout(f"مقارنة: {fin.header(pair[0])} و {fin.header(pair[1])}", "القيمة"))
                                     st.plotly_chart(fig_pq, use_container_width=True)
 
-                                st.markdown('<p class="financial-sub-title">تفاصيل الإيرادات والمصروفات لعام 2025</p>', unsafe_allow_html=True)
+                                st.markdown(f'<p class="financial-sub-title">تفاصيل الإيرادات والمصروفات لعام {cur_year}</p>', unsafe_allow_html=True)
                                 bar_col1, bar_col2 = st.columns(2)
                                 with bar_col1:
-                                    revenue_indices = range(2, 9) 
-                                    df_rev_2025 = df_full.iloc[13:19, revenue_indices].copy()
-                                    df_rev_2025.index = MONTHS_AR[:6]
-                                    df_rev_2025.columns = headers[2:9]
-                                    fig_bar_rev = px.bar(df_rev_2025, x=df_rev_2025.index, y=df_rev_2025.columns, labels={'value': 'المبلغ', 'variable': 'بند الإيراد', 'index': 'الشهر'}, color_discrete_sequence=px.colors.sequential.Greens_r)
-                                    fig_bar_rev.update_layout(get_stock_chart_layout("توزيع إيرادات 2025", "المبلغ"), barmode='stack', legend_title_text='بنود الإيرادات')
+                                    df_rev_cur = fin.monthly(cur_year, fin.column_group("revenue_items"))
+                                    fig_bar_rev = px.bar(df_rev_cur, x=df_rev_cur.index, y=df_rev_cur.columns, labels={'value': 'المبلغ', 'variable': 'بند الإيراد', 'index': 'الشهر'}, color_discrete_sequence=px.colors.sequential.Greens_r)
+                                    fig_bar_rev.update_layout(get_stock_chart_layout(f"توزيع إيرادات {cur_year}", "المبلغ"), barmode='stack', legend_title_text='بنود الإيرادات')
                                     st.plotly_chart(fig_bar_rev, use_container_width=True)
                                 with bar_col2:
-                                    expense_indices = range(10, 12) 
-                                    df_exp_2025 = df_full.iloc[13:19, expense_indices].copy()
-                                    df_exp_2025.index = MONTHS_AR[:6]
-                                    df_exp_2025.columns = headers[10:12]
-                                    fig_bar_exp = px.bar(df_exp_2025, x=df_exp_2025.index, y=df_exp_2025.columns, labels={'value': 'المبلغ', 'variable': 'بند المصروف', 'index': 'الشهر'}, color_discrete_sequence=px.colors.sequential.Reds_r)
-                                    # *** السطر الذي تم إصلاحه ***
-                                    fig_bar_exp.update_layout(get_stock_chart_layout("توزيع مصروفات 2025", "المبلغ"), barmode='stack', legend_title_text='بنود المصروفات')
+                                    df_exp_cur = fin.monthly(cur_year, fin.column_group("expense_items"))
+                                    fig_bar_exp = px.bar(df_exp_cur, x=df_exp_cur.index, y=df_exp_cur.columns, labels={'value': 'المبلغ', 'variable': 'بند المصروف', 'index': 'الشهر'}, color_discrete_sequence=px.colors.sequential.Reds_r)
+                                    fig_bar_exp.update_layout(get_stock_chart_layout(f"توزيع مصروفات {cur_year}", "المبلغ"), barmode='stack', legend_title_text='بنود المصروفات')
                                     st.plotly_chart(fig_bar_exp, use_container_width=True)
 
                                 st.markdown('</div>', unsafe_allow_html=True)
@@ -295,25 +274,54 @@ else:
 st.markdown("---")
 st.markdown("<p class=\"main-title\">عرض وتحليل ملفات البيانات الأخرى</p>", unsafe_allow_html=True)
 
-def get_all_files_from_folders(folders):
-    all_files = []
-    for folder in folders:
-        if os.path.exists(folder):
-            files_in_folder = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith((".xlsx", ".xls")) and not f.startswith("~$")]
-            all_files.extend(files_in_folder)
-    return all_files
-
-FOLDERS_TO_SCAN = ["uploads", "Center"]
-all_available_files = get_all_files_from_folders(FOLDERS_TO_SCAN)
+catalog = workbook_catalog()
+all_available_files = catalog.files()
 
 if not all_available_files:
     st.info("لا توجد ملفات إكسل في مجلدي 'uploads' أو 'Center' لعرضها.")
 else:
     file_path_selected = st.selectbox("اختر ملف لعرضه:", all_available_files, format_func=lambda x: os.path.basename(x))
     try:
-        excel_file = pd.ExcelFile(file_path_selected)
-        sheet_name = st.selectbox("اختر ورقة العمل:", excel_file.sheet_names, key=f"sheet_{os.path.basename(file_path_selected)}")
-        df_sheet = pd.read_excel(excel_file, sheet_name=sheet_name)
+        sheet_name = st.selectbox("اختر ورقة العمل:", catalog.sheets(file_path_selected), key=f"sheet_{os.path.basename(file_path_selected)}")
+        df_sheet = read_sheet(file_path_selected, sheet_name)
         st.dataframe(df_sheet, use_container_width=True)
     except Exception as e:
         st.error(f"حدث خطأ أثناء عرض الملف: {e}")
+
+# --- مقارنة المؤشرات عبر الأشهر (من المخزن المجمع لملفات الأشهر) ---
+st.markdown("---")
+st.markdown("<p class=\"main-title\">مقارنة المؤشرات عبر الأشهر</p>", unsafe_allow_html=True)
+
+try:
+    # إعادة التجميع فقط عندما يلاحظ الفهرس تغيراً في الملفات
+    if st.session_state.get("monthly_catalog_version") != catalog.version:
+        _, year_errors = ingest_folder("uploads", year=st.secrets.get("monthly", {}).get("year"))
+        st.session_state["monthly_ingest_errors"] = year_errors
+        st.session_state["monthly_catalog_version"] = catalog.version
+    for name, error in st.session_state.get("monthly_ingest_errors", {}).items():
+        st.warning(f"⚠️ لم يُضف الملف {name}: {error}")
+    kpis = list_kpis()
+    if kpis.empty:
+        st.info("لا توجد ملفات أشهر (يناير، فبراير، ...) في مجلد 'uploads'.")
+    else:
+        col_sheet, col_kpi = st.columns([1, 2])
+        with col_sheet:
+            trend_sheet = st.selectbox("الورقة:", kpis["sheet"].unique().tolist(), key="trend_sheet")
+        with col_kpi:
+            trend_kpi = st.selectbox("المؤشر:", kpis.loc[kpis["sheet"] == trend_sheet, "kpi"].tolist(), key="trend_kpi")
+
+        series = kpi_series(trend_sheet, trend_kpi)
+        if not series.empty:
+            fig_trend = px.line(series, x=series.index, y=series.columns, markers=True,
+                                labels={"x": "الشهر", "value": trend_kpi, "facility": "المنشأة"})
+            st.plotly_chart(fig_trend, use_container_width=True)
+
+        periods = list_periods()
+        latest_year, latest_month = map(int, periods[-1].split("-"))
+        ytd = ytd_rollup(latest_year, latest_month, sheet=trend_sheet)
+        if not ytd.empty:
+            st.markdown(f"**إجمالي من بداية {latest_year} حتى {periods[-1]} — {trend_sheet}** (النسب = متوسط)")
+            ytd.columns = ytd.columns.get_level_values("kpi")
+            st.dataframe(ytd, use_container_width=True)
+except Exception as e:
+    st.error(f"حدث خطأ أثناء تجميع ملفات الأشهر: {e}")
@@ -1,15 +1,17 @@
 # pages/3_ASK_AMANY.py
 import streamlit as st
 import pandas as pd
-import gspread
 import numpy as np
-from google.oauth2.service_account import Credentials
 from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
 from io import BytesIO
 import re
 
+from amany.column_roles import column_roles, detect_organization_type
+from amany.formatting import coerce_numeric_columns
+from amany.sheets import workbook_values
+
 # إعداد الصفحة
 st.set_page_config(
     page_title="ASK AMANY - المساعد الذكي",
@@ -109,53 +111,28 @@ class FinancialAnalyst:
     
     def detect_data_frequency(self, df):
         """اكتشاف تواتر البيانات (يومي، شهري، سنوي)"""
-        date_columns = ['date', 'تاريخ', 'month', 'شهر', 'year', 'سنة']
-        for col in df.columns:
-            col_lower = str(col).lower()
-            if any(keyword in col_lower for keyword in date_columns):
-                try:
-                    dates = pd.to_datetime(df[col], errors='coerce')
-                    valid_dates = dates.dropna()
-                    if len(valid_dates) > 1:
-                        date_diff = (valid_dates.max() - valid_dates.min()).days
-                        num_periods = len(valid_dates)
-                        avg_days_between = date_diff / num_periods
-                        
-                        if avg_days_between <= 7:
-                            return "يومي"
-                        elif avg_days_between <= 35:
-                            return "شهري"
-                        else:
-                            return "سنوي"
-                except:
-                    pass
+        for col in column_roles(df.columns).columns_for("date"):
+            try:
+                dates = pd.to_datetime(df[col], errors='coerce')
+                valid_dates = dates.dropna()
+                if len(valid_dates) > 1:
+                    date_diff = (valid_dates.max() - valid_dates.min()).days
+                    num_periods = len(valid_dates)
+                    avg_days_between = date_diff / num_periods
+                    
+                    if avg_days_between <= 7:
+                        return "يومي"
+                    elif avg_days_between <= 35:
+                        return "شهري"
+                    else:
+                        return "سنوي"
+            except:
+                pass
         return "غير محدد"
     
     def detect_organization_type(self, sheet_name, columns):
         """اكتشاف نوع المنشأة بناءً على اسم الورقة والأعمدة"""
-        sheet_lower = sheet_name.lower()
-        columns_lower = [str(col).lower() for col in columns]
-        
-        # تحليل اسم الورقة والأعمدة
-        healthcare_indicators = ['مستشفى', 'عيادة', 'مريض', 'طبيب', 'علاج', 'health', 'hospital', 'clinic', 'medical']
-        retail_indicators = ['مبيعات', 'منتج', 'عميل', 'متجر', 'sales', 'product', 'customer', 'revenue']
-        service_indicators = ['خدمة', 'عميل', 'مشروع', 'service', 'client', 'project']
-        financial_indicators = ['ميزانية', 'ربح', 'خسارة', 'مصروف', 'إيراد', 'budget', 'profit', 'loss', 'expense', 'income']
-        
-        if any(indicator in sheet_lower for indicator in healthcare_indicators) or \
-           any(any(indicator in col for indicator in healthcare_indicators) for col in columns_lower):
-            return "منشأة صحية"
-        elif any(indicator in sheet_lower for indicator in retail_indicators) or \
-             any(any(indicator in col for indicator in retail_indicators) for col in columns_lower):
-            return "منشأة تجارية"
-        elif any(indicator in sheet_lower for indicator in service_indicators) or \
-             any(any(indicator in col for indicator in service_indicators) for col in columns_lower):
-            return "منشأة خدمية"
-        elif any(indicator in sheet_lower for indicator in financial_indicators) or \
-             any(any(indicator in col for indicator in financial_indicators) for col in columns_lower):
-            return "منشأة مالية"
-        else:
-            return "منشأة عامة"
+        return detect_organization_type(sheet_name, columns)
     
     def generate_statistical_report(self, df, sheet_name, columns):
         """توليد تقرير إحصائي مفصل"""
@@ -198,8 +175,9 @@ class FinancialAnalyst:
             report.append("### 🎯 مؤشرات الأداء الرئيسية (KPIs)")
             
             # البحث عن أعمدة الإيرادات والمصروفات
-            revenue_cols = [col for col in numeric_columns if any(word in str(col).lower() for word in ['إيراد', 'ربح', 'دخل', 'revenue', 'income', 'sales'])]
-            expense_cols = [col for col in numeric_columns if any(word in str(col).lower() for word in ['مصروف', 'تكلفة', 'خسارة', 'expense', 'cost'])]
+            roles = column_roles(df.columns)
+            revenue_cols = roles.columns_for("revenue", among=numeric_columns)
+            expense_cols = roles.columns_for("expense", among=numeric_columns)
             
             if revenue_cols and expense_cols:
                 total_revenue = df[revenue_cols[0]].sum()
@@ -442,69 +420,49 @@ class FinancialAnalyst:
 # دوال الاتصال بجوجل شيتس
 # ---------------------------
 
-@st.cache_resource
-def get_google_sheets_client():
-    """الاتصال بجوجل شيتس"""
-    try:
-        creds = Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"],
-            scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"],
-        )
-        client = gspread.authorize(creds)
-        return client
-    except Exception as e:
-        st.error(f"خطأ في الاتصال: {e}")
-        return None
+def _unique_headers(headers):
+    """معالجة العناوين المكررة (الاسم، الاسم_2، ...)"""
+    unique_headers = []
+    header_count = {}
+    for header in headers:
+        header_str = str(header).strip() or "Column"
+        if header_str in header_count:
+            header_count[header_str] += 1
+            unique_headers.append(f"{header_str}_{header_count[header_str]}")
+        else:
+            header_count[header_str] = 1
+            unique_headers.append(header_str)
+    return unique_headers
+
+def get_spreadsheet_data(spreadsheet_id):
+    """جلب بيانات السبريدشيت مع معالجة العناوين المكررة
 
-@st.cache_data
-def get_spreadsheet_data(_client, spreadsheet_id):
-    """جلب بيانات السبريدشيت مع معالجة العناوين المكررة"""
+    كل الأوراق تُجلب بالتوازي من الكاش المشترك بين الصفحات (amany.sheets).
+    """
     try:
-        spreadsheet = _client.open_by_key(spreadsheet_id)
-        worksheets = spreadsheet.worksheets()
-        data_dict = {}
-        
-        for ws in worksheets:
-            try:
-                # طريقة بديلة بدون استخدام get_all_records
-                all_data = ws.get_all_values()
-                
-                if len(all_data) > 0:
-                    # معالجة العناوين المكررة
-                    headers = all_data[0]
-                    unique_headers = []
-                    header_count = {}
-                    
-                    for header in headers:
-                        header_str = str(header).strip() or "Column"
-                        if header_str in header_count:
-                            header_count[header_str] += 1
-                            unique_headers.append(f"{header_str}_{header_count[header_str]}")
-                        else:
-                            header_count[header_str] = 1
-                            unique_headers.append(header_str)
-                    
-                    # إنشاء DataFrame يدوياً
-                    if len(all_data) > 1:
-                        data_rows = all_data[1:]
-                        df = pd.DataFrame(data_rows, columns=unique_headers)
-                        # تنظيف البيانات الرقمية
-                        for col in df.columns:
-                            df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', ''), errors='ignore')
-                        data_dict[ws.title] = df
-                    else:
-                        data_dict[ws.title] = pd.DataFrame(columns=unique_headers)
-                        
-            except Exception as e:
-                st.warning(f"تحذير في ورقة {ws.title}: {e}")
-                continue
-                
-        return data_dict
-        
+        values, errors = workbook_values(spreadsheet_id)
     except Exception as e:
         st.error(f"خطأ في جلب البيانات: {e}")
         return {}
 
+    data_dict = {}
+    for title, all_data in values.items():
+        if not all_data:
+            continue
+        try:
+            unique_headers = _unique_headers(all_data[0])
+            if len(all_data) > 1:
+                df = pd.DataFrame(all_data[1:], columns=unique_headers)
+                # تنظيف البيانات الرقمية
+                data_dict[title] = coerce_numeric_columns(df)
+            else:
+                data_dict[title] = pd.DataFrame(columns=unique_headers)
+        except Exception as e:
+            errors[title] = str(e)
+    for title, error in errors.items():
+        st.warning(f"تحذير في ورقة {title}: {error}")
+    return data_dict
+
 # ---------------------------
 # واجهة المستخدم
 # ---------------------------
@@ -531,16 +489,14 @@ def main():
     # تحميل البيانات
     if load_data and spreadsheet_id:
         with st.spinner("جاري تحميل البيانات..."):
-            client = get_google_sheets_client()
-            if client:
-                data_dict = get_spreadsheet_data(client, spreadsheet_id)
-                
-                if data_dict:
-                    st.session_state.data_loaded = True
-                    st.session_state.data_dict = data_dict
-                    st.success(f"✅ تم تحميل {len(data_dict)} ورقة بنجاح")
-                else:
-                    st.error("❌ لم يتم العثور على بيانات في الملف")
+            data_dict = get_spreadsheet_data(spreadsheet_id)
+            
+            if data_dict:
+                st.session_state.data_loaded = True
+                st.session_state.data_dict = data_dict
+                st.success(f"✅ تم تحميل {len(data_dict)} ورقة بنجاح")
+            else:
+                st.error("❌ لم يتم العثور على بيانات في الملف")
     
     # عرض البيانات إذا كانت محملة
     if st.session_state.data_loaded and st.session_state.data_dict:
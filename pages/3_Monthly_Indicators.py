@@ -2,10 +2,11 @@
 
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
 import numpy as np
 
+from amany.sheets import list_worksheets, open_spreadsheet_by_title, worksheet_frame
+from amany.tables import paged_dataframe
+
 # --- إعدادات المشروع والستايل (مشتركة) ---
 st.set_page_config(page_title="AMANY - المؤشرات الشهرية", layout="wide", page_icon="📊")
 
@@ -29,54 +30,36 @@ st.markdown("""
 # --- الوظائف المشتركة (منسوخة من الملف الرئيسي) ---
 SHEET_NAMES = { "services": "PHC action sheet", "financial": "Financial & KPI", "daily": "Dashboard-phc" }
 
-@st.cache_resource(ttl="2h")
-def connect_to_gsheet():
-    try:
-        scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-        creds = Credentials.from_service_account_info(st.secrets["gcp_service_account"], scopes=scopes )
-        client = gspread.authorize(creds)
-        return client
-    except Exception as e:
-        st.error(f"❌ خطأ في الاتصال بـ Google API: {e}")
-        return None
+def list_worksheet_titles(sheet_name):
+    spreadsheet = open_spreadsheet_by_title(sheet_name)
+    return [title.strip() for title in list_worksheets(spreadsheet.id)]
 
-@st.cache_data(ttl="5m")
-def get_data_from_worksheet(_client, sheet_name, worksheet_name):
+def get_data_from_worksheet(sheet_name, worksheet_name):
     try:
-        spreadsheet = _client.open(sheet_name)
-        worksheet = spreadsheet.worksheet(worksheet_name.strip())
-        all_values = worksheet.get_all_values()
-        if not all_values: return pd.DataFrame()
-        header = [str(h).strip() for h in all_values[0]]
-        cols = pd.Series(header)
-        for dup in cols[cols.duplicated()].unique(): 
-            cols[cols[cols == dup].index.values.tolist()] = [dup + '.' + str(i) if i != 0 else dup for i in range(sum(cols == dup))]
-        df = pd.DataFrame(all_values[1:], columns=cols)
-        return df
+        # المعرف عبر open_spreadsheet_by_title حتى يُعاد حله إذا حُذف الملف أو أُعيد إنشاؤه
+        return worksheet_frame(open_spreadsheet_by_title(sheet_name).id, worksheet_name)
     except Exception as e:
         st.error(f"❌ حدث خطأ أثناء قراءة البيانات من '{sheet_name}' ({worksheet_name}): {e}")
         return pd.DataFrame()
 
-def style_dataframe(df):
+def style_dataframe(df, first_row=None):
     if df.empty: return df
+    # first_row: صف العناوين في الجدول الكامل (قد لا يكون ضمن الصفحة المعروضة)
+    first_row = df.index[0] if first_row is None else first_row
     numeric_cols = df.select_dtypes(include=np.number).columns
     format_dict = {col: "{:,.0f}" for col in numeric_cols}
-    return df.style.format(format_dict) \
-                   .applymap(lambda _: 'background-color: #2c4ba0; color: #f0f8ff;', subset=pd.IndexSlice[:, [df.columns[0]]]) \
-                   .applymap(lambda _: 'background-color: #2c4ba0; color: #f0f8ff;', subset=pd.IndexSlice[[df.index[0]], :]) \
-                   .set_properties(**{'font-size': '14pt', 'border': '1px solid #5a7ff0'})
+    styler = df.style.format(format_dict) \
+                   .map(lambda _: 'background-color: #2c4ba0; color: #f0f8ff;', subset=pd.IndexSlice[:, [df.columns[0]]])
+    if first_row in df.index:
+        styler = styler.map(lambda _: 'background-color: #2c4ba0; color: #f0f8ff;', subset=pd.IndexSlice[[first_row], :])
+    return styler.set_properties(**{'font-size': '14pt', 'border': '1px solid #5a7ff0'})
 
 # --- الجزء الرئيسي للصفحة ---
 st.title("📊 تحليل المؤشرات الشهرية")
 
-g_client = connect_to_gsheet()
-if not g_client:
-    st.stop()
-
 try:
-    services_spreadsheet = g_client.open(SHEET_NAMES["services"])
-    # الحصول على كل أسماء المنشآت (كل الصفحات)
-    facility_names = sorted([ws.title.strip() for ws in services_spreadsheet.worksheets()])
+    # الحصول على كل أسماء المنشآت (كل الصفحات) — الملف يُفتح بالمعرف المحفوظ بدون بحث في Drive
+    facility_names = sorted(list_worksheet_titles(SHEET_NAMES["services"]))
     
     if not facility_names:
         st.warning("لم يتم العثور على صفحات منشآت في ملف المؤشرات الشهرية.")
@@ -90,10 +73,12 @@ try:
 
     if selected_facility:
         st.markdown(f'<div class="subtitle">عرض بيانات: {selected_facility}</div>', unsafe_allow_html=True)
-        services_df = get_data_from_worksheet(g_client, SHEET_NAMES["services"], selected_facility)
+        services_df = get_data_from_worksheet(SHEET_NAMES["services"], selected_facility)
         
         if services_df is not None and not services_df.empty:
-            st.dataframe(style_dataframe(services_df), use_container_width=True, height=800)
+            first_row = services_df.index[0]
+            paged_dataframe(services_df, key=f"monthly_{selected_facility}",
+                            style=lambda window: style_dataframe(window, first_row=first_row), height=800)
         else:
             st.info(f"لا توجد بيانات لعرضها لـ '{selected_facility}'.")
 
@@ -1,8 +1,17 @@
 # pages/2_نظام_المخزون_الدوائي.py
 
+from datetime import date
+
+import pandas as pd
 import streamlit as st
-import streamlit.components.v1 as components
-import os
+
+from amany import inventory_ledger as ledger
+from amany.data_export import download_controls
+from amany.inventory import ACTIVE, NAME, REPORT_COLUMNS, calculate_indicators, prepare_base, summary_counts
+from amany.inventory_import import commit_import, prepare_import
+from amany.medicine_search import MedicineIndex, highlight
+from amany.price_history import PROJECTION_MONTHS, PriceHistory, project_costs
+from amany.tables import paged_dataframe
 
 # --- إعدادات الصفحة ---
 st.set_page_config(
@@ -25,25 +34,267 @@ st.markdown("""
     <div class="inventory-title">نظام متابعة المخزون الدوائي</div>
 """, unsafe_allow_html=True)
 
-# --- دمج كود HTML ---
+# ============ التخزين ============
+# كانت البيانات تُحفظ في localStorage بالمتصفح؛ الآن في سجل حركات على الخادم
+LEVEL_LABELS = {"danger": "🔴 خطر", "warning": "🟠 تحت حد الأمان", "safe": "🟢 آمن"}
+
+
+def read_upload(uploaded) -> pd.DataFrame:
+    return pd.read_excel(uploaded)
+
+
+def excel_download(df: pd.DataFrame, sheet_name: str, filename: str, key: str, label: str, context):
+    """زر تجهيز ثم تنزيل — الملف يُكتب عند الطلب فقط ويُحفظ حسب محتواه"""
+    download_controls(lambda: iter([(sheet_name, df)]), filename, key, label, "xlsx", context)
+
+
+def with_ledger(fn, *args, **kwargs):
+    """استدعاء fn(conn, ...) باتصال يُفتح له فقط ويُغلق قبل أي st.rerun() بعده"""
+    conn = ledger.connect()
+    try:
+        return fn(conn, *args, **kwargs)
+    finally:
+        conn.close()
+
+
+@st.cache_data(show_spinner="جاري تحميل المخزون...", max_entries=2)
+def load_inventory(rev: int):
+    conn = ledger.connect()
+    try:
+        return ledger.current_inventory(conn)
+    finally:
+        conn.close()
+
+
+@st.cache_data(show_spinner="جاري حساب المؤشرات...", max_entries=4)
+def build_report(rev: int):
+    return calculate_indicators(load_inventory(rev))
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def search_index(rev: int, view: str) -> MedicineIndex:
+    """فهرس البحث لأسماء الأدوية أو المجموعات — يُبنى مرة واحدة لكل نسخة من المخزون"""
+    report = build_report(rev)
+    names = report.groups["المجموعة"] if view == "مجمع" else report.items[NAME]
+    return MedicineIndex(names)
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def load_monthly_movements(rev: int) -> pd.DataFrame:
+    """مجموع المنصرف والوارد لكل صنف في كل شهر من سجل الحركات"""
+    conn = ledger.connect()
+    try:
+        return ledger.monthly_movements(conn)
+    finally:
+        conn.close()
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def price_store(rev: int) -> PriceHistory:
+    """سجل الأسعار (أسعار البيانات الأساسية + كل تغير لاحق) كأعمدة مرتبة لكل صنف"""
+    conn = ledger.connect()
+    try:
+        points = ledger.price_history(conn, include_base=True)
+    finally:
+        conn.close()
+    inventory = load_inventory(rev)
+    ingredients = {} if inventory is None else dict(zip(inventory[NAME], inventory[ACTIVE]))
+    return PriceHistory.from_frame(points, ingredients)
+
+
+rev = with_ledger(ledger.revision)
+base = load_inventory(rev)
+# ملفات مقروءة ولم تُحفظ بعد (ImportBatch) — كل دفعة تُحفظ كمعاملة واحدة
+pending = st.session_state.setdefault("inventory_pending", [])
+
+# --- بطاقات الملخص ---
+report = build_report(rev) if base is not None else None
+if report is not None:
+    counts = summary_counts(report)
+    c1, c2, c3, c4, c5 = st.columns(5)
+    c1.metric("إجمالي الأدوية", f"{counts['total']:,}")
+    c2.metric("🟢 آمن", f"{counts['safe']:,}")
+    c3.metric("🟠 تحت حد الأمان", f"{counts['warning']:,}")
+    c4.metric("🔴 خطر", f"{counts['danger']:,}")
+    c5.metric("⛔ منتهي", f"{counts['zero']:,}")
+
+tab_setup, tab_update, tab_report, tab_shortage, tab_zero, tab_monthly, tab_prices = st.tabs(
+    ["⚙️ الإعداد", "🔄 التحديث اليومي", "📊 تقرير المخزون", "⚠️ تقرير النواقص", "⛔ الأصناف المنتهية",
+     "📅 الحركة الشهرية", "💰 الأسعار"])
+
+# --- الإعداد ---
+with tab_setup:
+    inventory_file = st.file_uploader("ملف المخزون الأساسي (Excel):", type=["xlsx", "xls"], key="inventory_file")
+    if st.button("💾 حفظ البيانات الأساسية", disabled=inventory_file is None):
+        try:
+            with_ledger(ledger.load_base, prepare_base(read_upload(inventory_file)), source=inventory_file.name)
+            pending.clear()
+            st.success("تم حفظ البيانات الأساسية بنجاح")
+            st.rerun()
+        except Exception as e:
+            st.error(f"حدث خطأ أثناء معالجة الملف: {e}")
+    if base is not None:
+        st.info(f"البيانات الأساسية المحفوظة: {len(base):,} صنف")
+    if base is not None and st.button("🧮 إعادة بناء الأرصدة من سجل الحركات"):
+        replayed = with_ledger(ledger.rebuild_balances)
+        st.success(f"تمت إعادة بناء الأرصدة من آخر لقطة و{replayed:,} حركة بعدها")
+        st.rerun()
+    if st.button("🗑️ مسح جميع البيانات"):
+        with_ledger(ledger.clear)
+        pending.clear()
+        st.success("تم مسح جميع البيانات بنجاح")
+        st.rerun()
+
+# --- المنصرف والوارد ---
+with tab_update:
+    if base is None:
+        st.warning("يجب حفظ البيانات الأساسية أولاً من تبويب الإعداد")
+    else:
+        col_out, col_in = st.columns(2)
+        uploads = {}
+        with col_out:
+            uploads["consumption"] = st.file_uploader("ملف المنصرف اليومي:", type=["xlsx", "xls", "csv"], key="consumption_file")
+            read_consumption = st.button("➖ قراءة المنصرف", disabled=uploads["consumption"] is None or bool(pending))
+        with col_in:
+            uploads["incoming"] = st.file_uploader("ملف الوارد:", type=["xlsx", "xls", "csv"], key="incoming_file")
+            read_incoming = st.button("➕ قراءة الوارد", disabled=uploads["incoming"] is None or bool(pending))
+        kind = "consumption" if read_consumption else "incoming" if read_incoming else None
+        if kind:
+            try:
+                with st.spinner("جاري قراءة الملف..."):
+                    pending.append(with_ledger(prepare_import, kind, uploads[kind], uploads[kind].name))
+                st.rerun()
+            except Exception as e:
+                st.error(f"حدث خطأ أثناء معالجة الملف: {e}")
+
+        for i, batch in enumerate(pending):
+            st.markdown("#### " + ("ملخص المنصرف" if batch.kind == "consumption" else "ملخص الوارد") + f" — {batch.source}")
+            st.caption(f"{batch.rows_read:,} صف في {batch.seconds:.2f} ثانية ({batch.rows_per_second:,.0f} صف/ثانية) — "
+                       f"مقبول {batch.accepted:,}، مرفوض {len(batch.rejected):,}، {len(batch.changes):,} صنف")
+            paged_dataframe(batch.changes.drop(columns="سعر متغير", errors="ignore"), key=f"inventory_changes_{i}")
+            if batch.unmatched:
+                st.warning(f"{len(batch.unmatched):,} صنف في الملف غير موجود في المخزون: " + "، ".join(batch.unmatched[:20]))
+            if batch.new_items:
+                st.info(f"{len(batch.new_items):,} صنف جديد سيُضاف للمخزون")
+            if not batch.rejected.empty:
+                with st.expander(f"⛔ الصفوف المرفوضة ({len(batch.rejected):,})"):
+                    paged_dataframe(batch.rejected, key=f"inventory_rejected_{i}")
+                    excel_download(batch.rejected, "الصفوف المرفوضة", f"الصفوف_المرفوضة_{date.today().isoformat()}.xlsx",
+                                   f"rejected_{i}", "📥 تجهيز الصفوف المرفوضة", (batch.source, batch.rows_read))
+        if pending:
+            col_save, col_cancel = st.columns(2)
+            if col_save.button("✅ حفظ المخزون المحدث"):
+                for batch in pending:
+                    with_ledger(commit_import, batch)
+                pending.clear()
+                st.success("تم حفظ حركات المخزون بنجاح")
+                st.rerun()
+            if col_cancel.button("↩️ إلغاء التحديثات غير المحفوظة"):
+                pending.clear()
+                st.rerun()
+
+# --- التقرير ---
+with tab_report:
+    if report is None:
+        st.warning("لا توجد بيانات أساسية محفوظة")
+    else:
+        st.caption(f"تاريخ التقرير: {date.today().isoformat()}")
+        if counts["danger"]:
+            st.error(f"🚨 {counts['danger']:,} أدوية في حالة خطر — وصلت إلى مستويات حرجة تحت حد الخطر وتحتاج إلى إعادة تخزين فورية")
+        if counts["warning"]:
+            st.warning(f"⚠️ {counts['warning']:,} أدوية تحت حد الأمان — تحتاج إلى مراقبة وإعادة تخزين قريبة")
+
+        view = st.radio("طريقة العرض:", ["تفصيلي", "مجمع"], horizontal=True, key="inventory_view")
+        search = st.text_input("🔍 ابحث عن دواء:", key="inventory_search")
+        if view == "مجمع":
+            table = report.groups.drop(columns=["المادة الفعالة", "التركيز", "نوع الوحدة"])
+        else:
+            table = report.items[REPORT_COLUMNS + ["مستوى"]]
+        if search:
+            # النتائج مرتبة حسب الصلة: تطابق تام، بداية الاسم، بداية كلمة، جزء من الاسم، ثم تقريبي
+            index = search_index(rev, view)
+            table = table.iloc[index.positions(search)]
+            top = index.search(search, page_size=5)
+            st.caption(f"{top.total:,} نتيجة")
+            if top.hits:
+                st.markdown(" · ".join(highlight(h.name, search) for h in top.hits))
+        table = table.assign(مستوى=table["مستوى"].map(LEVEL_LABELS))
+        paged_dataframe(table.reset_index(drop=True), key=f"inventory_{view}")
+
+        excel_download(report.items[REPORT_COLUMNS], "تحليل المخزون", f"تحليل_المخزون_{date.today().isoformat()}.xlsx",
+                       "inventory_report", "📥 تجهيز تحليل المخزون", rev)
+
+# --- النواقص ---
+with tab_shortage:
+    if report is None:
+        st.warning("لا توجد بيانات أساسية محفوظة")
+    elif report.shortages.empty:
+        st.success("لا توجد نواقص حرجة في المخزون")
+    else:
+        paged_dataframe(report.shortages, key="inventory_shortages")
+        excel_download(report.shortages, "تقرير النواقص", f"تقرير_النواقص_{date.today().isoformat()}.xlsx",
+                       "inventory_shortages", "📥 تجهيز تقرير النواقص", rev)
 
-# المسار إلى ملف HTML الذي وضعناه في المجلد الرئيسي
-HTML_FILE_PATH = 'inventory_template.html'
+    if report is not None:
+        st.markdown("#### 💰 تكلفة الكمية المطلوبة")
+        months = st.slider("أفق التوقع (أشهر):", 1, 12, PROJECTION_MONTHS, key="projection_months")
+        costs = project_costs(report.groups, report.items, price_store(rev), months)
+        costs = costs[costs["الكمية المطلوبة"] > 0].sort_values("التكلفة المتوقعة", ascending=False, ignore_index=True)
+        c1, c2 = st.columns(2)
+        c1.metric("التكلفة بالسعر الحالي", f"{costs['التكلفة الحالية'].sum():,.2f}")
+        c2.metric(f"التكلفة المتوقعة بعد {months} أشهر", f"{costs['التكلفة المتوقعة'].sum():,.2f}")
+        paged_dataframe(costs, key="inventory_costs")
 
-# التحقق من وجود الملف لضمان عدم حدوث أخطاء
-if not os.path.exists(HTML_FILE_PATH):
-    st.error(f"خطأ: لم يتم العثور على ملف القالب '{HTML_FILE_PATH}'.")
-    st.info("يرجى التأكد من أن الملف موجود في المجلد الرئيسي 'AMANY 1.1'.")
-    st.stop()
+# --- الأصناف المنتهية ---
+with tab_zero:
+    if report is None:
+        st.warning("لا توجد بيانات أساسية محفوظة")
+    elif report.zero_stock.empty:
+        st.success("لا توجد أصناف منتهية")
+    else:
+        paged_dataframe(report.zero_stock, key="inventory_zero")
+        excel_download(report.zero_stock, "الأصناف المنتهية", f"الأصناف_المنتهية_{date.today().isoformat()}.xlsx",
+                       "inventory_zero", "📥 تجهيز الأصناف المنتهية", rev)
 
-# قراءة محتوى ملف HTML
-try:
-    with open(HTML_FILE_PATH, 'r', encoding='utf-8') as f:
-        html_code = f.read()
-except Exception as e:
-    st.error(f"حدث خطأ أثناء قراءة ملف HTML: {e}")
-    st.stop()
+# --- الحركة الشهرية ---
+with tab_monthly:
+    monthly = load_monthly_movements(rev) if base is not None else None
+    if monthly is None or monthly.empty:
+        st.info("لا توجد حركات منصرف أو وارد محفوظة بعد")
+    else:
+        totals = monthly.groupby("period")[["consumed", "received"]].sum()
+        st.bar_chart(totals.rename(columns={"consumed": "المنصرف", "received": "الوارد"}))
+        drug = st.selectbox("الصنف:", ["كل الأصناف"] + sorted(monthly["name"].unique()), key="monthly_drug")
+        table = monthly if drug == "كل الأصناف" else monthly[monthly["name"] == drug]
+        paged_dataframe(table.rename(columns={"period": "الشهر", "name": "اسم الدواء",
+                                              "consumed": "المنصرف", "received": "الوارد"}).reset_index(drop=True),
+                        key="inventory_monthly")
 
-# عرض مكون HTML في تطبيق Streamlit
-# تم زيادة الارتفاع لضمان ظهور الصفحة كاملة
-components.html(html_code, height=1600, scrolling=True)
+# --- الأسعار ---
+with tab_prices:
+    history = price_store(rev) if report is not None else None
+    if history is None or not len(history):
+        st.info("لا يوجد سجل أسعار بعد")
+    else:
+        drug = st.selectbox("الصنف:", list(history.drugs), key="price_drug")
+        series = history.series(drug)
+        c1, c2 = st.columns(2)
+        c1.metric("آخر سعر", f"{history.last_price(drug):,.2f}")
+        c2.metric("عدد التغيرات", f"{max(len(series) - 1, 0):,}")
+        if len(series) > 1:
+            st.line_chart(series.rename("السعر"))
+        st.markdown("#### التغير السنوي في الأسعار حسب المادة الفعالة")
+        inflation = history.ingredient_inflation()
+        if inflation.empty:
+            st.caption("لا توجد تغيرات أسعار على مدى شهر أو أكثر بعد")
+        else:
+            paged_dataframe(inflation.assign(change=(inflation["change"] * 100).round(1),
+                                             annual_change=(inflation["annual_change"] * 100).round(1))
+                            .rename(columns={"ingredient": "المادة الفعالة", "drugs": "عدد الأصناف",
+                                             "change": "نسبة التغير %", "annual_change": "التغير السنوي %"}),
+                            key="inventory_inflation")
+        changes = with_ledger(ledger.price_history)
+        if not changes.empty:
+            with st.expander(f"📈 سجل تغير الأسعار ({len(changes):,})"):
+                paged_dataframe(changes.rename(columns={"date": "التاريخ", "name": "اسم الدواء", "price": "السعر"}),
+                                key="inventory_prices")
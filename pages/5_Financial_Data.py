@@ -4,20 +4,28 @@
 # - Robust header resolution (row2 -> row1 -> row3 -> Unnamed, unique)
 # - Month index from column A (m/YYYY)
 # - KPIs computed up to previous month end (exclude current/future months)
-# - Safe PNG export (on-click, guarded)
-# - Optional OLS trendline (only if statsmodels available)
-# - Excel export with engine auto-detect; CSV ZIP fallback
+# - Ranked alerts for every KPI in every sheet (MoM / YoY vs ALERT_THRESHOLD, rolling z-score)
+# - Background PNG / multi-page PDF export (cached by figure spec)
+# - Full Pearson/Spearman correlation matrix with p-values and KPI clustering (cached per sheet + range)
+# - On-demand CSV / Excel export (current sheet or all sheets), streamed and cached by data revision
 
-import time
 from datetime import datetime
 import streamlit as st
 import pandas as pd
 import numpy as np
-import gspread
-from google.oauth2.service_account import Credentials
 import plotly.graph_objects as go
 import plotly.express as px
-from io import BytesIO
+
+from amany.alerts import ROLLING_MONTHS, Z_LIMIT, alert_table
+from amany.chart_export import export_controls
+from amany.column_roles import column_roles
+from amany.correlation import SCIPY_AVAILABLE, correlation_matrix
+from amany.data_export import download_controls
+from amany.financial_panel import load_panel
+from amany.financial_sheet import parse_sheet
+from amany.panel_stats import PanelStats
+from amany.sheets import data_revision, invalidate, list_worksheets, workbook_values, worksheet_values
+from amany.tables import paged_dataframe
 
 # Optional PNG export
 try:
@@ -26,13 +34,6 @@ try:
 except Exception:
     KALEIDO = False
 
-# Optional OLS dependency
-try:
-    import statsmodels.api as sm  # noqa: F401
-    HAS_SM = True
-except Exception:
-    HAS_SM = False
-
 # Optional Cairo timezone
 try:
     import pytz
@@ -70,16 +71,6 @@ def prev_month_end(dt: datetime) -> pd.Timestamp:
     pms = prev_month_start(dt)
     return pms + pd.offsets.MonthEnd(0)
 
-def with_backoff(func, *args, **kwargs):
-    for d in [0.5, 1, 2, 4, 8]:
-        try:
-            return func(*args, **kwargs)
-        except Exception as e:
-            if "429" in str(e) or "Quota" in str(e):
-                time.sleep(d); continue
-            raise
-    raise RuntimeError("Backoff retries exceeded.")
-
 # ---------------- Spreadsheet ID ----------------
 SPREADSHEET_ID = st.secrets.get("sheets", {}).get("spreadsheet_id", "")
 if not SPREADSHEET_ID:
@@ -100,31 +91,14 @@ CONFIG_SHEET_NAME = "Config"
 TOTALS_CONFIG_COLUMN = "Totals_KPIs"
 ALERT_THRESHOLD = 20.0
 
-# ---------------- Resources ----------------
-@st.cache_resource(ttl=7200)
-def get_spreadsheet(spreadsheet_id: str):
-    creds = Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"],
-        scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"],
-    )
-    client = gspread.authorize(creds)
-    return with_backoff(client.open_by_key, spreadsheet_id)
-
-@st.cache_data(ttl=900)
-def list_worksheets(spreadsheet_id: str):
-    sh = get_spreadsheet(spreadsheet_id)
-    return [ws.title for ws in with_backoff(sh.worksheets)]
-
-@st.cache_data(ttl=900)
-def get_all_values(spreadsheet_id: str, worksheet_name: str):
-    sh = get_spreadsheet(spreadsheet_id)
-    ws = with_backoff(sh.worksheet, worksheet_name.strip())
-    return with_backoff(ws.get_all_values)
+# ---------------- Data ----------------
+# الخلايا تأتي من amany.sheets (كاش مشترك مع باقي الصفحات)، وكل كاش هنا مفتاحه يتضمن
+# نسخة البيانات (revision) فيتجدد كله مع invalidate.
+DATA_REV = data_revision(SPREADSHEET_ID)
 
-@st.cache_data(ttl=900)
 def read_totals_list(spreadsheet_id: str):
     try:
-        vals = get_all_values(spreadsheet_id, CONFIG_SHEET_NAME)
+        vals = worksheet_values(spreadsheet_id, CONFIG_SHEET_NAME)
         if len(vals) < 2:
             return []
         header = [str(h).strip() for h in vals[0]]
@@ -135,91 +109,31 @@ def read_totals_list(spreadsheet_id: str):
     except Exception:
         return []
 
-# ---------------- Header resolving ----------------
-def make_headers_unique(headers: list) -> list:
-    seen = {}
-    out = []
-    for h in headers:
-        h = str(h)
-        if h not in seen:
-            seen[h] = 0
-            out.append(h)
-        else:
-            seen[h] += 1
-            out.append(f"{h}.{seen[h]}")
-    return out
-
-def resolve_headers_merged(row1: list, row2: list, row3: list) -> list:
-    L = max(len(row1), len(row2), len(row3))
-    tmp = []
-    for j in range(L):
-        a = str(row2[j]).strip() if j < len(row2) else ""
-        b = str(row1[j]).strip() if j < len(row1) else ""
-        c = str(row3[j]).strip() if j < len(row3) else ""
-        if a:
-            tmp.append(a)
-        elif b:
-            tmp.append(b)
-        elif c:
-            tmp.append(c)
-        else:
-            tmp.append("Unnamed")
-    return make_headers_unique(tmp)
-
-# ---------------- Parsing ----------------
-def _clean_numeric(s: pd.Series) -> pd.Series:
-    s = (s.astype(str)
-         .str.replace(',', '', regex=False)
-         .str.replace('%', '', regex=False)
-         .replace(['', '-', '—'], '0'))
-    return pd.to_numeric(s, errors='coerce').fillna(0)
-
-def parse_sheet(all_values):
-    if not all_values or len(all_values) < 3:
-        return pd.DataFrame(), [], []
-
-    row1 = all_values[0]
-    row2 = all_values[1]
-    row3 = all_values[2]
-    headers_resolved = resolve_headers_merged(row1, row2, row3)
-    rows = all_values[2:]
-
-    raw_df = pd.DataFrame(rows, columns=headers_resolved)
-    if raw_df.shape[1] == 0:
-        return pd.DataFrame(), row2, rows
-
-    raw_df = raw_df.loc[:, ~(raw_df.columns.astype(str).str.strip() == "")]
-
-    first_col_name = str(raw_df.columns)
-    month_series = raw_df.iloc[:, 0].astype(str).str.strip()
-
-    dates = pd.to_datetime(month_series, errors="coerce")
-    mask = dates.isna()
-    if mask.any():
-        dates.loc[mask] = pd.to_datetime(month_series[mask], format="%m/%Y", errors="coerce")
-    dates = dates.dt.to_period("M").dt.to_timestamp()
-
-    proc = raw_df.copy()
-    proc["__MonthDate__"] = dates
-    proc["Month"] = month_series
-    proc = proc.dropna(subset=["__MonthDate__"]).set_index("__MonthDate__").sort_index()
-
-    for c in proc.columns:
-        c_str = str(c)
-        if c_str == "Month" or c_str == first_col_name:
-            continue
-        proc[c] = (proc[c].astype(str)
-                     .str.replace(",", "", regex=False)
-                     .str.replace("%", "", regex=False)
-                     .replace(["", "-", "—"], "0"))
-        proc[c] = pd.to_numeric(proc[c], errors="coerce").fillna(0)
-
-    return proc, row2, rows
-
 @st.cache_data(ttl=900)
-def get_df(spreadsheet_id: str, worksheet_name: str):
-    vals = get_all_values(spreadsheet_id, worksheet_name)
-    return parse_sheet(vals)
+def get_df(spreadsheet_id: str, worksheet_name: str, revision: int):
+    return parse_sheet(worksheet_values(spreadsheet_id, worksheet_name))
+
+@st.cache_data(ttl=900, show_spinner="جاري تحميل الأوراق...")
+def get_panel(spreadsheet_id: str, worksheet_names: tuple, revision: int):
+    """كل الأوراق المختارة تُجلب بالتوازي وتُحاذى على محور أشهر واحد"""
+    return load_panel(worksheet_names, lambda ws: get_df(spreadsheet_id, ws, revision)[0],
+                      prefetch=lambda names: workbook_values(spreadsheet_id, names)[1])
+
+@st.cache_data(ttl=900, show_spinner=False)
+def get_panel_stats(spreadsheet_id: str, worksheet_names: tuple, revision: int):
+    """متوسطات وانحرافات تراكمية لكل (ورقة، مؤشر) — أي خريطة حرارية تُقرأ منها بدون إعادة حساب"""
+    return PanelStats(get_panel(spreadsheet_id, worksheet_names, revision))
+
+@st.cache_data(ttl=900, show_spinner="جاري حساب التنبيهات...")
+def get_alerts(spreadsheet_id: str, worksheet_names: tuple, end: pd.Timestamp, threshold: float, revision: int):
+    """جدول التنبيهات لكل الأوراق — يُحسب مرة واحدة لكل تحديث للبيانات"""
+    return alert_table(get_panel_stats(spreadsheet_id, worksheet_names, revision), end=end, threshold=threshold)
+
+@st.cache_data(ttl=900, show_spinner=False)
+def get_correlations(spreadsheet_id: str, worksheet_name: str, start: pd.Timestamp, end: pd.Timestamp, revision: int):
+    """مصفوفة الارتباط لكل المؤشرات — مرة واحدة لكل (ورقة، نطاق)"""
+    df, _, _ = get_df(spreadsheet_id, worksheet_name, revision)
+    return correlation_matrix(df.loc[start:end])
 
 # ---------------- AI Summary ----------------
 def ai_summary(df: pd.DataFrame):
@@ -228,14 +142,15 @@ def ai_summary(df: pd.DataFrame):
         if len(base) < 2:
             return "البيانات غير كافية."
         last, prev = base.iloc[-1], base.iloc[-2]
-        rev = [c for c in base.columns if c.lower().startswith("total revenues")]
-        exp = [c for c in base.columns if c.lower().startswith("total expenses")]
+        roles = column_roles(base.columns)
+        rev = roles.columns_for("total_revenue")
+        exp = roles.columns_for("total_expense")
         lines = []
         if rev and prev[rev[0]] != 0:
-            change_rev = (last[rev] - prev[rev]) / prev[rev] * 100
+            change_rev = (last[rev[0]] - prev[rev[0]]) / prev[rev[0]] * 100
             lines.append(f"- الإيرادات: {change_rev:+.1f}%.")
-        if exp and prev[exp] != 0:
-            change_exp = (last[exp] - prev[exp]) / prev[exp] * 100
+        if exp and prev[exp[0]] != 0:
+            change_exp = (last[exp[0]] - prev[exp[0]]) / prev[exp[0]] * 100
             lines.append(f"- المصروفات: {change_exp:+.1f}%.")
         best = base.pct_change().mean(numeric_only=True).idxmax()
         lines.append(f"- أبرز نمو: {best}.")
@@ -245,6 +160,9 @@ def ai_summary(df: pd.DataFrame):
 
 # ---------------- UI ----------------
 st.markdown("## 💡 لوحة البيانات المالية")
+if st.button("🔄 تحديث البيانات", key="refresh_sheets"):
+    invalidate(SPREADSHEET_ID)
+    st.rerun()
 
 try:
     ws_list = list_worksheets(SPREADSHEET_ID)
@@ -258,7 +176,7 @@ if not ws_list:
 
 sheet_name = st.selectbox("اختر الورقة:", ws_list)
 
-df_full, header_raw, rows_raw = get_df(SPREADSHEET_ID, sheet_name)
+df_full, layout, rows_raw = get_df(SPREADSHEET_ID, sheet_name, DATA_REV)
 if df_full.empty:
     st.warning(f"لا بيانات صالحة في الورقة: {sheet_name}")
     st.stop()
@@ -273,15 +191,21 @@ if df_f.empty:
 now_dt = now_cairo()
 pm_end = prev_month_end(now_dt)
 
+alerts = get_alerts(SPREADSHEET_ID, tuple(ws for ws in ws_list if ws != CONFIG_SHEET_NAME), pm_end, ALERT_THRESHOLD, DATA_REV)
+with st.expander(f"🚨 تنبيهات كل الأوراق ({len(alerts)})", expanded=not alerts.empty):
+    if alerts.empty:
+        st.success(f"لا توجد تغيرات تتجاوز {ALERT_THRESHOLD:.0f}% أو قيم غير معتادة في آخر شهر لكل ورقة.")
+    else:
+        st.caption(f"آخر شهر به بيانات في كل ورقة حتى {pm_end.strftime('%b %Y')} — تغير شهري أو سنوي ≥ {ALERT_THRESHOLD:.0f}% أو |z| ≥ {Z_LIMIT:g} مقارنة بالـ {ROLLING_MONTHS} شهراً السابقة، مرتبة حسب الشدة.")
+        only_sheet = st.checkbox("الورقة الحالية فقط", value=False, key="alerts_current")
+        shown = alerts[alerts["الورقة"] == sheet_name] if only_sheet else alerts
+        paged_dataframe(shown, key="alerts_table")
+
 tab_raw, tab_proc = st.tabs(["📄 Raw as-is", "📊 Processed + KPIs"])
 
 with tab_raw:
-    all_vals = get_all_values(SPREADSHEET_ID, sheet_name)
-    row1 = all_vals[0] if len(all_vals) > 0 else []
-    row2 = all_vals[1] if len(all_vals) > 1 else []
-    row3 = all_vals[2] if len(all_vals) > 2 else []
-    safe_cols = resolve_headers_merged(row1, row2, row3)
-    st.dataframe(pd.DataFrame(rows_raw, columns=safe_cols))
+    # نفس الجلب ونفس تخطيط العناوين الذي بُني منه الجدول المعالج
+    paged_dataframe(pd.DataFrame(rows_raw, columns=layout.headers), key=f"raw_{sheet_name}")
 
 with tab_proc:
     st.caption(f"الحسابات أدناه حتى نهاية: {pm_end.strftime('%b %Y')}")
@@ -365,47 +289,56 @@ if sel_cols:
     fig_same.update_layout(title=f"داخل نفس الورقة (حتى {pm_end.strftime('%b %Y')})", paper_bgcolor="black", plot_bgcolor="black", font_color="white")
     st.plotly_chart(fig_same, use_container_width=True)
     if KALEIDO:
-        if st.button("📷 حفظ PNG - الرسم الحالي", key="png_same"):
-            try:
-                png_bytes = fig_same.to_image(format="png", scale=2)
-                st.download_button("تنزيل الصورة (PNG)", png_bytes, "same_sheet.png", "image/png", key="dl_same")
-            except Exception as e:
-                st.warning(f"تعذر إنشاء الصورة عبر kaleido: {e}")
+        export_controls(fig_same, "same_sheet.png", "same", "📷 حفظ PNG - الرسم الحالي")
 
 # ---------------- Multi-sheet comparison ----------------
 st.markdown("---")
 st.subheader("📊 مقارنة بين أوراق متعددة")
 sel_sheets = st.multiselect("اختر أوراق:", ws_list, default=[sheet_name])
 common_kpi = None
-dfs_map = {}
+panel = get_panel(SPREADSHEET_ID, tuple(sel_sheets), DATA_REV) if sel_sheets else None
 
-if sel_sheets:
-    common_cols = set(available_cols)
-    for ws in sel_sheets:
-        d, _, _ = get_df(SPREADSHEET_ID, ws)
-        if not d.empty:
-            dfs_map[ws] = d
-            common_cols &= set([c for c in d.columns if c != "Month"])
+if panel is not None:
+    for ws, err in panel.errors.items():
+        st.warning(f"تعذر تحميل الورقة {ws}: {err}")
+    common_cols = [c for c in panel.common_kpis() if c in set(available_cols)]
     if common_cols:
-        common_kpi = st.selectbox("المؤشر:", sorted(list(common_cols)))
+        common_kpi = st.selectbox("المؤشر:", sorted(common_cols))
 
-fig_multi = None
+fig_multi = fc = fh = figc = fm = None
 if common_kpi:
-    fig_multi = go.Figure()
-    for ws, d in dfs_map.items():
-        seg = d.loc[:pm_end].copy()
-        if seg.empty:
-            seg = d.copy()
-        fig_multi.add_trace(go.Scatter(x=seg.index, y=seg[common_kpi], mode="lines+markers", name=ws))
-    fig_multi.update_layout(title=f"{common_kpi} عبر أوراق متعددة (حتى {pm_end.strftime('%b %Y')})", paper_bgcolor="black", plot_bgcolor="black", font_color="white")
-    st.plotly_chart(fig_multi, use_container_width=True)
-    if KALEIDO:
-        if st.button("📷 حفظ PNG - مقارنة الأوراق", key="png_multi"):
-            try:
-                png_bytes = fig_multi.to_image(format="png", scale=2)
-                st.download_button("تنزيل الصورة (PNG)", png_bytes, "multi_sheets.png", "image/png", key="dl_multi")
-            except Exception as e:
-                st.warning(f"تعذر إنشاء الصورة عبر kaleido: {e}")
+    # جدول واحد (شهر × ورقة) من مصفوفة اللوحة بدل نسخة لكل ورقة
+    multi = panel.kpi(common_kpi, end=pm_end)
+    if multi.dropna(how="all").empty:
+        multi = panel.kpi(common_kpi)
+    tab_m_trend, tab_m_corr, tab_m_heat = st.tabs(["الاتجاه", "الارتباط بين الأوراق", "خريطة حرارية"])
+
+    with tab_m_trend:
+        fig_multi = go.Figure()
+        for ws in multi.columns:
+            seg = multi[ws].dropna()
+            fig_multi.add_trace(go.Scatter(x=seg.index, y=seg, mode="lines+markers", name=ws))
+        fig_multi.update_layout(title=f"{common_kpi} عبر أوراق متعددة (حتى {pm_end.strftime('%b %Y')})", paper_bgcolor="black", plot_bgcolor="black", font_color="white")
+        st.plotly_chart(fig_multi, use_container_width=True)
+        if KALEIDO:
+            export_controls(fig_multi, "multi_sheets.png", "multi", "📷 حفظ PNG - مقارنة الأوراق")
+
+    with tab_m_corr:
+        if multi.shape[1] < 2:
+            st.info("اختر ورقتين على الأقل لحساب الارتباط.")
+        else:
+            fc = px.imshow(multi.corr(), text_auto=".2f", zmin=-1, zmax=1, color_continuous_scale="RdBu",
+                           title=f"ارتباط {common_kpi} بين الأوراق (Pearson)")
+            fc.update_layout(paper_bgcolor="black", plot_bgcolor="black", font_color="white")
+            st.plotly_chart(fc, use_container_width=True)
+
+    with tab_m_heat:
+        std = multi.std().replace(0, np.nan)
+        norm = (multi - multi.mean()) / std
+        fh = px.imshow(norm.T, text_auto=".2f", aspect="auto", color_continuous_scale="RdYlGn",
+                       title=f"{common_kpi} (z-score لكل ورقة) حتى {pm_end.strftime('%b %Y')}")
+        fh.update_layout(paper_bgcolor="black", plot_bgcolor="black", font_color="white")
+        st.plotly_chart(fh, use_container_width=True)
 
 # ---------------- Advanced: Correlation & Heatmap ----------------
 st.markdown("---")
@@ -413,84 +346,114 @@ st.subheader("تحليل متقدم")
 tab_corr, tab_heat = st.tabs(["Correlation", "Heatmap"])
 
 with tab_corr:
-    if available_cols:
-        xk = st.selectbox("X:", available_cols, key="corr_x")
-        yk = st.selectbox("Y:", [c for c in available_cols if c != xk], index=0 if len(available_cols) < 2 else 1, key="corr_y")
-        df_corr = df_f.loc[:pm_end].copy()
+    if len(available_cols) >= 2:
+        df_corr = df_f.loc[:pm_end]
         if df_corr.empty:
-            df_corr = df_f.copy()
-        corr = df_corr[xk].corr(df_corr[yk]) if xk and yk else np.nan
-        st.metric("معامل الارتباط (Pearson)", f"{corr:.2f}" if pd.notna(corr) else "N/A")
-        if HAS_SM:
-            figc = px.scatter(df_corr.reset_index(), x=xk, y=yk, trendline="ols", title=f"{xk} vs {yk} (حتى {pm_end.strftime('%b %Y')})")
-        else:
-            figc = px.scatter(df_corr.reset_index(), x=xk, y=yk, title=f"{xk} vs {yk} (حتى {pm_end.strftime('%b %Y')}, بدون OLS)")
+            df_corr = df_f
+        cm = get_correlations(SPREADSHEET_ID, sheet_name, df_corr.index.min(), df_corr.index.max(), DATA_REV)
+        method = st.radio("الطريقة:", ["pearson", "spearman"], format_func=str.title, horizontal=True, key="corr_method")
+        if not SCIPY_AVAILABLE:
+            st.caption("قيم p-value وتجميع المؤشرات الهرمي تحتاج scipy — التجميع الحالي تقريبي.")
+
+        xk = st.selectbox("X:", available_cols, key="corr_x")
+        yk = st.selectbox("Y:", [c for c in available_cols if c != xk], index=0, key="corr_y")
+        pair = cm.pair(xk, yk)
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Pearson", f"{pair['pearson']:.2f}" if pd.notna(pair["pearson"]) else "N/A")
+        m2.metric("Spearman", f"{pair['spearman']:.2f}" if pd.notna(pair["spearman"]) else "N/A")
+        p_val = pair[f"p_{method}"]
+        m3.metric("p-value", f"{p_val:.3f}" if pd.notna(p_val) else "N/A")
+
+        figc = px.scatter(df_corr.reset_index(), x=xk, y=yk, title=f"{xk} vs {yk} (حتى {pm_end.strftime('%b %Y')})")
+        if pd.notna(pair["slope"]):
+            # خط الانحدار من المتوسطات والانحرافات المحسوبة مسبقاً (نفس نتيجة OLS البسيط)
+            xs = np.array([df_corr[xk].min(), df_corr[xk].max()])
+            figc.add_trace(go.Scatter(x=xs, y=pair["slope"] * xs + pair["intercept"], mode="lines", name="OLS"))
         figc.update_layout(paper_bgcolor="black", plot_bgcolor="black", font_color="white")
         st.plotly_chart(figc, use_container_width=True)
         if KALEIDO:
-            if st.button("📷 حفظ PNG - الارتباط", key="png_corr"):
-                try:
-                    st.download_button("تنزيل الصورة (PNG)", figc.to_image(format="png", scale=2), "correlation.png", "image/png", key="dl_corr")
-                except Exception as e:
-                    st.warning(f"تعذر إنشاء الصورة عبر kaleido: {e}")
+            export_controls(figc, "correlation.png", "corr", "📷 حفظ PNG - الارتباط")
+
+        st.markdown("**أقوى العلاقات**")
+        sig_only = st.checkbox("الدالة إحصائياً فقط (p < 0.05)", value=False, key="corr_sig", disabled=not SCIPY_AVAILABLE)
+        st.dataframe(cm.strongest(method, limit=20, significant_only=sig_only), hide_index=True)
+
+        with st.expander("مصفوفة الارتباط (مرتبة حسب التجميع)"):
+            fm = px.imshow(cm.matrix(method), zmin=-1, zmax=1, aspect="auto", color_continuous_scale="RdBu",
+                           title=f"{method.title()} — {cm.n} شهر")
+            fm.update_layout(paper_bgcolor="black", plot_bgcolor="black", font_color="white")
+            st.plotly_chart(fm, use_container_width=True)
+    else:
+        st.info("يلزم مؤشران على الأقل لحساب الارتباط.")
 
 with tab_heat:
-    hm_cols = st.multiselect("اختر مؤشرات:", available_cols, default=available_cols[:min(12, len(available_cols))], key="hm_cols")
-    if hm_cols:
-        df_hm = df_f.loc[:pm_end].copy()
-        if df_hm.empty:
-            df_hm = df_f.copy()
-        base = df_hm[hm_cols].copy()
-        std = base.std().replace(0, np.nan)
-        norm = (base - base.mean()) / std
-        f = px.imshow(norm.T, text_auto=".2f", aspect="auto", color_continuous_scale="RdYlGn", title=f"Heatmap (z-score) حتى {pm_end.strftime('%b %Y')}")
+    df_hm = df_f.loc[:pm_end]
+    if df_hm.empty:
+        df_hm = df_f
+    hm_start, hm_end = df_hm.index.min(), df_hm.index.max()
+    hm_scope = st.radio("النطاق:", ["الورقة الحالية", "كل الأوراق"], horizontal=True, key="hm_scope")
+    f = None
+    if hm_scope == "الورقة الحالية":
+        hm_cols = st.multiselect("اختر مؤشرات:", available_cols, default=available_cols[:min(12, len(available_cols))], key="hm_cols")
+        if hm_cols:
+            stats = get_panel_stats(SPREADSHEET_ID, (sheet_name,), DATA_REV)
+            norm = stats.sheet_heatmap(sheet_name, hm_cols, hm_start, hm_end)
+            f = px.imshow(norm, text_auto=".2f", aspect="auto", color_continuous_scale="RdYlGn", title=f"Heatmap (z-score) حتى {pm_end.strftime('%b %Y')}")
+    else:
+        stats = get_panel_stats(SPREADSHEET_ID, tuple(ws for ws in ws_list if ws != CONFIG_SHEET_NAME), DATA_REV)
+        net = stats.panel
+        if net.empty:
+            st.info("لا توجد بيانات صالحة في الأوراق.")
+        else:
+            common = net.common_kpis()
+            hm_sheets = st.multiselect("الأوراق:", net.sheets, default=net.sheets, key="hm_sheets")
+            hm_kpis = st.multiselect("المؤشرات:", net.kpis, default=(common or net.kpis)[:12], key="hm_kpis")
+            months = [p for p in net.periods if hm_start.to_period("M") <= p <= hm_end.to_period("M")]
+            if hm_sheets and hm_kpis and months:
+                hm_month = st.selectbox("الشهر:", months[::-1], format_func=lambda p: p.strftime("%m/%Y"), key="hm_month")
+                # كل خلية مقارنة بتاريخ نفس الورقة ونفس المؤشر داخل النطاق الزمني
+                norm = stats.month_heatmap(hm_month, hm_sheets, hm_kpis, hm_start, hm_end)
+                f = px.imshow(norm, text_auto=".2f", aspect="auto", color_continuous_scale="RdYlGn",
+                              title=f"Heatmap (z-score) لكل الأوراق — {hm_month.strftime('%m/%Y')}")
+    if f is not None:
         f.update_layout(paper_bgcolor="black", plot_bgcolor="black", font_color="white")
         st.plotly_chart(f, use_container_width=True)
         if KALEIDO:
-            if st.button("📷 حفظ PNG - الخريطة الحرارية", key="png_heat"):
-                try:
-                    st.download_button("تنزيل الصورة (PNG)", f.to_image(format="png", scale=2), "heatmap.png", "image/png", key="dl_heat")
-                except Exception as e:
-                    st.warning(f"تعذر إنشاء الصورة عبر kaleido: {e}")
+            export_controls(f, "heatmap.png", "heat", "📷 حفظ PNG - الخريطة الحرارية")
 
 # ---------------- Export ----------------
 st.markdown("---")
-exp_all = df_f.loc[:pm_end].reset_index().rename(columns={"__MonthDate__": "Date"})
-if exp_all.empty:
-    exp_all = df_f.reset_index().rename(columns={"__MonthDate__": "Date"})
-exp_all = exp_all[["Month"] + [c for c in exp_all.columns if c != "Month"]]
-st.download_button("📥 تصدير CSV", exp_all.to_csv(index=False).encode("utf-8"), f"{sheet_name}.csv", "text/csv")
-
-def to_excel_bytes(dfdict: dict):
-    bio = BytesIO()
-    engine = None
-    try:
-        import xlsxwriter  # noqa
-        engine = "xlsxwriter"
-    except Exception:
-        try:
-            import openpyxl  # noqa
-            engine = "openpyxl"
-        except Exception:
-            engine = None
-
-    if engine is None:
-        import zipfile
-        zbio = BytesIO()
-        with zipfile.ZipFile(zbio, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-            for s, d in dfdict.items():
-                csv_bytes = d.to_csv(index=False).encode("utf-8")
-                zf.writestr(f"{s}.csv", csv_bytes)
-        zbio.seek(0)
-        return zbio.getvalue()
-
-    with pd.ExcelWriter(bio, engine=engine) as w:
-        for s, d in dfdict.items():
-            sname = str(s)[:31]
-            d.to_excel(w, index=False, sheet_name=sname)
-    bio.seek(0)
-    return bio.getvalue()
-
-st.download_button("📊 تصدير Excel", to_excel_bytes({sheet_name: exp_all}),
-                   f"{sheet_name}.xlsx",
-                   "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+def export_frame(d: pd.DataFrame) -> pd.DataFrame:
+    """الجدول كما يُصدر: حتى نهاية الشهر السابق، وعمود Month أولاً"""
+    out = d.loc[:pm_end]
+    if out.empty:
+        out = d
+    out = out.reset_index().rename(columns={"__MonthDate__": "Date"})
+    return out[["Month"] + [c for c in out.columns if c != "Month"]]
+
+def current_sheet_export():
+    yield sheet_name, export_frame(df_f)
+
+def all_sheets_export():
+    # ورقة بعد ورقة: لا تُجمع كل الأوراق في الذاكرة قبل الكتابة
+    for ws in ws_list:
+        if ws == CONFIG_SHEET_NAME:
+            continue
+        d, _, _ = get_df(SPREADSHEET_ID, ws, DATA_REV)
+        if not d.empty:
+            yield ws, export_frame(d)
+
+sheet_ctx = (sheet_name, start_d, end_d, pm_end)
+col_csv, col_xlsx, col_all = st.columns(3)
+with col_csv:
+    download_controls(current_sheet_export, f"{sheet_name}.csv", "csv_sheet", "📥 تصدير CSV", "csv", sheet_ctx)
+with col_xlsx:
+    download_controls(current_sheet_export, f"{sheet_name}.xlsx", "xlsx_sheet", "📊 تصدير Excel", "xlsx", sheet_ctx)
+with col_all:
+    all_fmt = "xlsx" if st.radio("صيغة كل الأوراق:", ["Excel", "CSV (ZIP)"], horizontal=True, key="all_fmt") == "Excel" else "zip"
+    download_controls(all_sheets_export, f"financial_all_sheets.{all_fmt}", f"all_{all_fmt}",
+                      "📚 تصدير كل الأوراق في ملف واحد", all_fmt, (SPREADSHEET_ID, pm_end))
+if KALEIDO:
+    # كل رسوم الصفحة في ملف واحد (صفحة لكل رسم)، تُرسم في الخلفية
+    export_controls([fig_same, fig_multi, fc, fh, figc, fm, f], f"{sheet_name}_charts.pdf", "pdf_all", "📄 تصدير كل الرسوم PDF")
@@ -0,0 +1,69 @@
+# tests/test_inventory.py — حدود المجموعات والأيام المتوقعة والنواقص في محرك المخزون
+import pandas as pd
+import pytest
+
+from amany.inventory import (ACTIVE, BASE_DEFAULTS, CONCENTRATION, DRUG_TYPE, NAME, NAME_ALT, STOCK, UNIT,
+                             calculate_indicators, prepare_base, summary_counts)
+
+
+@pytest.fixture
+def data():
+    # باراسيتامول: مجموع الأشهر 20، 20، 30، 0 ← متوسط أعلى 3 = 70/3؛ أموكسيسيلين: 10 كل شهر
+    return pd.DataFrame({
+        NAME: ["بنادول", "ريفو", "أموكسيل"],
+        ACTIVE: ["باراسيتامول", "باراسيتامول", "أموكسيسيلين"],
+        CONCENTRATION: ["500", "500", "250"],
+        UNIT: ["قرص", "قرص", "كبسولة"],
+        DRUG_TYPE: ["حيوي", "حيوي", "أساسي"],
+        STOCK: [5, 0, 100],
+        "يناير": [10, 10, 10],
+        "فبراير": [20, 0, 10],
+        "مارس": [30, 0, 10],
+        "أبريل": [0, 0, 10],
+    })
+
+
+def test_group_thresholds_use_top_months_and_drug_type(data):
+    groups = calculate_indicators(data).groups.set_index("المادة الفعالة")
+    para = groups.loc["باراسيتامول"]
+    assert para["متوسط الاستهلاك"] == pytest.approx(23.33)
+    assert (para["حد الكفاية"], para["حد الأمان"], para["حد الخطر"]) == pytest.approx((70, 46.67, 23.33))
+    assert para["المخزون الحالي"] == 5
+    assert para["الكمية المطلوبة"] == pytest.approx(65)
+    assert para["الأصناف المنتهية"] == 1
+    amox = groups.loc["أموكسيسيلين"]
+    assert (amox["حد الكفاية"], amox["حد الأمان"], amox["حد الخطر"]) == pytest.approx((25, 15, 10))
+    assert amox["الكمية المطلوبة"] == 0
+
+
+def test_item_level_days_and_status(data):
+    items = calculate_indicators(data).items.set_index("اسم الدواء")
+    assert items.loc["أموكسيل", "مستوى"] == "safe"
+    assert items.loc["أموكسيل", "عدد الأيام المتوقع"] == 300
+    assert items.loc["أموكسيل", "حالة الصنف"] == "راكد"
+    assert items.loc["بنادول", "مستوى"] == "danger"
+    assert items.loc["بنادول", "حالة الصنف"] == "احتياج"
+    assert items["منتهي"].tolist() == [False, True, False]
+
+
+def test_shortage_alternatives_are_in_stock_items_of_the_group(data):
+    report = calculate_indicators(data)
+    assert report.shortages["المادة الفعالة"].tolist() == ["باراسيتامول"]
+    assert report.shortages["البدائل"].tolist() == ["بنادول: 5.00"]
+    assert report.zero_stock[NAME].tolist() == ["ريفو"]
+
+
+def test_shortage_without_stock_has_no_alternatives(data):
+    data.loc[0, STOCK] = 0
+    assert calculate_indicators(data).shortages["البدائل"].tolist() == ["لا يوجد بدائل متاحة"]
+
+
+def test_summary_counts(data):
+    assert summary_counts(calculate_indicators(data)) == {"total": 3, "safe": 1, "warning": 0, "danger": 2, "zero": 1}
+
+
+def test_prepare_base_fills_missing_fields():
+    base = prepare_base(pd.DataFrame({NAME_ALT: ["بنادول"], STOCK: [5], ACTIVE: [""]}))
+    assert base.loc[0, NAME] == "بنادول"
+    assert base.loc[0, ACTIVE] == BASE_DEFAULTS[ACTIVE]
+    assert base.loc[0, DRUG_TYPE] == BASE_DEFAULTS[DRUG_TYPE]
@@ -0,0 +1,77 @@
+# tests/test_inventory_import.py — استيراد ملفات المنصرف والوارد: التجميع عبر الأجزاء، أسباب الرفض، والحفظ
+import io
+
+import pandas as pd
+import pytest
+
+from amany import inventory_ledger as ledger
+from amany.inventory import ACTIVE, NAME, STOCK, UNIT_PRICE
+from amany.inventory_import import commit_import, prepare_import, read_movements
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = ledger.connect(str(tmp_path / "inventory.sqlite"))
+    ledger.load_base(conn, pd.DataFrame({NAME: ["بنادول", "ريفو", "أموكسيل"], STOCK: [100, 50, 0],
+                                         UNIT_PRICE: [2.5, 1.0, 3.0]}))
+    yield conn
+    conn.close()
+
+
+def _csv(rows) -> io.BytesIO:
+    return io.BytesIO(pd.DataFrame(rows).to_csv(index=False).encode("utf-8"))
+
+
+def _xlsx(rows) -> io.BytesIO:
+    buffer = io.BytesIO()
+    pd.DataFrame(rows).to_excel(buffer, index=False)
+    buffer.seek(0)
+    return buffer
+
+
+CONSUMPTION = {
+    NAME: ["بنادول", "ريفو", "", "بنادول", "بنادول", "مجهول"],
+    "الكمية المستهلكة": ["10", "abc", "5", "-2", "5", "3"],
+}
+
+
+@pytest.mark.parametrize("make, filename", [(_csv, "out.csv"), (_xlsx, "out.xlsx")])
+def test_rejected_rows_keep_file_row_numbers_and_reasons(make, filename):
+    per_drug, rejected, rows_read = read_movements("consumption", make(CONSUMPTION), filename, chunk_rows=2)
+    assert rows_read == 6
+    assert rejected.values.tolist() == [[3, "ريفو", "كمية غير رقمية"], [4, "", "اسم الدواء فارغ"],
+                                        [5, "بنادول", "كمية سالبة"]]
+    # التجميع عبر الأجزاء: مجموع الكميات وآخر كمية في الملف
+    assert per_drug.loc["بنادول", ["qty", "last_qty"]].tolist() == [15, 5]
+
+
+def test_consumption_preview_and_commit(conn):
+    batch = prepare_import(conn, "consumption", _csv(CONSUMPTION), "out.csv", chunk_rows=2)
+    assert batch.accepted == 3
+    assert batch.unmatched == ["مجهول"]
+    assert batch.changes[["اسم الدواء", "المخزون السابق", "المخزون الجديد"]].values.tolist() == [["بنادول", 100, 85]]
+
+    commit_import(conn, batch)
+    balances = ledger.balances_for(conn, ["بنادول", "مجهول"])
+    assert list(balances.index) == ["بنادول"]
+    assert balances.loc["بنادول", ["stock", "daily_out"]].tolist() == [85, 5]
+
+
+def test_incoming_adds_new_items_and_price_changes(conn):
+    upload = _xlsx({NAME: ["أموكسيل", "جديد", "ريفو"], "الكمية الواردة": [20, 7, 5],
+                    UNIT_PRICE: [4.0, 9.0, 1.0], ACTIVE: ["أموكسيسيلين", "فيتامين", None]})
+    batch = prepare_import(conn, "incoming", upload, "in.xlsx")
+    assert batch.new_items == ["جديد"]
+    changed = batch.changes.set_index("اسم الدواء")["سعر متغير"]
+    assert changed.to_dict() == {"أموكسيل": True, "ريفو": False, "جديد": True}
+
+    commit_import(conn, batch)
+    inventory = ledger.current_inventory(conn).set_index(NAME)
+    assert inventory.loc[["أموكسيل", "ريفو", "جديد"], STOCK].tolist() == [20, 55, 7]
+    assert inventory.loc["جديد", ACTIVE] == "فيتامين"
+    assert ledger.price_history(conn)[["name", "price"]].values.tolist() == [["أموكسيل", 4.0], ["جديد", 9.0]]
+
+
+def test_unknown_kind_is_rejected():
+    with pytest.raises(ValueError):
+        read_movements("returns", _csv(CONSUMPTION), "x.csv")
@@ -0,0 +1,75 @@
+# tests/test_inventory_ledger.py — سجل الحركات: الأرصدة الحية، إعادة بنائها من اللقطة، والاستعلامات الشهرية
+import pandas as pd
+import pytest
+
+from amany import inventory_ledger as ledger
+from amany.inventory import ACTIVE, DRUG_TYPE, NAME, STOCK, UNIT_PRICE
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = ledger.connect(str(tmp_path / "inventory.sqlite"))
+    ledger.load_base(conn, pd.DataFrame({
+        NAME: ["بنادول", "ريفو", "أموكسيل", "بنادول"],
+        ACTIVE: ["باراسيتامول", "باراسيتامول", "أموكسيسيلين", "مكرر"],
+        STOCK: [100, 50, 0, 999],
+        UNIT_PRICE: [2.5, 1.0, 0, 0],
+        DRUG_TYPE: ["حيوي", "حيوي", "أساسي", ""],
+    }), source="base.xlsx")
+    yield conn
+    conn.close()
+
+
+def _balances(conn) -> list:
+    return conn.execute("SELECT name, stock, daily_out, daily_in, price, drug_type FROM balances ORDER BY name").fetchall()
+
+
+def test_base_keeps_first_row_per_drug(conn):
+    inventory = ledger.current_inventory(conn)
+    assert inventory[NAME].tolist() == ["بنادول", "ريفو", "أموكسيل"]
+    assert inventory[STOCK].tolist() == [100, 50, 0]
+    assert inventory[ACTIVE].tolist() == ["باراسيتامول", "باراسيتامول", "أموكسيسيلين"]
+
+
+def test_movements_update_balances_and_revision(conn):
+    rev = ledger.revision(conn)
+    ledger.record_movements(conn, "consumption", [("بنادول", -30.0, 30.0, None, None, None)])
+    ledger.record_movements(conn, "incoming", [("أموكسيل", 20.0, None, 20.0, 4.0, None)],
+                            new_items=[("جديد", {ACTIVE: "فيتامين"})], prices=[("أموكسيل", 4.0)])
+    assert ledger.revision(conn) > rev
+    balances = ledger.balances_for(conn, ["بنادول", "أموكسيل", "بنادول"])
+    assert balances.loc["بنادول", "stock"] == 70
+    assert balances.loc["بنادول", "daily_out"] == 30
+    assert balances.loc["أموكسيل", "stock"] == 20
+    assert balances.loc["أموكسيل", "price"] == 4
+    assert ledger.current_inventory(conn)[NAME].tolist()[-1] == "جديد"
+    assert ledger.price_history(conn)[["name", "price"]].values.tolist() == [["أموكسيل", 4.0]]
+    assert set(ledger.price_history(conn, include_base=True)["name"]) == {"بنادول", "ريفو", "أموكسيل"}
+
+
+@pytest.mark.parametrize("snapshot_every", [1, 3, 1000])
+def test_rebuild_from_snapshot_matches_live_balances(conn, monkeypatch, snapshot_every):
+    monkeypatch.setattr(ledger, "SNAPSHOT_EVERY", snapshot_every)
+    for day in range(5):
+        ledger.record_movements(conn, "consumption", [("بنادول", -3.0, 3.0, None, None, None),
+                                                      ("ريفو", -1.0, 1.0, None, None, None)])
+        ledger.record_movements(conn, "incoming", [("ريفو", 10.0, None, 10.0, 1.5 + day, "أساسي")])
+    live = _balances(conn)
+    conn.execute("UPDATE balances SET stock = -1")
+    replayed = ledger.rebuild_balances(conn)
+    assert _balances(conn) == live
+    assert replayed <= ledger.revision(conn)
+
+
+def test_monthly_movements_sum_consumed_and_received(conn):
+    ledger.record_movements(conn, "consumption", [("بنادول", -30.0, 30.0, None, None, None)])
+    ledger.record_movements(conn, "consumption", [("بنادول", -5.0, 5.0, None, None, None)])
+    ledger.record_movements(conn, "incoming", [("بنادول", 12.0, None, 12.0, None, None)])
+    monthly = ledger.monthly_movements(conn)
+    assert monthly[["name", "consumed", "received"]].values.tolist() == [["بنادول", 35.0, 12.0]]
+
+
+def test_clear_removes_everything(conn):
+    ledger.clear(conn)
+    assert ledger.current_inventory(conn) is None
+    assert ledger.revision(conn) == 0
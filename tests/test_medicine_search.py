@@ -0,0 +1,54 @@
+# tests/test_medicine_search.py — ترتيب نتائج فهرس البحث وتمييز الجزء المطابق
+import pytest
+
+from amany.medicine_search import (RANK_CONTAINS, RANK_EXACT, RANK_FUZZY, RANK_PREFIX, RANK_WORD_PREFIX,
+                                   MedicineIndex, highlight)
+
+NAMES = ["بانادول اكسترا", "بانادول", "كونجستال", "سولبادين بانادول", "ريفو", "أموكسيل 500", "اوجمنتين"]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return MedicineIndex(NAMES)
+
+
+def _ranked(index, query, **kwargs):
+    page = index.search(query, page_size=len(NAMES), **kwargs)
+    return [(h.name, h.rank) for h in page.hits]
+
+
+def test_rank_order_exact_prefix_word_prefix(index):
+    assert _ranked(index, "بانادول") == [("بانادول", RANK_EXACT), ("بانادول اكسترا", RANK_PREFIX),
+                                         ("سولبادين بانادول", RANK_WORD_PREFIX)]
+
+
+def test_contains_matches_are_ordered_shortest_first(index):
+    assert _ranked(index, "نادول") == [("بانادول", RANK_CONTAINS), ("بانادول اكسترا", RANK_CONTAINS),
+                                       ("سولبادين بانادول", RANK_CONTAINS)]
+
+
+def test_fuzzy_matches_only_when_allowed(index):
+    assert [r for _, r in _ranked(index, "بنادول")] == [RANK_FUZZY] * 3
+    assert _ranked(index, "بنادول", fuzzy=False) == []
+
+
+def test_query_is_normalized(index):
+    assert _ranked(index, "اموكسيل")[0] == ("أموكسيل 500", RANK_PREFIX)
+    assert index.positions("أُموكسيل").tolist() == [NAMES.index("أموكسيل 500")]
+
+
+def test_empty_query_returns_all_names_in_order(index):
+    assert index.positions("").tolist() == list(range(len(NAMES)))
+
+
+def test_paging(index):
+    page = index.search("بانادول", page=2, page_size=2)
+    assert page.total == 3
+    assert [h.name for h in page.hits] == ["سولبادين بانادول"]
+    assert index.search("بانادول", page=2, page_size=2) == page
+
+
+def test_highlight_marks_the_original_text():
+    assert highlight("أموكسيل 500", "اموك") == "**أموك**سيل 500"
+    assert highlight("سولبادين بانادول", "سول بان") == "**سول**بادين **بان**ادول"
+    assert highlight("ريفو", "") == "ريفو"
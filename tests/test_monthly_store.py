@@ -0,0 +1,69 @@
+# tests/test_monthly_store.py — تحديد شهر وسنة ملفات الأشهر وإدخالها في مخزن SQLite
+import os
+
+import pandas as pd
+import pytest
+
+from amany.monthly_store import detect_month, detect_month_name, ingest_folder, kpi_series, list_periods
+
+
+@pytest.fixture(autouse=True)
+def _workdir(tmp_path, monkeypatch):
+    # كاش الملفات (.cache/workbooks) يُكتب نسبة للمجلد الحالي
+    monkeypatch.chdir(tmp_path)
+
+
+def _workbook(path, title=None, rows=(("مركز الرويسات", 10), ("مركز السلام", 20))):
+    grid = ([[title, None]] if title else []) + [["المنشأة", "عدد الزيارات"]] + [list(r) for r in rows]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    pd.DataFrame(grid).to_excel(path, index=False, header=False)
+    return path
+
+
+@pytest.mark.parametrize("name", ["مارس 2025.xlsx", "مارس2025.xlsx", "مارس_2025.xlsx",
+                                  "مارس-2025.xlsx", "2025 مارس.xlsx"])
+def test_year_is_read_from_filename(name):
+    path = _workbook(os.path.join("uploads", name), title="تقرير شهر مارس 2024")
+    assert detect_month(path, year=2023) == (2025, 3)
+
+
+def test_longer_numbers_are_not_years():
+    path = _workbook(os.path.join("uploads", "مارس 120251.xlsx"))
+    assert detect_month(path, year=2024) == (2024, 3)
+
+
+def test_year_falls_back_to_header_then_setting():
+    titled = _workbook(os.path.join("uploads", "ابريل.xlsx"), title="تقرير شهر أبريل 2025")
+    plain = _workbook(os.path.join("uploads", "مايو.xlsx"))
+    assert detect_month(titled, year=2023) == (2025, 4)
+    assert detect_month(plain, year=2023) == (2023, 5)
+
+
+def test_unknown_year_is_rejected():
+    path = _workbook(os.path.join("uploads", "يونيو.xlsx"))
+    with pytest.raises(ValueError):
+        detect_month(path)
+
+
+def test_non_month_files_are_ignored():
+    assert detect_month_name("facilities_data.xlsx") is None
+    assert detect_month(_workbook("facilities_data.xlsx")) is None
+
+
+def test_ingest_folder_stores_periods_and_drops_rejected_files(tmp_path):
+    db = str(tmp_path / "kpis.sqlite")
+    _workbook(os.path.join("uploads", "يناير 2025.xlsx"))
+    _workbook(os.path.join("uploads", "فبراير_2025.xlsx"), rows=(("مركز الرويسات", 15),))
+    undated = _workbook(os.path.join("uploads", "مارس.xlsx"))
+
+    report, errors = ingest_folder("uploads", db, year=2025)
+    assert report == {"فبراير_2025.xlsx": 1, "مارس.xlsx": 2, "يناير 2025.xlsx": 2}
+    assert errors == {}
+    assert list_periods(db) == ["2025-01", "2025-02", "2025-03"]
+    series = kpi_series("Sheet1", "عدد الزيارات", db_path=db)
+    assert series["مركز الرويسات"].tolist() == [10, 15, 10]
+
+    # بدون سنة في الإعدادات يُرفض الملف وتُحذف قيمه السابقة بدلاً من بقائها تحت شهر خاطئ
+    report, errors = ingest_folder("uploads", db)
+    assert list(errors) == [os.path.basename(undated)]
+    assert list_periods(db) == ["2025-01", "2025-02"]
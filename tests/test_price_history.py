@@ -0,0 +1,67 @@
+# tests/test_price_history.py — استعلامات سجل الأسعار بالتاريخ، التغير السنوي، وتوقع التكلفة
+import numpy as np
+import pandas as pd
+import pytest
+
+from amany.price_history import PriceHistory, project_costs
+
+
+@pytest.fixture
+def history():
+    # نقاط غير مرتبة عمداً؛ C تغير خلال 9 أيام فقط فلا يُحسب له تغير سنوي
+    points = pd.DataFrame({
+        "name": ["A", "B", "A", "C", "A", "C"],
+        "date": ["2024-01-01", "2024-06-01", "2025-01-01", "2024-01-10", "2024-07-01", "2024-01-01"],
+        "price": [10.0, 5.0, 12.0, 4.0, 11.0, 2.0],
+    })
+    return PriceHistory.from_frame(points, {"A": "x", "B": "y", "C": "x"})
+
+
+@pytest.mark.parametrize("when, expected", [
+    ("2023-12-31", np.nan), ("2024-01-01", 10.0), ("2024-06-30", 10.0),
+    ("2024-07-01", 11.0), ("2030-01-01", 12.0), (None, 12.0),
+])
+def test_price_at_is_the_last_known_price(history, when, expected):
+    assert history.price_at("A", when) == pytest.approx(expected, nan_ok=True)
+
+
+def test_unknown_drug_has_no_price(history):
+    assert np.isnan(history.price_at("Z"))
+    assert history.series("Z").empty
+
+
+def test_series_between_dates_is_inclusive(history):
+    series = history.series("A", "2024-02-01", "2025-01-01")
+    assert series.tolist() == [11.0, 12.0]
+    assert list(series.index) == [pd.Timestamp("2024-07-01"), pd.Timestamp("2025-01-01")]
+    assert history.series("A").tolist() == [10.0, 11.0, 12.0]
+
+
+def test_last_prices(history):
+    assert history.last_prices().to_dict() == {"A": 12.0, "B": 5.0, "C": 4.0}
+
+
+def test_drug_and_ingredient_inflation(history):
+    drugs = history.drug_inflation().set_index("name")
+    assert drugs.loc["A", "change"] == pytest.approx(0.2)
+    assert drugs.loc["A", "days"] == 366
+    assert drugs.loc["A", "annual_change"] == pytest.approx(1.2 ** (365.25 / 366) - 1)
+    assert np.isnan(drugs.loc["C", "annual_change"])
+    assert drugs.loc["B", "change"] == 0
+
+    ingredients = history.ingredient_inflation()
+    assert ingredients[["ingredient", "drugs"]].values.tolist() == [["x", 1]]
+    assert history.drug_inflation(start="2024-06-01")["name"].tolist() == ["A", "B"]
+
+
+def test_project_costs_uses_last_prices_and_ingredient_inflation(history):
+    groups = pd.DataFrame({"المجموعة": ["g1", "g2"], "المادة الفعالة": ["x", "y"], "الكمية المطلوبة": [10.0, 0.0]})
+    items = pd.DataFrame({"اسم الدواء": ["A", "C", "B", "D"], "المجموعة": ["g1", "g1", "g2", "g2"],
+                          "سعر الوحدة": [0.0, 0.0, 0.0, 7.0]})
+    costs = project_costs(groups, items, history, months=12).set_index("المجموعة")
+    annual = 1.2 ** (365.25 / 366) - 1
+    assert costs.loc["g1", "سعر الوحدة الحالي"] == 8.0
+    assert costs.loc["g2", "سعر الوحدة الحالي"] == 6.0
+    assert costs.loc["g1", "التكلفة الحالية"] == 80.0
+    assert costs.loc["g1", "سعر الوحدة المتوقع"] == pytest.approx(round(8 * (1 + annual), 2))
+    assert costs.loc["g2", "التكلفة المتوقعة"] == 0
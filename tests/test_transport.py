@@ -0,0 +1,114 @@
+# tests/test_transport.py — الجلسة المُدارة وعميل gspread أمام خادم HTTP محلي بدلاً من Google
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from amany.transport import ManagedTransport, _utcnow, gspread_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        auth = self.headers.get("Authorization")
+        self.server.seen.append(auth)
+        body = b'{"ok": true}'
+        self.send_response(401 if auth == "Bearer stale" else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _FakeCredentials:
+    """بيانات اعتماد بنفس واجهة google-auth المستخدمة (token / expiry / refresh / apply)"""
+
+    def __init__(self, token, expires_in):
+        self.token = token
+        self.expiry = _utcnow() + expires_in
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.token = f"t{self.refreshes}"
+        self.expiry = _utcnow() + timedelta(hours=1)
+
+    def apply(self, headers):
+        headers["authorization"] = f"Bearer {self.token}"
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.seen = []
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv, f"http://127.0.0.1:{srv.server_port}/v4/spreadsheets/x"
+    srv.shutdown()
+    srv.server_close()
+
+
+def _transport(credentials=None, **kwargs):
+    transport = ManagedTransport(credentials, **kwargs)
+    transport._token_request = lambda: None
+    return transport
+
+
+def test_connections_are_reused_across_a_burst(server):
+    _, url = server
+    transport = _transport(pool_size=4)
+    with ThreadPoolExecutor(4) as pool:
+        assert all(pool.map(lambda _: transport.get(url).json()["ok"], range(40)))
+    metrics = transport.metrics()
+    assert metrics["requests"] == 40
+    assert metrics["errors"] == 0
+    assert 1 <= metrics["connections"] <= 4
+    assert metrics["p95_ms"] is not None
+
+
+def test_401_refreshes_and_retries_once(server):
+    srv, url = server
+    creds = _FakeCredentials("stale", timedelta(hours=1))
+    response = _transport(creds).get(url)
+    assert response.status_code == 200
+    assert creds.refreshes == 1
+    assert srv.seen[-2:] == ["Bearer stale", "Bearer t1"]
+
+
+def test_token_near_expiry_is_refreshed_in_background(server):
+    _, url = server
+    creds = _FakeCredentials("t0", timedelta(minutes=2))
+    transport = _transport(creds)
+    assert transport.get(url).status_code == 200
+    transport._refreshing.result(timeout=5)
+    assert creds.refreshes == 1
+    assert creds.expiry - _utcnow() > timedelta(minutes=30)
+
+
+def test_expired_token_is_refreshed_once_for_concurrent_requests(server):
+    _, url = server
+    creds = _FakeCredentials("t0", timedelta(seconds=-1))
+    transport = _transport(creds)
+    with ThreadPoolExecutor(8) as pool:
+        assert set(pool.map(lambda _: transport.get(url).status_code, range(16))) == {200}
+    assert creds.refreshes == 1
+
+
+def test_gspread_client_uses_managed_transport(server):
+    pytest.importorskip("gspread")
+    srv, url = server
+    creds = _FakeCredentials("t0", timedelta(hours=1))
+    transport = _transport(creds)
+    client = gspread_client(transport)
+    http_client = getattr(client, "http_client", client)
+    assert http_client.session is transport
+    assert http_client.auth is creds
+    assert http_client.request("get", url).json() == {"ok": True}
+    assert srv.seen[-1] == "Bearer t0"
+    assert transport.metrics()["requests"] == 1